@@ -1,4 +1,9 @@
 from django.contrib import admin
-from .models import EquipmentDataset
+from .models import ChunkedUpload, EquipmentDataset, EquipmentRow, EquipmentTypeStats, IngestJob, TrendPoint
 
 admin.site.register(EquipmentDataset)
+admin.site.register(EquipmentRow)
+admin.site.register(EquipmentTypeStats)
+admin.site.register(IngestJob)
+admin.site.register(ChunkedUpload)
+admin.site.register(TrendPoint)
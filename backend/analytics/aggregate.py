@@ -0,0 +1,322 @@
+"""
+Server-side aggregation of a dataset's rows.
+
+Count, sum, min, max and mean are one ``GROUP BY`` in the database, and
+so is std, from the count, sum and sum of squares of each group. Bins are
+an expression on the row, after one query for the range of the binned
+column. Only quantiles need the values themselves: those queries read
+just the columns they use, in keyset batches, and group them in pandas.
+The common case of per-type count/mean/min/max/std/p50/p95 over the
+unfiltered dataset is answered from EquipmentTypeStats without reading
+any rows.
+
+Query syntax (all optional):
+
+- ``group_by=type``
+- ``metrics=count,flowrate:mean,pressure:p95``. ``count`` counts rows.
+  The other stats are mean, min, max, sum, std (sample) and ``pNN``
+  quantiles, e.g. p5, p50, p99.5. The default is count and the mean of
+  every metric.
+- ``bin=flowrate:20`` splits the flowrate range into 20 equal-width bins
+  and groups by bin as well, which gives a histogram with
+  ``metrics=count``.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+from django.db.models import Avg, Count, F, IntegerField, Max, Min, Sum, Value
+from django.db.models.functions import Cast, Floor, Least
+
+from .exceptions import RowQueryError
+from .ingest import nan_to_none
+from .models import EquipmentTypeStats
+from .rows import RANGE_FIELDS, iter_value_batches
+
+METRICS = EquipmentTypeStats.METRICS
+GROUP_KEYS = ("type",)
+TEXT_FIELDS = ("equipment_name", "type")
+PLAIN_STATS = ("mean", "min", "max", "sum", "std")
+
+# Statistics that are a single SQL aggregate; std is derived in sample_std()
+SQL_STATS = {"mean": Avg, "min": Min, "max": Max, "sum": Sum}
+
+DEFAULT_METRICS = "count," + ",".join(f"{metric}:mean" for metric in METRICS)
+
+MAX_BINS = 1000
+
+# Query parameters that narrow the rows; see rows.filter_rows()
+FILTER_PARAMS = ("type", "name") + tuple(
+    f"{field}_{suffix}" for field in RANGE_FIELDS for suffix in ("min", "max")
+)
+
+
+def quantile_of(stat):
+    """``"p95"`` -> ``0.95``; ``None`` for anything else."""
+    if not stat.startswith("p"):
+        return None
+    try:
+        percent = float(stat[1:])
+    except ValueError:
+        return None
+    if not 0 <= percent <= 100:
+        return None
+    return percent / 100
+
+
+def parse_group_by(raw):
+    keys = [key for key in (raw or "").split(",") if key]
+    for key in keys:
+        if key not in GROUP_KEYS:
+            raise RowQueryError(f"Cannot group by '{key}'. Use: {', '.join(GROUP_KEYS)}")
+    return keys
+
+
+def parse_metrics(raw):
+    """``"count,flowrate:mean"`` -> ``[(None, "count"), ("flowrate", "mean")]``."""
+    metrics = []
+    for item in (raw or DEFAULT_METRICS).split(","):
+        if not item:
+            continue
+        if item == "count":
+            metrics.append((None, "count"))
+            continue
+
+        metric, _, stat = item.partition(":")
+        if metric not in METRICS:
+            raise RowQueryError(f"Unknown metric '{metric}'. Use one of: {', '.join(METRICS)}")
+        if stat not in PLAIN_STATS and quantile_of(stat) is None:
+            raise RowQueryError(
+                f"Unknown statistic '{stat}'. Use one of: {', '.join(PLAIN_STATS)} "
+                "or pNN for a quantile"
+            )
+        metrics.append((metric, stat))
+    return metrics
+
+
+def parse_bin(raw):
+    """``"flowrate:20"`` -> ``("flowrate", 20)``."""
+    if not raw:
+        return None
+    metric, _, count = raw.partition(":")
+    if metric not in METRICS:
+        raise RowQueryError(f"Cannot bin '{metric}'. Use one of: {', '.join(METRICS)}")
+    try:
+        count = int(count)
+    except ValueError:
+        raise RowQueryError("bin must look like <metric>:<number of bins>")
+    if not 1 <= count <= MAX_BINS:
+        raise RowQueryError(f"Number of bins must be between 1 and {MAX_BINS}")
+    return metric, count
+
+
+def load_columns(queryset, columns):
+    """The given columns of ``queryset`` as a DataFrame, read batch by batch."""
+    parts = {column: [] for column in columns}
+    for batch in iter_value_batches(queryset, columns):
+        for column, values in zip(columns, list(zip(*batch))[1:]):
+            parts[column].append(np.asarray(values, dtype=object if column in TEXT_FIELDS else "float64"))
+
+    frame = pd.DataFrame({
+        column: np.concatenate(arrays) if arrays else np.array(
+            [], dtype=object if column in TEXT_FIELDS else "float64"
+        )
+        for column, arrays in parts.items()
+    })
+    if "type" in frame:
+        frame["type"] = frame["type"].astype("category")
+    return frame
+
+
+def bin_column(values, count):
+    """Equal-width bin index of every value, and the bin edges."""
+    if values.size == 0:
+        return np.array([], dtype="int64"), []
+
+    low, high = float(values.min()), float(values.max())
+    edges = np.linspace(low, high, count + 1)
+    width = (high - low) / count
+    if width == 0:
+        index = np.zeros(values.size, dtype="int64")
+    else:
+        # The maximum goes in the last bin rather than one past it
+        index = np.minimum(((values - low) // width).astype("int64"), count - 1)
+    return index, edges.tolist()
+
+
+def _stat_series(grouped, metric, stat):
+    column = grouped[metric]
+    q = quantile_of(stat)
+    if q is not None:
+        return column.quantile(q)
+    if stat == "std":
+        return column.std(ddof=1)
+    return column.agg(stat)
+
+
+def aggregate_frame(frame, group_by, metrics, bin_spec=None):
+    """Aggregate an in-memory frame, for quantiles; returns ``(groups, bins)``."""
+    keys = list(group_by)
+    bins = {}
+
+    if bin_spec:
+        metric, count = bin_spec
+        index, edges = bin_column(frame[metric].to_numpy(), count)
+        frame = frame.assign(**{f"{metric}_bin": index})
+        bins[metric] = {"count": count, "edges": edges}
+        keys.append(f"{metric}_bin")
+
+    if not keys:
+        # One group covering every row
+        frame = frame.assign(_all=0)
+        grouped = frame.groupby("_all", sort=True)
+    else:
+        grouped = frame.groupby(keys, sort=True, observed=True)
+
+    columns = {"count": grouped.size()}
+    for metric, stat in metrics:
+        if metric is not None:
+            columns[f"{metric}:{stat}"] = _stat_series(grouped, metric, stat)
+    result = pd.DataFrame(columns)
+
+    if not keys and result.empty:
+        # No rows at all: still one group, with a zero count
+        result = pd.DataFrame({name: [0 if name == "count" else np.nan] for name in columns})
+
+    groups = []
+    for index, row in result.iterrows():
+        index = index if isinstance(index, tuple) else (index,)
+        group = dict(zip(keys, (key.item() if hasattr(key, "item") else key for key in index)))
+        for metric, stat in metrics:
+            if metric is None:
+                group["count"] = int(row["count"])
+            else:
+                group.setdefault(metric, {})[stat] = nan_to_none(row[f"{metric}:{stat}"])
+        groups.append(group)
+
+    return groups, bins
+
+
+def precomputed(dataset, group_by, metrics):
+    """
+    The per-type answer straight from EquipmentTypeStats, or ``None`` when
+    the query asks for something that was not precomputed.
+    """
+    if group_by != ["type"]:
+        return None
+    stored = {"count"} | set(EquipmentTypeStats.STATS)
+    if any(stat not in stored for _, stat in metrics):
+        return None
+
+    groups = []
+    for stats in dataset.type_stats.order_by("type"):
+        group = {"type": stats.type}
+        for metric, stat in metrics:
+            if metric is None:
+                group["count"] = stats.count
+            else:
+                group.setdefault(metric, {})[stat] = getattr(stats, f"{metric}_{stat}")
+        groups.append(group)
+    return groups
+
+
+def sample_std(count, total, squares):
+    """Sample standard deviation from a group's count, sum and sum of squares."""
+    if count < 2 or total is None or squares is None:
+        return None
+    # Rounding can take the difference just below zero for constant values
+    variance = max(squares - total * total / count, 0.0) / (count - 1)
+    return math.sqrt(variance)
+
+
+def bin_expression(queryset, metric, count):
+    """The bin index of every row as an SQL expression, and the bin edges."""
+    bounds = queryset.aggregate(low=Min(metric), high=Max(metric))
+    low, high = bounds["low"], bounds["high"]
+    if low is None:
+        return Value(0), []
+
+    edges = np.linspace(low, high, count + 1).tolist()
+    width = (high - low) / count
+    if width == 0:
+        return Value(0), edges
+    # The maximum goes in the last bin rather than one past it
+    index = Least(
+        Cast(Floor((F(metric) - Value(low)) / Value(width)), IntegerField()),
+        Value(count - 1),
+    )
+    return index, edges
+
+
+def aggregate_rows(queryset, group_by, metrics, bin_spec=None):
+    """Aggregate in the database with one ``GROUP BY``; returns ``(groups, bins)``."""
+    keys = list(group_by)
+    bins = {}
+
+    if bin_spec:
+        metric, count = bin_spec
+        index, edges = bin_expression(queryset, metric, count)
+        queryset = queryset.annotate(**{f"{metric}_bin": index})
+        bins[metric] = {"count": count, "edges": edges}
+        keys.append(f"{metric}_bin")
+
+    annotations = {"count": Count("id")}
+    for metric, stat in metrics:
+        if metric is None:
+            continue
+        if stat == "std":
+            annotations[f"{metric}_sum"] = Sum(metric)
+            annotations[f"{metric}_squares"] = Sum(F(metric) * F(metric))
+        else:
+            annotations[f"{metric}_{stat}"] = SQL_STATS[stat](metric)
+
+    if keys:
+        rows = queryset.values(*keys).annotate(**annotations).order_by(*keys)
+    else:
+        # One group covering every row, even when there are none
+        rows = [queryset.aggregate(**annotations)]
+
+    groups = []
+    for row in rows:
+        group = {key: row[key] for key in keys}
+        for metric, stat in metrics:
+            if metric is None:
+                group["count"] = row["count"]
+            elif stat == "std":
+                group.setdefault(metric, {})[stat] = sample_std(
+                    row["count"], row[f"{metric}_sum"], row[f"{metric}_squares"]
+                )
+            else:
+                group.setdefault(metric, {})[stat] = row[f"{metric}_{stat}"]
+        groups.append(group)
+
+    return groups, bins
+
+
+def aggregate(dataset, queryset, params):
+    """Answer an aggregation query; ``queryset`` has the filters applied."""
+    group_by = parse_group_by(params.get("group_by"))
+    metrics = parse_metrics(params.get("metrics"))
+    bin_spec = parse_bin(params.get("bin"))
+
+    filtered = any(params.get(name) not in (None, "") for name in FILTER_PARAMS)
+    if not filtered and not bin_spec:
+        groups = precomputed(dataset, group_by, metrics)
+        if groups is not None:
+            return {"group_by": group_by, "bins": {}, "groups": groups}
+
+    if any(metric is not None and quantile_of(stat) is not None for metric, stat in metrics):
+        columns = list(dict.fromkeys(
+            list(group_by)
+            + [metric for metric, _ in metrics if metric is not None]
+            + ([bin_spec[0]] if bin_spec else [])
+        ))
+        groups, bins = aggregate_frame(load_columns(queryset, columns), group_by, metrics, bin_spec)
+    else:
+        groups, bins = aggregate_rows(queryset, group_by, metrics, bin_spec)
+
+    return {
+        "group_by": group_by + ([f"{bin_spec[0]}_bin"] if bin_spec else []),
+        "bins": bins,
+        "groups": groups,
+    }
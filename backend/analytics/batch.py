@@ -0,0 +1,220 @@
+"""
+Batch uploads: several CSVs, or one ZIP of CSVs, in a single request.
+
+Files are parsed in a process pool using the same ``read_frame`` /
+``frame_summary`` steps as a single upload; saving happens back in the
+request process, one dataset per file. The pool is created on first use
+and shared by every batch request of the process. Only a few parsed frames
+exist at a time, and files past ANALYTICS_STREAM_THRESHOLD skip the pool and are
+streamed straight into the database instead.
+"""
+import hashlib
+import logging
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.files import File
+
+from .ingest import CSVIngestError, parse_source
+from .upload_handlers import upload_sha256
+
+COPY_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class BatchSource:
+    """One CSV of a batch, wherever it came from."""
+
+    def __init__(self, name, file, content_hash, path=None):
+        self.name = name
+        self.file = file
+        self.content_hash = content_hash
+        self.path = path
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if self.path else self.file.size
+
+    def parse_input(self):
+        # Paths are cheaper to hand to a worker process than bytes
+        if self.path:
+            return self.path
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.seek(0)
+        return data
+
+
+def extract_zip(upload, workdir):
+    """
+    Extract the ``.csv`` members of a ZIP upload into ``workdir``, hashing
+    each one, and stop once ANALYTICS_MAX_DECOMPRESSED_SIZE bytes have been
+    written so a small archive can't fill the disk.
+    """
+    limit = settings.ANALYTICS_MAX_DECOMPRESSED_SIZE
+    written = 0
+    sources = []
+
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile:
+        raise CSVIngestError("Invalid ZIP file")
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(".csv")
+        ]
+        if not members:
+            raise CSVIngestError("ZIP file contains no CSV files")
+
+        for index, info in enumerate(members):
+            name = os.path.basename(info.filename)
+            path = os.path.join(workdir, f"{index}.csv")
+            sha256 = hashlib.sha256()
+
+            with archive.open(info) as src, open(path, "wb") as dst:
+                while True:
+                    block = src.read(COPY_SIZE)
+                    if not block:
+                        break
+                    written += len(block)
+                    if written > limit:
+                        raise CSVIngestError("ZIP file is too large once extracted")
+                    sha256.update(block)
+                    dst.write(block)
+
+            sources.append(
+                BatchSource(name, File(open(path, "rb"), name=name), sha256.hexdigest(), path)
+            )
+
+    return sources
+
+
+def collect_sources(files, workdir):
+    if len(files) == 1 and zipfile.is_zipfile(files[0]):
+        files[0].seek(0)
+        return extract_zip(files[0], workdir)
+
+    sources = []
+    for f in files:
+        path = f.temporary_file_path() if hasattr(f, "temporary_file_path") else None
+        sources.append(BatchSource(f.name, f, upload_sha256(f), path))
+    return sources
+
+
+def close_sources(sources):
+    for source in sources:
+        if source.path and isinstance(source.file, File):
+            source.file.close()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # django.setup() so workers also work under the spawn/forkserver methods
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.ANALYTICS_BATCH_WORKERS,
+                initializer=django.setup,
+            )
+    return _pool
+
+
+def discard_pool(pool):
+    """Drop a broken pool so the next batch starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse(source):
+    try:
+        return parse_source(source)
+    except CSVIngestError as e:
+        return e
+
+
+def _failure(error):
+    """Report an unexpected parse error (a crashed worker, say) for one file only."""
+    if isinstance(error, CSVIngestError):
+        return error
+    logger.error("Batch file failed to parse", exc_info=error)
+    return CSVIngestError("File could not be parsed")
+
+
+def parse_all(inputs):
+    """
+    ``parse_source`` over every input, in parallel when
+    ANALYTICS_BATCH_WORKERS allows. Yields ``(frame, summary)`` or a
+    ``CSVIngestError`` for each input, in order.
+
+    At most one file per worker is submitted ahead of the one being
+    consumed, so finished frames don't pile up in the parent while the
+    caller saves earlier ones.
+    """
+    workers = min(settings.ANALYTICS_BATCH_WORKERS, len(inputs))
+
+    if workers <= 1:
+        for source in inputs:
+            try:
+                outcome = _parse(source)
+            except Exception as e:
+                outcome = _failure(e)
+            yield outcome
+        return
+
+    pool = get_pool()
+    remaining = iter(inputs)
+    in_flight = deque()
+
+    def submit_next():
+        source = next(remaining, None)
+        if source is None:
+            return
+        try:
+            in_flight.append(pool.submit(_parse, source))
+        except Exception as e:
+            # The pool is broken; later files fail the same way
+            in_flight.append(e)
+
+    for _ in range(workers):
+        submit_next()
+
+    try:
+        while in_flight:
+            future = in_flight.popleft()
+            submit_next()
+            if isinstance(future, Exception):
+                outcome = future
+            else:
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = e
+            if isinstance(outcome, BrokenProcessPool):
+                discard_pool(pool)
+            if isinstance(outcome, Exception):
+                outcome = _failure(outcome)
+            # Let go of the future so its frame can be freed once the
+            # caller is done with it
+            del future
+            yield outcome
+    finally:
+        # The pool outlives this batch: don't leave it parsing files
+        # nobody will read
+        for future in in_flight:
+            if not isinstance(future, Exception):
+                future.cancel()
@@ -0,0 +1,108 @@
+"""
+Cached history and dataset summary payloads.
+
+Both only change when a dataset is created or deleted. Summaries live
+until the signal handlers in ``analytics.signals`` drop them (or
+ANALYTICS_CACHE_TIMEOUT passes). History entries are keyed by the listing
+they were built from, the same one the history ETag digests, so a new or
+deleted dataset moves readers to a new key instead of relying on every
+worker seeing an invalidation. Hits and misses are logged at DEBUG on the
+``analytics.caching`` logger and reported to clients in ``X-Cache``;
+counting them in the cache itself would cost writes on every lookup.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import EquipmentDataset
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 5
+
+
+def history_key(owner_id, listing):
+    listed = "|".join(f"{dataset_id}@{uploaded_at.isoformat()}" for dataset_id, uploaded_at in listing)
+    return "analytics:history:{}:{}".format(owner_id, hashlib.sha256(listed.encode()).hexdigest()[:32])
+
+
+def summary_key(dataset_id, owner_id):
+    return f"analytics:dataset:{dataset_id}:summary:{owner_id}"
+
+
+def _log_lookup(outcome, key):
+    logger.debug("Cache %s: %s", outcome, key)
+
+
+def get_or_build(key, build):
+    """
+    ``(value, hit)`` for ``key``, calling ``build()`` on a miss. ``None``
+    results are not cached.
+    """
+    value = cache.get(key)
+    if value is not None:
+        _log_lookup("hit", key)
+        return value, True
+
+    _log_lookup("miss", key)
+    value = build()
+    if value is not None:
+        cache.set(key, value, settings.ANALYTICS_CACHE_TIMEOUT)
+    return value, False
+
+
+def history_datasets(owner_id):
+    return (
+        EquipmentDataset.objects
+        .filter(owner_id=owner_id)
+        .order_by("-uploaded_at", "-id")[:HISTORY_SIZE]
+    )
+
+
+def history_listing(owner_id):
+    """``(id, uploaded_at)`` of the datasets the history shows, newest first."""
+    return list(history_datasets(owner_id).values_list("id", "uploaded_at"))
+
+
+def cached_history(owner_id, listing=None):
+    """
+    ``(payload, hit)`` for the last HISTORY_SIZE uploads of one user.
+    ``listing`` is what ``history_listing()`` returned when the caller
+    computed its ETag; it is read here when not given.
+    """
+    if listing is None:
+        listing = history_listing(owner_id)
+    key = history_key(owner_id, listing)
+
+    payload = cache.get(key)
+    if payload is not None:
+        _log_lookup("hit", key)
+        return payload, True
+
+    _log_lookup("miss", key)
+    datasets = list(history_datasets(owner_id).summaries())
+    payload = [dataset.as_api() for dataset in datasets]
+    # An upload or delete committed after the listing was read: the payload
+    # is fresh but belongs to another listing, so don't store it under this one
+    if [(dataset.id, dataset.uploaded_at) for dataset in datasets] == list(listing):
+        cache.set(key, payload, settings.ANALYTICS_CACHE_TIMEOUT)
+    return payload, False
+
+
+def cached_summary(dataset_id, owner_id):
+    """
+    ``(payload, hit)``; the payload is ``None`` for an unknown dataset or
+    one ``owner_id`` does not own.
+    """
+    def build():
+        dataset = EquipmentDataset.objects.summaries().filter(id=dataset_id, owner_id=owner_id).first()
+        return dataset.as_api() if dataset else None
+
+    return get_or_build(summary_key(dataset_id, owner_id), build)
+
+
+def invalidate_dataset(dataset_id, owner_id):
+    # History keys change with the listing, so only the summary needs dropping
+    cache.delete(summary_key(dataset_id, owner_id))
@@ -0,0 +1,158 @@
+"""
+Row-level comparison of two datasets.
+
+Rows are matched on equipment name with one vectorized outer merge. When
+a name repeats within a dataset, its n-th occurrence in one dataset
+pairs with its n-th occurrence in the other. Per-type average changes
+come from the stored EquipmentTypeStats, so only the row-level part
+reads rows.
+"""
+import pandas as pd
+
+from .aggregate import load_columns
+from .exceptions import RowQueryError
+from .models import EquipmentTypeStats
+
+METRICS = EquipmentTypeStats.METRICS
+COLUMNS = ["equipment_name", "type", *METRICS]
+
+
+def parse_compare(params):
+    """``(top, by)``: ``?top=N`` keeps the N largest changes by ``?by=``."""
+    by = params.get("by", "flowrate")
+    if by not in METRICS:
+        raise RowQueryError(f"Cannot rank by '{by}'. Use one of: {', '.join(METRICS)}")
+
+    top = params.get("top")
+    if top in (None, ""):
+        return None, by
+    try:
+        top = int(top)
+    except ValueError:
+        raise RowQueryError("top must be an integer")
+    if top < 1:
+        raise RowQueryError("top must be at least 1")
+    return top, by
+
+
+def _frame(dataset):
+    frame = load_columns(dataset.rows.all(), COLUMNS)
+    frame["type"] = frame["type"].astype(object)
+    frame["occurrence"] = frame.groupby("equipment_name").cumcount()
+    return frame
+
+
+def _equipment(frame, suffix, top):
+    frame = frame.sort_values(["equipment_name", "occurrence"])
+    if top:
+        frame = frame.head(top)
+    return [
+        {"equipmentName": name, "type": type_}
+        for name, type_ in zip(frame["equipment_name"], frame[f"type{suffix}"])
+    ]
+
+
+def _delta(a, b):
+    delta = None if a is None or b is None else b - a
+    return {"a": a, "b": b, "delta": delta}
+
+
+def type_average_changes(dataset_a, dataset_b):
+    """Count and mean of every metric per type, in both datasets."""
+    a = {stats.type: stats for stats in dataset_a.type_stats.all()}
+    b = {stats.type: stats for stats in dataset_b.type_stats.all()}
+
+    changes = {}
+    for type_ in sorted(a.keys() | b.keys()):
+        sa, sb = a.get(type_), b.get(type_)
+        changes[type_] = {
+            "count": _delta(sa.count if sa else 0, sb.count if sb else 0),
+            **{
+                metric: _delta(
+                    getattr(sa, f"{metric}_mean") if sa else None,
+                    getattr(sb, f"{metric}_mean") if sb else None,
+                )
+                for metric in METRICS
+            },
+        }
+    return changes
+
+
+def compare_datasets(dataset_a, dataset_b, top=None, by="flowrate"):
+    merged = pd.merge(
+        _frame(dataset_a),
+        _frame(dataset_b),
+        on=["equipment_name", "occurrence"],
+        how="outer",
+        suffixes=("_a", "_b"),
+        indicator=True,
+    )
+
+    removed = merged[merged["_merge"] == "left_only"]
+    added = merged[merged["_merge"] == "right_only"]
+    matched = merged[merged["_merge"] == "both"]
+
+    deltas = pd.DataFrame(
+        {metric: matched[f"{metric}_b"] - matched[f"{metric}_a"] for metric in METRICS},
+        index=matched.index,
+    )
+    type_changed = matched["type_a"] != matched["type_b"]
+    is_changed = (deltas != 0).any(axis=1) | type_changed
+
+    changed = matched[is_changed]
+    magnitude = deltas.loc[is_changed, by].abs()
+    # Largest change first; ties by name so the order is stable
+    order = (
+        pd.DataFrame({"magnitude": magnitude, "name": changed["equipment_name"]})
+        .sort_values(["magnitude", "name"], ascending=[False, True], kind="stable")
+        .index
+    )
+    if top:
+        order = order[:top]
+    changed = changed.loc[order]
+    changed_deltas = deltas.loc[order]
+
+    names = changed["equipment_name"].tolist()
+    types = list(zip(changed["type_a"].tolist(), changed["type_b"].tolist()))
+    values = {
+        metric: list(zip(
+            changed[f"{metric}_a"].tolist(),
+            changed[f"{metric}_b"].tolist(),
+            changed_deltas[metric].tolist(),
+        ))
+        for metric in METRICS
+    }
+    changes = [
+        {
+            "equipmentName": name,
+            "type": {"a": types[i][0], "b": types[i][1]},
+            **{
+                metric: dict(zip(("a", "b", "delta"), values[metric][i]))
+                for metric in METRICS
+            },
+        }
+        for i, name in enumerate(names)
+    ]
+
+    return {
+        "a": {
+            "id": dataset_a.id,
+            "fileName": dataset_a.original_filename,
+            "total": len(matched) + len(removed),
+        },
+        "b": {
+            "id": dataset_b.id,
+            "fileName": dataset_b.original_filename,
+            "total": len(matched) + len(added),
+        },
+        "rankedBy": by,
+        "top": top,
+        "added": {"count": len(added), "equipment": _equipment(added, "_b", top)},
+        "removed": {"count": len(removed), "equipment": _equipment(removed, "_a", top)},
+        "changed": {
+            "count": int(is_changed.sum()),
+            "unchanged": int((~is_changed).sum()),
+            "equipment": changes,
+        },
+        "type_averages": type_average_changes(dataset_a, dataset_b),
+    }
@@ -0,0 +1,116 @@
+"""
+Transparent decompression of gzip/bz2/xz/zstd CSV uploads.
+
+The format is detected from the leading magic bytes, not the file name,
+and the CSV parser reads straight from a decompressing stream, so the
+uncompressed file never exists in memory or on disk. Reads fail once more
+than ANALYTICS_MAX_DECOMPRESSED_SIZE bytes come out, which stops
+decompression bombs.
+"""
+import bz2
+import gzip
+import io
+import lzma
+
+from django.conf import settings
+
+from .exceptions import CSVIngestError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MAGIC_NUMBERS = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+
+
+def detect_compression(file):
+    head = file.read(6)
+    file.seek(0)
+
+    for magic, kind in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def open_stream(kind, raw):
+    if kind == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if kind == "bz2":
+        return bz2.BZ2File(raw)
+    if kind == "xz":
+        return lzma.LZMAFile(raw)
+    if zstandard is None:
+        raise CSVIngestError("zstd compressed uploads are not supported on this server")
+    return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+
+
+class DecompressingReader(io.RawIOBase):
+    """
+    Read-only view of the decompressed bytes of ``raw``. Only rewinding is
+    supported, which restarts decompression from the beginning.
+    """
+
+    def __init__(self, raw, kind, limit):
+        self.raw = raw
+        self.kind = kind
+        self.limit = limit
+        self.name = getattr(raw, "name", None)
+        self._open()
+
+    def _open(self):
+        self.raw.seek(0)
+        self._stream = open_stream(self.kind, self.raw)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if (offset, whence) == (0, io.SEEK_SET):
+            self._open()
+            return 0
+        if (offset, whence) == (0, io.SEEK_CUR):
+            return self._position
+        raise io.UnsupportedOperation("decompressed uploads can only be rewound")
+
+    def readinto(self, buffer):
+        try:
+            data = self._stream.read(len(buffer))
+        except (OSError, EOFError, lzma.LZMAError) as e:
+            raise CSVIngestError(f"Invalid {self.kind} data") from e
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise CSVIngestError(f"Invalid {self.kind} data") from e
+            raise
+
+        self._position += len(data)
+        if self._position > self.limit:
+            raise CSVIngestError(
+                f"Upload exceeds {self.limit} bytes once decompressed"
+            )
+
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def decompressed(file):
+    """``file`` itself if it's plain CSV, else a decompressing reader over it."""
+    kind = detect_compression(file)
+    if kind is None:
+        return file
+
+    return DecompressingReader(file, kind, settings.ANALYTICS_MAX_DECOMPRESSED_SIZE)
@@ -0,0 +1,126 @@
+"""
+ETag / Last-Modified support for the read endpoints.
+
+Datasets never change after upload, so a strong validator can be derived
+from a dataset's id, upload time and content hash alone. These functions
+only read those columns, which lets Django's ``condition()`` answer
+``If-None-Match`` / ``If-Modified-Since`` with 304 before a view loads any
+rows or renders a PDF. They only see the requesting user's datasets, so
+another user's dataset gets no validator and falls through to the 404.
+
+Responses are also marked ``Cache-Control: private, no-cache`` so
+browsers keep them but revalidate on every use.
+"""
+import hashlib
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .caching import history_listing
+from .models import EquipmentDataset
+
+# Bump when a representation changes shape, so clients don't keep a stale copy
+REPRESENTATION_VERSION = "1"
+
+
+def _digest(*parts):
+    raw = "|".join(str(part) for part in (REPRESENTATION_VERSION, *parts))
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _dataset_validators(request, dataset_id):
+    # condition() asks for the ETag and then Last-Modified; remember the
+    # row on the request so both cost one query
+    known = getattr(request, "_dataset_validators", None)
+    if known is None:
+        known = request._dataset_validators = {}
+    if dataset_id not in known:
+        known[dataset_id] = (
+            EquipmentDataset.objects
+            .owned_by(request.user)
+            .filter(id=dataset_id)
+            .values_list("uploaded_at", "content_hash")
+            .first()
+        )
+    return known[dataset_id]
+
+
+def dataset_etag(request, dataset_id, **kwargs):
+    validators = _dataset_validators(request, dataset_id)
+    if validators is None:
+        # Let the view produce its 404
+        return None
+    uploaded_at, content_hash = validators
+    return _digest(
+        request.path,
+        dataset_id,
+        uploaded_at.isoformat(),
+        content_hash,
+        request.META.get("QUERY_STRING", ""),
+        # Exports pick their format from Accept
+        request.META.get("HTTP_ACCEPT", ""),
+    )
+
+
+def dataset_last_modified(request, dataset_id, **kwargs):
+    validators = _dataset_validators(request, dataset_id)
+    return validators[0] if validators else None
+
+
+def pair_etag(request, dataset_id, other_id, **kwargs):
+    """Validator of a response built from two datasets."""
+    first = dataset_etag(request, dataset_id)
+    second = dataset_etag(request, other_id)
+    if first is None or second is None:
+        return None
+    return _digest(first, second)
+
+
+def pair_last_modified(request, dataset_id, other_id, **kwargs):
+    modified = [
+        dataset_last_modified(request, dataset_id),
+        dataset_last_modified(request, other_id),
+    ]
+    return None if None in modified else max(modified)
+
+
+def request_history_listing(request):
+    """
+    The listing behind the history ETag, remembered on the request so the
+    view serves the cached payload built from the same listing.
+    """
+    listing = getattr(request, "_history_listing", None)
+    if listing is None:
+        listing = request._history_listing = history_listing(request.user.id)
+    return listing
+
+
+def history_etag(request, *args, **kwargs):
+    """
+    Changes whenever a dataset enters or leaves the listing. There is no
+    Last-Modified for history: pruning can drop an entry without making
+    anything newer.
+    """
+    return _digest(
+        request.path,
+        *(f"{dataset_id}@{uploaded_at.isoformat()}" for dataset_id, uploaded_at in request_history_listing(request)),
+    )
+
+
+def revalidate(etag_func=None, last_modified_func=None):
+    """``condition()`` plus the Cache-Control header, for function views."""
+
+    def decorator(view):
+        view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+        return cache_control(private=True, no_cache=True)(view)
+
+    return decorator
+
+
+def revalidate_get(etag_func=None, last_modified_func=None):
+    """The same for the ``get`` method of an APIView."""
+    return method_decorator(
+        revalidate(etag_func, last_modified_func),
+        name="get",
+    )
@@ -0,0 +1,111 @@
+"""
+Downsampled sorted series for the "Parameter Distribution" chart.
+
+The chart plots metrics against the rank of each row when sorted by one
+metric. Largest-Triangle-Three-Buckets picks the points that keep the
+visual shape, so a chart a few thousand pixels wide can be drawn from a
+few thousand points whatever the dataset's size.
+"""
+import numpy as np
+
+from .aggregate import load_columns
+from .caching import get_or_build
+from .exceptions import RowQueryError
+from .models import EquipmentTypeStats
+
+METRICS = EquipmentTypeStats.METRICS
+
+DEFAULT_POINTS = 1500
+MAX_POINTS = 20000
+DEFAULT_SERIES = ("flowrate", "pressure")
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the ``threshold`` points of ``(x, y)`` chosen by
+    Largest-Triangle-Three-Buckets. ``x`` must be increasing.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest fall in
+    # threshold - 2 buckets of (nearly) equal size
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        # Average of the next bucket (or the last point)
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Point of this bucket with the largest triangle area
+        px, py = x[previous], y[previous]
+        area = np.abs(
+            (px - avg_x) * (y[start:end] - py)
+            - (px - x[start:end]) * (avg_y - py)
+        )
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def parse_series(params):
+    sort_by = params.get("sort_by", "flowrate")
+    if sort_by not in METRICS:
+        raise RowQueryError(f"Cannot sort by '{sort_by}'. Use one of: {', '.join(METRICS)}")
+
+    series = [name for name in params.get("series", ",".join(DEFAULT_SERIES)).split(",") if name]
+    for name in series:
+        if name not in METRICS:
+            raise RowQueryError(f"Unknown series '{name}'. Use one of: {', '.join(METRICS)}")
+
+    try:
+        points = int(params.get("points", DEFAULT_POINTS))
+    except ValueError:
+        raise RowQueryError("points must be an integer")
+    if not 3 <= points <= MAX_POINTS:
+        raise RowQueryError(f"points must be between 3 and {MAX_POINTS}")
+
+    return sort_by, series, points
+
+
+def sorted_series(queryset, sort_by, series, points):
+    """
+    Each metric in ``series`` against the rank of its row when sorted by
+    ``sort_by`` (ties in upload order), downsampled to ``points`` points.
+    """
+    frame = load_columns(queryset, list(dict.fromkeys([sort_by, *series])))
+    order = np.argsort(frame[sort_by].to_numpy(), kind="stable")
+    rank = np.arange(len(order), dtype="float64")
+
+    payload = {"sort_by": sort_by, "total": len(order), "points": points, "series": {}}
+    for name in series:
+        values = frame[name].to_numpy()[order]
+        keep = lttb(rank, values, points)
+        payload["series"][name] = {
+            "x": keep.tolist(),
+            "y": values[keep].tolist(),
+        }
+    return payload
+
+
+def cached_sorted_series(dataset, sort_by, series, points):
+    """``(payload, hit)``, cached per dataset, sort, series and point count."""
+    key = "analytics:dataset:{}:{}:series:{}:{}:{}".format(
+        dataset.id,
+        int(dataset.uploaded_at.timestamp()),
+        sort_by,
+        ",".join(series),
+        points,
+    )
+    return get_or_build(key, lambda: sorted_series(dataset.rows.all(), sort_by, series, points))
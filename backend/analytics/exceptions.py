@@ -0,0 +1,6 @@
+class CSVIngestError(Exception):
+    """Upload could not be ingested. The message is safe to show to clients."""
+
+
+class RowQueryError(Exception):
+    """Invalid rows query parameters. The message is safe to show to clients."""
@@ -0,0 +1,231 @@
+"""
+Streamed exports of a dataset.
+
+Two tables can be exported: the rows, and the per-type statistics. The
+formats are JSON (one array), NDJSON (one object per line) and, when
+pyarrow is installed, Arrow IPC streams and Parquet. Rows are read from
+the database in keyset batches and each batch is encoded and sent before
+the next one is read. Serving a dataset therefore holds at most one batch
+in memory, or one Parquet row group, whatever the dataset's size.
+
+In the columnar formats ``type`` is dictionary-encoded against the
+dataset's full set of types, so every batch shares one dictionary. The
+metric columns are plain float64 with no nulls, so readers can hand them
+to NumPy without a copy.
+"""
+import io
+import json
+
+from .models import EquipmentRowQuerySet, EquipmentTypeStats, row_payload
+from .rows import iter_value_batches
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+API_FIELDS = EquipmentRowQuerySet.API_FIELDS
+
+TABLES = ("rows", "type_stats")
+
+STATS_COLUMNS = tuple(
+    f"{metric}_{stat}"
+    for metric in EquipmentTypeStats.METRICS
+    for stat in EquipmentTypeStats.STATS
+)
+
+# Rows per Parquet row group; several export batches are written together
+PARQUET_ROW_GROUP_SIZE = 128 * 1024
+
+
+# =====================
+# BATCHES
+# =====================
+def iter_row_batches(queryset, batch_size=None):
+    """Yield lists of API row dicts in id order, ``batch_size`` at a time."""
+    for batch in iter_value_batches(queryset, API_FIELDS, batch_size):
+        yield [row_payload(*row[1:]) for row in batch]
+
+
+def type_stats_rows(dataset):
+    """Per-type statistics as flat dicts, one per type."""
+    return list(
+        dataset.type_stats.order_by("type").values("type", "count", *STATS_COLUMNS)
+    )
+
+
+# =====================
+# JSON / NDJSON
+# =====================
+def stream_json(batches):
+    """One JSON array, emitted as fragments."""
+    yield b"["
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        chunk = json.dumps(batch)[1:-1]
+        yield (chunk if first else "," + chunk).encode()
+        first = False
+    yield b"]"
+
+
+def stream_ndjson(batches):
+    """One JSON object per line."""
+    for batch in batches:
+        if batch:
+            yield ("\n".join(json.dumps(row) for row in batch) + "\n").encode()
+
+
+# =====================
+# ARROW / PARQUET
+# =====================
+class _Drain(io.RawIOBase):
+    """Write-only sink whose contents are taken out after every batch."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _type_dictionary(dataset):
+    return pyarrow.array(
+        sorted(dataset.type_stats.values_list("type", flat=True)),
+        pyarrow.string(),
+    )
+
+
+def _dictionary_type():
+    return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+
+
+def row_schema():
+    return pyarrow.schema([
+        ("equipmentName", pyarrow.string()),
+        ("type", _dictionary_type()),
+        ("flowrate", pyarrow.float64()),
+        ("pressure", pyarrow.float64()),
+        ("temperature", pyarrow.float64()),
+    ])
+
+
+def type_stats_schema():
+    return pyarrow.schema(
+        [("type", _dictionary_type()), ("count", pyarrow.int64())]
+        + [(column, pyarrow.float64()) for column in STATS_COLUMNS]
+    )
+
+
+def row_record_batches(dataset, queryset, batch_size=None):
+    dictionary = _type_dictionary(dataset)
+    codes = {type_: code for code, type_ in enumerate(dictionary.to_pylist())}
+    schema = row_schema()
+
+    for batch in iter_value_batches(queryset, API_FIELDS, batch_size):
+        _, names, types, flowrates, pressures, temperatures = zip(*batch)
+        type_column = pyarrow.DictionaryArray.from_arrays(
+            pyarrow.array([codes[type_] for type_ in types], pyarrow.int32()),
+            dictionary,
+        )
+        yield pyarrow.record_batch(
+            [
+                pyarrow.array(names, pyarrow.string()),
+                type_column,
+                pyarrow.array(flowrates, pyarrow.float64()),
+                pyarrow.array(pressures, pyarrow.float64()),
+                pyarrow.array(temperatures, pyarrow.float64()),
+            ],
+            schema=schema,
+        )
+
+
+def type_stats_record_batches(dataset):
+    rows = type_stats_rows(dataset)
+    if rows:
+        yield pyarrow.RecordBatch.from_pylist(rows, schema=type_stats_schema())
+
+
+def stream_arrow(batches, schema):
+    sink = _Drain()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def stream_parquet(batches, schema):
+    sink = _Drain()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    pending, pending_rows = [], 0
+
+    def flush():
+        writer.write_table(
+            pyarrow.Table.from_batches(pending, schema=schema),
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+        )
+
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= PARQUET_ROW_GROUP_SIZE:
+            flush()
+            pending, pending_rows = [], 0
+            yield sink.take()
+
+    if pending:
+        flush()
+    writer.close()
+    yield sink.take()
+
+
+# =====================
+# ENTRY POINT
+# =====================
+FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_stream(dataset, table, format, queryset=None):
+    """
+    ``(chunks, content_type)`` for exporting ``table`` of ``dataset``;
+    ``queryset`` narrows the rows (defaults to all of them).
+    """
+    if queryset is None:
+        queryset = dataset.rows.all()
+
+    if format in ("json", "ndjson"):
+        if table == "rows":
+            batches = iter_row_batches(queryset)
+        else:
+            batches = [type_stats_rows(dataset)]
+        stream = stream_json if format == "json" else stream_ndjson
+        return stream(batches), FORMATS[format]
+
+    if table == "rows":
+        batches, schema = row_record_batches(dataset, queryset), row_schema()
+    else:
+        batches, schema = type_stats_record_batches(dataset), type_stats_schema()
+    stream = stream_arrow if format == "arrow" else stream_parquet
+    return stream(batches, schema), FORMATS[format]
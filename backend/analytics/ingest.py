@@ -0,0 +1,641 @@
+import io
+import math
+from collections import Counter
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .compression import decompressed
+from .exceptions import CSVIngestError
+from .models import EquipmentDataset, EquipmentRow, EquipmentTypeStats, TrendPoint, ordered_distribution
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+
+REQUIRED_COLUMNS = [
+    "Equipment Name",
+    "Type",
+    "Flowrate",
+    "Pressure",
+    "Temperature",
+]
+
+METRIC_COLUMNS = ["Flowrate", "Pressure", "Temperature"]
+
+# CSV column -> key used in API rows
+ROW_FIELDS = {
+    "Equipment Name": "equipmentName",
+    "Type": "type",
+    "Flowrate": "flowrate",
+    "Pressure": "pressure",
+    "Temperature": "temperature",
+}
+
+TEXT_COLUMNS = ["Equipment Name", "Type"]
+
+TEXT_DTYPES = {col: "str" for col in TEXT_COLUMNS}
+
+# Longest value each text column may hold: the rows, type stats and
+# trend points store them in varchar columns
+MAX_TEXT_LENGTH = {
+    "Equipment Name": EquipmentRow._meta.get_field("equipment_name").max_length,
+    "Type": min(
+        model._meta.get_field("type").max_length
+        for model in (EquipmentRow, EquipmentTypeStats, TrendPoint)
+    ),
+}
+
+# Per-type quantiles stored in EquipmentTypeStats
+QUANTILES = {"p50": 0.5, "p95": 0.95}
+
+
+# ============================
+# Parsing
+# ============================
+def check_columns(df):
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            raise CSVIngestError(f"Missing column: {col}")
+
+
+def check_text_lengths(df):
+    """Reject values the database would refuse instead of failing mid-insert."""
+    for col, limit in MAX_TEXT_LENGTH.items():
+        too_long = df[col].astype(str).str.len() > limit
+        if too_long.any():
+            value = str(df[col][too_long].iloc[0])
+            raise CSVIngestError(
+                f"{col} values can be at most {limit} characters, got '{value[:40]}...'"
+            )
+
+
+def to_float(column):
+    """
+    A metric column as float64, with NaN where a value isn't a number.
+    Numbers are converted to the nearest double, like the parsers are set
+    up to do, so a column with a stray bad value still sums the same.
+    """
+    if column.dtype.kind in "biuf":
+        # Whole-number columns parse as int64; summaries expect float64
+        return column.astype("float64", copy=False)
+
+    # to_numeric finds the numbers but can be an ulp off converting them
+    numeric = pd.to_numeric(column, errors="coerce").notna()
+    values = pd.Series(np.nan, index=column.index)
+    try:
+        values[numeric] = column[numeric].astype("float64")
+    except ValueError:
+        return pd.to_numeric(column, errors="coerce").astype("float64", copy=False)
+    return values
+
+
+def clean_frame(df):
+    """Coerce the metric columns to floats and drop rows that don't parse."""
+    for col in METRIC_COLUMNS:
+        df[col] = to_float(df[col])
+
+    df = df.dropna(subset=METRIC_COLUMNS)
+    check_text_lengths(df)
+    return df
+
+
+def csv_engine():
+    """The configured pandas parser; ``auto`` means pyarrow when installed."""
+    engine = settings.ANALYTICS_CSV_ENGINE
+    if engine == "auto":
+        return "pyarrow" if pyarrow is not None else "c"
+    return engine
+
+
+def rewind(file):
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+
+def is_required_column(name):
+    return name in REQUIRED_COLUMNS
+
+
+# read_csv options per engine. pyarrow only takes a list of columns and
+# refuses one the file lacks; the others take a filter and leave that to
+# check_columns. Floats must come out as the nearest double, as pyarrow
+# and the C parser's round_trip give them: anything an ulp off would make
+# streamed and in-memory uploads of one file summarize differently.
+ENGINE_OPTIONS = {
+    "pyarrow": {"usecols": REQUIRED_COLUMNS},
+    "c": {"usecols": is_required_column, "float_precision": "round_trip"},
+    # Its float conversion can't be made exact, so to_float does it
+    "python": {"usecols": is_required_column, "dtype": {col: "str" for col in REQUIRED_COLUMNS}},
+}
+
+
+def check_header(file):
+    """Validate the header row without parsing the rest of the file."""
+    try:
+        header = pd.read_csv(file, nrows=0)
+    except CSVIngestError:
+        raise
+    except Exception:
+        raise CSVIngestError("Invalid CSV file")
+
+    check_columns(header)
+
+
+def read_frame(file, engine=None):
+    """
+    Read a whole upload into one validated, cleaned frame in a single pass.
+
+    Only the required columns are parsed, the text ones as strings. The
+    metrics are left to the parser and coerced once by ``clean_frame``, so
+    a value that isn't a number drops its row without a second read. The
+    header is checked on the parsed frame.
+
+    Compressed uploads are decompressed on the fly.
+    """
+    engine = engine or csv_engine()
+    file = decompressed(file)
+    try:
+        df = pd.read_csv(file, engine=engine, **{"dtype": TEXT_DTYPES, **ENGINE_OPTIONS[engine]})
+    except KeyError:
+        # Only pyarrow gets here, and only on a failed upload: name the column
+        rewind(file)
+        check_header(file)
+        raise CSVIngestError("Invalid CSV file")
+    except CSVIngestError:
+        raise
+    except Exception:
+        raise CSVIngestError("Invalid CSV file")
+
+    check_columns(df)
+    return clean_frame(df)
+
+
+def parse_source(source):
+    """
+    Process-pool entry point for batch uploads: a file path or raw bytes
+    in, ``(cleaned frame, summary)`` out.
+    """
+    if isinstance(source, bytes):
+        df = read_frame(io.BytesIO(source))
+    else:
+        with open(source, "rb") as f:
+            df = read_frame(f)
+
+    return df, frame_summary(df)
+
+
+def iter_clean_chunks(file, chunksize=None):
+    """
+    Yield validated, cleaned DataFrames of at most ``chunksize`` rows.
+
+    Only one chunk is alive at a time, so peak memory depends on the
+    chunk size and not on the size of the upload.
+    """
+    chunksize = chunksize or settings.ANALYTICS_CHUNK_SIZE
+    file = decompressed(file)
+
+    # pyarrow can't read in chunks, so this is always the C parser. A file
+    # with only a header still yields one empty chunk, so every upload has
+    # its columns checked.
+    try:
+        reader = pd.read_csv(
+            file,
+            chunksize=chunksize,
+            dtype=TEXT_DTYPES,
+            **ENGINE_OPTIONS["c"],
+        )
+    except CSVIngestError:
+        raise
+    except Exception:
+        raise CSVIngestError("Invalid CSV file")
+
+    with reader:
+        while True:
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                return
+            except CSVIngestError:
+                raise
+            except Exception:
+                raise CSVIngestError("Invalid CSV file")
+
+            check_columns(chunk)
+            yield clean_frame(chunk)
+
+
+def column_lists(df):
+    """
+    The five row columns as plain Python lists, converted column-wise:
+    ``str`` for the text columns and ``float`` for the metrics.
+    """
+    columns = []
+    for col in ROW_FIELDS:
+        if col in TEXT_COLUMNS:
+            values = df[col].to_numpy(dtype=object).astype(str)
+        else:
+            values = df[col].to_numpy(dtype="float64")
+        columns.append(values.tolist())
+    return columns
+
+
+def frame_to_rows(df):
+    """
+    Build the API row dicts from whole columns and zip them together,
+    instead of going through ``iterrows()`` and boxing every cell.
+    """
+    keys = list(ROW_FIELDS.values())
+    return [dict(zip(keys, values)) for values in zip(*column_lists(df))]
+
+
+# ============================
+# Aggregation
+# ============================
+class ExactSum:
+    """
+    Exact sum of float64 values, fed an array at a time.
+
+    Every finite double is an integer mantissa times a power of two, so the
+    mantissas are summed as integers per exponent and kept as a Fraction.
+    The result does not depend on how the values were split into chunks,
+    which is what lets the streaming and in-memory paths agree bit for bit.
+    """
+
+    # Mantissas are split in two halves so int64 sums cannot overflow
+    _HALF = 26
+
+    def __init__(self):
+        self._total = Fraction(0)
+        # Sum of inf/nan values, which have no exact form
+        self._special = 0.0
+
+    def add(self, values):
+        values = np.asarray(values, dtype="float64")
+        finite = np.isfinite(values)
+        if not finite.all():
+            self._special += float(values[~finite].sum())
+            values = values[finite]
+
+        mantissas, exponents = np.frexp(values)
+        # frexp mantissas lie in [0.5, 1): times 2**53 they are exact integers
+        integers = (mantissas * 2.0 ** 53).astype(np.int64)
+        for exponent in np.unique(exponents):
+            group = integers[exponents == exponent]
+            high = int((group >> self._HALF).sum())
+            low = int((group & ((1 << self._HALF) - 1)).sum())
+            self._total += Fraction((high << self._HALF) + low) * Fraction(2) ** (int(exponent) - 53)
+
+    def mean(self, count):
+        """Correctly rounded mean over ``count`` values."""
+        if not count:
+            return float("nan")
+        if self._special or math.isnan(self._special):
+            return self._special / count
+        return float(self._total / count)
+
+
+class RunningSummary:
+    """
+    Row count, metric means and type distribution built up chunk by chunk.
+
+    Means are kept as exact sums (``ExactSum``), so they are identical to
+    ``frame_summary`` over the whole file however it was chunked.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.type_counts = Counter()
+        self._sums = {col: ExactSum() for col in METRIC_COLUMNS}
+
+    def update(self, df):
+        self.total += len(df)
+        self.type_counts.update(df["Type"].value_counts().to_dict())
+
+        for col in METRIC_COLUMNS:
+            self._sums[col].add(df[col].to_numpy())
+
+    def mean(self, col):
+        return self._sums[col].mean(self.total)
+
+    def as_dict(self):
+        return {
+            "total_equipment": self.total,
+            "avg_flowrate": self.mean("Flowrate"),
+            "avg_pressure": self.mean("Pressure"),
+            "avg_temperature": self.mean("Temperature"),
+            "type_distribution": ordered_distribution(self.type_counts),
+        }
+
+
+def frame_summary(df):
+    """Summary of a whole cleaned frame held in memory."""
+    summary = RunningSummary()
+    summary.update(df)
+    return summary.as_dict()
+
+
+def combine_summaries(summaries):
+    """Overall summary of several datasets, weighting means by row count."""
+    total = sum(s["total_equipment"] for s in summaries)
+    type_counts = Counter()
+    for s in summaries:
+        type_counts.update(s["type_distribution"])
+
+    def mean(field):
+        if not total:
+            return float("nan")
+        return math.fsum(
+            s[field] * s["total_equipment"]
+            for s in summaries
+            if s["total_equipment"]
+        ) / total
+
+    return {
+        "total_equipment": total,
+        "avg_flowrate": mean("avg_flowrate"),
+        "avg_pressure": mean("avg_pressure"),
+        "avg_temperature": mean("avg_temperature"),
+        "type_distribution": ordered_distribution(type_counts),
+    }
+
+
+def nan_to_none(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def frame_type_stats(df):
+    """
+    Per-type count, mean, min, max, sample std and quantiles of each metric,
+    from one groupby over the cleaned frame.
+    """
+    # Group on the same str() form of the type that the rows store
+    types = df["Type"].to_numpy(dtype=object).astype(str)
+    grouped = df.groupby(types, sort=False)[METRIC_COLUMNS]
+
+    moments = grouped.agg(["count", "mean", "min", "max", "std"])
+    quantiles = grouped.quantile(list(QUANTILES.values()))
+
+    stats = {}
+    for type_, row in moments.iterrows():
+        entry = {"count": int(row[(METRIC_COLUMNS[0], "count")])}
+        for col in METRIC_COLUMNS:
+            entry[ROW_FIELDS[col]] = {
+                "mean": float(row[(col, "mean")]),
+                "min": float(row[(col, "min")]),
+                "max": float(row[(col, "max")]),
+                "std": nan_to_none(row[(col, "std")]),
+                **{
+                    name: float(quantiles.loc[(type_, q), col])
+                    for name, q in QUANTILES.items()
+                },
+            }
+        stats[type_] = entry
+
+    return stats
+
+
+def db_quantile(queryset, field, q, count):
+    """Linearly interpolated quantile (as pandas) read with an OFFSET query."""
+    position = q * (count - 1)
+    lower = math.floor(position)
+    values = list(
+        queryset.order_by(field).values_list(field, flat=True)[lower:lower + 2]
+    )
+
+    if len(values) == 1:
+        return values[0]
+    return values[0] + (values[1] - values[0]) * (position - lower)
+
+
+class RunningTypeStats:
+    """
+    Per-type count, mean, min, max and std merged chunk by chunk (Chan et
+    al.'s parallel variance update), for the streaming ingest. Quantiles
+    need every value, so they are read back from the stored rows instead.
+    """
+
+    def __init__(self):
+        # type -> metric column -> [count, mean, M2, min, max]
+        self._groups = {}
+
+    def update(self, df):
+        types = df["Type"].to_numpy(dtype=object).astype(str)
+        grouped = df.groupby(types, sort=False)[METRIC_COLUMNS]
+        moments = grouped.agg(["count", "mean", "var", "min", "max"])
+
+        for type_, row in moments.iterrows():
+            group = self._groups.setdefault(type_, {})
+            for col in METRIC_COLUMNS:
+                n = int(row[(col, "count")])
+                mean = float(row[(col, "mean")])
+                m2 = float(row[(col, "var")]) * (n - 1) if n > 1 else 0.0
+
+                if col not in group:
+                    group[col] = [n, mean, m2, float(row[(col, "min")]), float(row[(col, "max")])]
+                    continue
+
+                n_a, mean_a, m2_a, min_a, max_a = group[col]
+                total = n_a + n
+                delta = mean - mean_a
+                group[col] = [
+                    total,
+                    mean_a + delta * n / total,
+                    m2_a + m2 + delta * delta * n_a * n / total,
+                    min(min_a, float(row[(col, "min")])),
+                    max(max_a, float(row[(col, "max")])),
+                ]
+
+    def as_dict(self, quantile):
+        """``quantile(type, metric, q, count)`` supplies the quantiles."""
+        stats = {}
+        for type_, group in self._groups.items():
+            count = group[METRIC_COLUMNS[0]][0]
+            entry = {"count": count}
+            for col in METRIC_COLUMNS:
+                n, mean, m2, low, high = group[col]
+                metric = ROW_FIELDS[col]
+                entry[metric] = {
+                    "mean": mean,
+                    "min": low,
+                    "max": high,
+                    "std": math.sqrt(m2 / (n - 1)) if n > 1 else None,
+                    **{
+                        name: quantile(type_, metric, q, n)
+                        for name, q in QUANTILES.items()
+                    },
+                }
+            stats[type_] = entry
+        return stats
+
+
+# ============================
+# Storage
+# ============================
+def save_rows(dataset, df):
+    """``bulk_create`` the rows of a cleaned frame, one batch at a time."""
+    batch_size = settings.ANALYTICS_ROW_BATCH_SIZE
+
+    for start in range(0, len(df), batch_size):
+        names, types, flowrates, pressures, temperatures = column_lists(
+            df.iloc[start:start + batch_size]
+        )
+        EquipmentRow.objects.bulk_create([
+            EquipmentRow(
+                dataset=dataset,
+                equipment_name=name,
+                type=type_,
+                flowrate=flowrate,
+                pressure=pressure,
+                temperature=temperature,
+            )
+            for name, type_, flowrate, pressure, temperature in zip(
+                names, types, flowrates, pressures, temperatures
+            )
+        ])
+
+
+def save_type_stats(dataset, stats):
+    EquipmentTypeStats.objects.bulk_create([
+        EquipmentTypeStats(
+            dataset=dataset,
+            type=type_,
+            count=entry["count"],
+            **{
+                f"{metric}_{stat}": entry[metric][stat]
+                for metric in EquipmentTypeStats.METRICS
+                for stat in EquipmentTypeStats.STATS
+            },
+        )
+        for type_, entry in stats.items()
+    ])
+
+
+def save_trend_points(dataset, stats):
+    """One overall trend point for ``dataset`` and one per type in ``stats``."""
+    points = [
+        TrendPoint(
+            owner_id=dataset.owner_id,
+            dataset=dataset,
+            recorded_at=dataset.uploaded_at,
+            file_name=dataset.original_filename,
+            type=TrendPoint.OVERALL,
+            count=dataset.total_equipment,
+            flowrate_mean=dataset.avg_flowrate,
+            pressure_mean=dataset.avg_pressure,
+            temperature_mean=dataset.avg_temperature,
+        )
+    ]
+    points += [
+        TrendPoint(
+            owner_id=dataset.owner_id,
+            dataset=dataset,
+            recorded_at=dataset.uploaded_at,
+            file_name=dataset.original_filename,
+            type=type_,
+            count=entry["count"],
+            **{
+                f"{metric}_mean": entry[metric]["mean"]
+                for metric in EquipmentTypeStats.METRICS
+            },
+        )
+        for type_, entry in stats.items()
+    ]
+    TrendPoint.objects.bulk_create(points)
+
+
+def find_duplicate(content_hash, owner):
+    """Most recent dataset ``owner`` uploaded with the same bytes, if any."""
+    if not content_hash:
+        return None
+    return (
+        EquipmentDataset.objects
+        .owned_by(owner)
+        .filter(content_hash=content_hash)
+        .order_by("-uploaded_at")
+        .first()
+    )
+
+
+@transaction.atomic
+def save_dataset(file, summary, df, content_hash="", owner=None):
+    dataset = EquipmentDataset.objects.create(
+        owner=owner,
+        file=file,
+        original_filename=file.name,
+        content_hash=content_hash,
+        file_size=file.size or 0,
+        **summary,
+    )
+    save_rows(dataset, df)
+    stats = frame_type_stats(df)
+    save_type_stats(dataset, stats)
+    save_trend_points(dataset, stats)
+    return dataset
+
+
+@transaction.atomic
+def save_dataset_streaming(
+    file,
+    original_filename=None,
+    chunksize=None,
+    progress=None,
+    content_hash="",
+    owner=None,
+):
+    """
+    Stream ``file`` into a new dataset chunk by chunk.
+
+    Rows are written as each chunk is parsed and only running totals are
+    kept, so memory stays flat however large the file is. ``file`` may be an
+    upload or an already stored ``FieldFile``, which the dataset then reuses.
+    ``progress(rows, fraction)`` is called after every chunk.
+
+    Returns ``(dataset, summary)``; a ``CSVIngestError`` rolls everything back.
+    """
+    dataset = EquipmentDataset.objects.create(
+        owner=owner,
+        original_filename=original_filename or file.name,
+        content_hash=content_hash,
+        total_equipment=0,
+        avg_flowrate=0,
+        avg_pressure=0,
+        avg_temperature=0,
+        type_distribution={},
+    )
+
+    running = RunningSummary()
+    running_types = RunningTypeStats()
+    for chunk in iter_clean_chunks(file, chunksize):
+        running.update(chunk)
+        running_types.update(chunk)
+        save_rows(dataset, chunk)
+
+        if progress:
+            progress(running.total, min(file.tell() / (file.size or 1), 1.0))
+
+    stats = running_types.as_dict(
+        lambda type_, metric, q, count: db_quantile(
+            dataset.rows.filter(type=type_), metric, q, count
+        )
+    )
+    save_type_stats(dataset, stats)
+
+    summary = running.as_dict()
+    for field, value in summary.items():
+        setattr(dataset, field, value)
+
+    # The file is only written to storage once the whole CSV has parsed
+    dataset.file = file
+    dataset.file_size = file.size or 0
+    dataset.save()
+    save_trend_points(dataset, stats)
+
+    return dataset, summary
+
@@ -0,0 +1,131 @@
+"""
+Background CSV ingestion.
+
+Uploads are stored as an ``IngestJob`` and parsed by a small in-process
+thread pool, so the request returns as soon as the file is on disk. Live
+progress goes through Django's cache because the ingest transaction keeps
+row writes invisible until it commits; point CACHES at a shared backend if
+status requests can land on a different worker process.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .ingest import CSVIngestError, save_dataset_streaming
+from .models import IngestJob
+from .retention import schedule_sweep
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def progress_key(job_id):
+    return f"analytics:ingest-job:{job_id}:progress"
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ANALYTICS_INGEST_WORKERS,
+                thread_name_prefix="ingest",
+            )
+    return _executor
+
+
+def enqueue(file, original_filename=None, content_hash="", owner=None):
+    """
+    Store ``file`` as a queued job and hand it to the pool on commit.
+    ``file`` may also be the name of a file already in storage.
+    """
+    job = IngestJob.objects.create(
+        owner=owner,
+        file=file,
+        original_filename=original_filename or file.name,
+        content_hash=content_hash,
+    )
+
+    if settings.ANALYTICS_INGEST_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, job.id))
+    else:
+        # No pool configured: ingest inline (handy for tests and debugging)
+        transaction.on_commit(lambda: run_job(job.id))
+        job.refresh_from_db()
+
+    return job
+
+
+def _run_in_worker(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Pool threads open their own connection; don't leak it
+        connection.close()
+
+
+def claim_job(job_id, statuses=(IngestJob.STATUS_QUEUED,)):
+    """
+    Mark the job running if it is still in one of ``statuses``. The check
+    and the update are one UPDATE, so of the pool and
+    ``process_ingest_jobs`` only one gets the job.
+    """
+    return IngestJob.objects.filter(id=job_id, status__in=statuses).update(
+        status=IngestJob.STATUS_RUNNING,
+        started_at=timezone.now(),
+    ) == 1
+
+
+def run_job(job_id, statuses=(IngestJob.STATUS_QUEUED,)):
+    """Ingest one job; ``None`` if someone else claimed it first."""
+    if not claim_job(job_id, statuses):
+        return None
+    job = IngestJob.objects.get(id=job_id)
+
+    def report(rows, fraction):
+        cache.set(progress_key(job.id), {"rows": rows, "progress": fraction}, 3600)
+
+    try:
+        with job.file.open("rb") as f:
+            dataset, summary = save_dataset_streaming(
+                f,
+                original_filename=job.original_filename,
+                progress=report,
+                content_hash=job.content_hash,
+                owner=job.owner,
+            )
+    except CSVIngestError as e:
+        job.status = IngestJob.STATUS_FAILED
+        job.error = str(e)
+    except Exception:
+        logger.exception("Ingest job %s failed", job.id)
+        job.status = IngestJob.STATUS_FAILED
+        job.error = "Ingestion failed"
+    else:
+        job.status = IngestJob.STATUS_SUCCEEDED
+        job.dataset = dataset
+        job.progress = 1.0
+        job.rows_processed = summary["total_equipment"]
+        schedule_sweep(job.owner_id)
+
+    job.finished_at = timezone.now()
+    job.save()
+    cache.delete(progress_key(job.id))
+
+    return job
+
+
+def job_progress(job):
+    """``(rows, fraction)`` including live progress of a running job."""
+    if job.status == IngestJob.STATUS_RUNNING:
+        live = cache.get(progress_key(job.id))
+        if live:
+            return live["rows"], live["progress"]
+    return job.rows_processed, job.progress
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.models import ChunkedUpload, EquipmentDataset, IngestJob, TrendPoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Give datasets, trend points, jobs and chunked uploads from before "
+        "uploads had owners to a user, so they show up in that user's history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User who becomes the owner.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            owner = User.objects.get(**{User.USERNAME_FIELD: options["username"]})
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        for model in (EquipmentDataset, TrendPoint, IngestJob, ChunkedUpload):
+            updated = model.objects.filter(owner__isnull=True).update(owner=owner)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {updated} assigned to {owner}")
@@ -0,0 +1,60 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from analytics.retention import (
+    RetentionPolicy,
+    delete_files,
+    delete_stale_uploads,
+    orphan_files,
+    stale_uploads,
+    sweep,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the datasets the retention policy (ANALYTICS_RETENTION_*) no "
+        "longer keeps, with their stored files. Run it from cron when "
+        "ANALYTICS_RETENTION_SWEEP is off."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+        parser.add_argument(
+            "--orphans",
+            action="store_true",
+            help=(
+                "Also delete uploaded files no dataset or pending job refers to, "
+                "and chunked uploads never completed, once untouched for "
+                "ANALYTICS_RETENTION_ORPHAN_GRACE_HOURS."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        policy = RetentionPolicy.from_settings()
+        self.stdout.write(f"Policy: {policy!r}")
+
+        result = sweep(policy, dry_run=dry_run)
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(
+            f"{verb} {result['datasets']} datasets, {result['files']} files ({result['bytes']} bytes)"
+        )
+
+        if options["orphans"]:
+            names = orphan_files()
+            if dry_run:
+                size = sum(default_storage.size(name) for name in names)
+            else:
+                size = delete_files(names)
+            self.stdout.write(f"{verb} {len(names)} orphaned files ({size} bytes)")
+
+            uploads, parts = stale_uploads()
+            size = delete_stale_uploads(uploads, parts, dry_run=dry_run)
+            self.stdout.write(
+                f"{verb} {len(uploads)} stale chunked uploads, {len(parts)} stray part files ({size} bytes)"
+            )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from analytics.jobs import run_job
+from analytics.models import IngestJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued CSV ingest jobs in this process. Use after a restart to "
+        "pick up jobs the in-process pool never got to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--include-running",
+            action="store_true",
+            help="Also re-run jobs left 'running' by a worker that died.",
+        )
+
+    def handle(self, *args, **options):
+        statuses = [IngestJob.STATUS_QUEUED]
+        if options["include_running"]:
+            statuses.append(IngestJob.STATUS_RUNNING)
+
+        job_ids = IngestJob.objects.filter(status__in=statuses).order_by("id").values_list("id", flat=True)
+
+        for job_id in list(job_ids):
+            job = run_job(job_id, statuses)
+            if job is None:
+                self.stdout.write(f"Job {job_id}: taken by another worker")
+                continue
+            self.stdout.write(f"Job {job.id}: {job.status}")
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_equipmentdataset_original_filename'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_name', models.CharField(max_length=255)),
+                ('type', models.CharField(max_length=255)),
+                ('flowrate', models.FloatField()),
+                ('pressure', models.FloatField()),
+                ('temperature', models.FloatField()),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='analytics.equipmentdataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dataset', 'type'], name='analytics_e_dataset_d99472_idx'), models.Index(fields=['dataset', 'flowrate'], name='analytics_e_dataset_f82a57_idx'), models.Index(fields=['dataset', 'pressure'], name='analytics_e_dataset_40b144_idx'), models.Index(fields=['dataset', 'temperature'], name='analytics_e_dataset_2d70a9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+BATCH_SIZE = 5000
+
+
+def data_to_rows(apps, schema_editor):
+    EquipmentDataset = apps.get_model('analytics', 'EquipmentDataset')
+    EquipmentRow = apps.get_model('analytics', 'EquipmentRow')
+
+    # One dataset's blob in memory at a time
+    for dataset in EquipmentDataset.objects.only('id', 'data').iterator(chunk_size=1):
+        batch = []
+        for row in dataset.data or []:
+            batch.append(EquipmentRow(
+                dataset_id=dataset.id,
+                equipment_name=str(row['equipmentName']),
+                type=str(row['type']),
+                flowrate=float(row['flowrate']),
+                pressure=float(row['pressure']),
+                temperature=float(row['temperature']),
+            ))
+            if len(batch) >= BATCH_SIZE:
+                EquipmentRow.objects.bulk_create(batch)
+                batch = []
+
+        if batch:
+            EquipmentRow.objects.bulk_create(batch)
+
+
+def rows_to_data(apps, schema_editor):
+    EquipmentDataset = apps.get_model('analytics', 'EquipmentDataset')
+    EquipmentRow = apps.get_model('analytics', 'EquipmentRow')
+
+    for dataset in EquipmentDataset.objects.iterator(chunk_size=1):
+        rows = EquipmentRow.objects.filter(dataset_id=dataset.id).order_by('id').values_list(
+            'equipment_name', 'type', 'flowrate', 'pressure', 'temperature'
+        )
+        dataset.data = [
+            {
+                'equipmentName': name,
+                'type': type_,
+                'flowrate': flowrate,
+                'pressure': pressure,
+                'temperature': temperature,
+            }
+            for name, type_, flowrate, pressure, temperature in rows
+        ]
+        dataset.save(update_fields=['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_equipmentrow'),
+    ]
+
+    operations = [
+        migrations.RunPython(data_to_rows, rows_to_data),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_backfill_equipmentrow'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='equipmentdataset',
+            name='data',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0009_equipmentdataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentTypeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=255)),
+                ('count', models.IntegerField()),
+                ('flowrate_mean', models.FloatField()),
+                ('flowrate_min', models.FloatField()),
+                ('flowrate_max', models.FloatField()),
+                ('flowrate_std', models.FloatField(null=True)),
+                ('flowrate_p50', models.FloatField()),
+                ('flowrate_p95', models.FloatField()),
+                ('pressure_mean', models.FloatField()),
+                ('pressure_min', models.FloatField()),
+                ('pressure_max', models.FloatField()),
+                ('pressure_std', models.FloatField(null=True)),
+                ('pressure_p50', models.FloatField()),
+                ('pressure_p95', models.FloatField()),
+                ('temperature_mean', models.FloatField()),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_std', models.FloatField(null=True)),
+                ('temperature_p50', models.FloatField()),
+                ('temperature_p95', models.FloatField()),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='type_stats', to='analytics.equipmentdataset')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dataset', 'type'), name='unique_dataset_type_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0010_equipmenttypestats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='equipmentrow',
+            name='analytics_e_dataset_d99472_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrow',
+            name='analytics_e_dataset_f82a57_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrow',
+            name='analytics_e_dataset_40b144_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrow',
+            name='analytics_e_dataset_2d70a9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrow',
+            index=models.Index(fields=['dataset', 'equipment_name', 'id'], name='analytics_e_dataset_cd627a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrow',
+            index=models.Index(fields=['dataset', 'type', 'id'], name='analytics_e_dataset_2f2b2a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrow',
+            index=models.Index(fields=['dataset', 'flowrate', 'id'], name='analytics_e_dataset_d713b7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrow',
+            index=models.Index(fields=['dataset', 'pressure', 'id'], name='analytics_e_dataset_4eb552_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrow',
+            index=models.Index(fields=['dataset', 'temperature', 'id'], name='analytics_e_dataset_2a9f5a_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0011_equipmentrow_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('type', models.CharField(blank=True, max_length=255)),
+                ('count', models.IntegerField()),
+                ('flowrate_mean', models.FloatField()),
+                ('pressure_mean', models.FloatField()),
+                ('temperature_mean', models.FloatField()),
+                ('dataset', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trend_points', to='analytics.equipmentdataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['type', 'recorded_at'], name='analytics_t_type_743ce7_idx')],
+            },
+        ),
+    ]
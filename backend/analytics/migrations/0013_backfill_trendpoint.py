@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+def datasets_to_trend_points(apps, schema_editor):
+    EquipmentDataset = apps.get_model('analytics', 'EquipmentDataset')
+    TrendPoint = apps.get_model('analytics', 'TrendPoint')
+
+    # Summary columns and stored type stats only; no rows are read
+    for dataset in EquipmentDataset.objects.prefetch_related('type_stats').iterator(chunk_size=100):
+        common = {
+            'dataset_id': dataset.id,
+            'recorded_at': dataset.uploaded_at,
+            'file_name': dataset.original_filename,
+        }
+        points = [
+            TrendPoint(
+                **common,
+                type='',
+                count=dataset.total_equipment,
+                flowrate_mean=dataset.avg_flowrate,
+                pressure_mean=dataset.avg_pressure,
+                temperature_mean=dataset.avg_temperature,
+            )
+        ]
+        points += [
+            TrendPoint(
+                **common,
+                type=stats.type,
+                count=stats.count,
+                flowrate_mean=stats.flowrate_mean,
+                pressure_mean=stats.pressure_mean,
+                temperature_mean=stats.temperature_mean,
+            )
+            for stats in dataset.type_stats.all()
+        ]
+        TrendPoint.objects.bulk_create(points)
+
+
+def drop_trend_points(apps, schema_editor):
+    apps.get_model('analytics', 'TrendPoint').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0012_trendpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(datasets_to_trend_points, drop_trend_points),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:46
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def stored_file_sizes(apps, schema_editor):
+    EquipmentDataset = apps.get_model('analytics', 'EquipmentDataset')
+
+    for dataset in EquipmentDataset.objects.only('id', 'file').iterator(chunk_size=500):
+        if not dataset.file:
+            continue
+        try:
+            size = default_storage.size(dataset.file.name)
+        except OSError:
+            # File already gone; it takes no space
+            continue
+        EquipmentDataset.objects.filter(id=dataset.id).update(file_size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0013_backfill_trendpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='file_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(stored_file_sizes, migrations.RunPython.noop),
+    ]
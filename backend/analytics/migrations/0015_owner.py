@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0014_equipmentdataset_file_size'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trendpoint',
+            name='analytics_t_type_743ce7_idx',
+        ),
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='owner',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='owner',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='datasets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='owner',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='trendpoint',
+            name='owner',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='equipmentdataset',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentdataset',
+            index=models.Index(fields=['owner', 'uploaded_at', 'id'], name='analytics_e_owner_i_07f2cc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentdataset',
+            index=models.Index(fields=['owner', 'content_hash'], name='analytics_e_owner_i_6a54b4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendpoint',
+            index=models.Index(fields=['owner', 'type', 'recorded_at'], name='analytics_t_owner_i_23f8f2_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0015_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='equipmentdataset',
+            name='analytics_e_owner_i_6a54b4_idx',
+        ),
+        migrations.AddIndex(
+            model_name='equipmentdataset',
+            index=models.Index(fields=['owner', 'content_hash', 'uploaded_at'], name='analytics_e_owner_i_f0f1f2_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+import math
+
+import pandas as pd
+from django.db import migrations
+
+METRICS = ('flowrate', 'pressure', 'temperature')
+QUANTILES = {'p50': 0.5, 'p95': 0.95}
+
+
+def rows_to_type_stats(apps, schema_editor):
+    """
+    Type stats (and the per-type trend points built from them) for datasets
+    uploaded before 0010, computed from their stored rows the way ingest
+    computes them from the parsed frame.
+    """
+    EquipmentDataset = apps.get_model('analytics', 'EquipmentDataset')
+    EquipmentRow = apps.get_model('analytics', 'EquipmentRow')
+    EquipmentTypeStats = apps.get_model('analytics', 'EquipmentTypeStats')
+    TrendPoint = apps.get_model('analytics', 'TrendPoint')
+
+    datasets = (
+        EquipmentDataset.objects
+        .filter(type_stats__isnull=True)
+        .only('id', 'owner_id', 'uploaded_at', 'original_filename')
+    )
+    # One dataset's rows in memory at a time
+    for dataset in datasets.iterator(chunk_size=1):
+        df = pd.DataFrame.from_records(
+            EquipmentRow.objects
+            .filter(dataset_id=dataset.id)
+            .values_list('type', *METRICS)
+            .iterator(chunk_size=5000),
+            columns=['type', *METRICS],
+        )
+        if df.empty:
+            continue
+
+        grouped = df.groupby('type', sort=False)[list(METRICS)]
+        moments = grouped.agg(['count', 'mean', 'min', 'max', 'std'])
+        quantiles = grouped.quantile(list(QUANTILES.values()))
+
+        stats = []
+        points = []
+        for type_, row in moments.iterrows():
+            count = int(row[(METRICS[0], 'count')])
+            fields = {}
+            for metric in METRICS:
+                std = float(row[(metric, 'std')])
+                fields.update({
+                    f'{metric}_mean': float(row[(metric, 'mean')]),
+                    f'{metric}_min': float(row[(metric, 'min')]),
+                    f'{metric}_max': float(row[(metric, 'max')]),
+                    f'{metric}_std': None if math.isnan(std) else std,
+                    **{
+                        f'{metric}_{name}': float(quantiles.loc[(type_, q), metric])
+                        for name, q in QUANTILES.items()
+                    },
+                })
+
+            stats.append(EquipmentTypeStats(dataset_id=dataset.id, type=type_, count=count, **fields))
+            # 0013 could only record the overall point for these datasets
+            points.append(TrendPoint(
+                owner_id=dataset.owner_id,
+                dataset_id=dataset.id,
+                recorded_at=dataset.uploaded_at,
+                file_name=dataset.original_filename,
+                type=type_,
+                count=count,
+                **{f'{metric}_mean': fields[f'{metric}_mean'] for metric in METRICS},
+            ))
+
+        EquipmentTypeStats.objects.bulk_create(stats)
+        TrendPoint.objects.bulk_create(points)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0016_equipmentdataset_owner_content_hash_uploaded_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(rows_to_type_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+import logging
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+# Models that gained an owner in 0015
+OWNED = ('EquipmentDataset', 'TrendPoint', 'IngestJob', 'ChunkedUpload')
+
+
+def legacy_rows_to_owner(apps, schema_editor):
+    """
+    Rows from before 0015 have no owner, so no user can see them. They go
+    to the user named by ANALYTICS_LEGACY_OWNER. Without it they stay
+    unowned until ``manage.py analytics_assign_owner`` gives them to
+    someone.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    models = [apps.get_model('analytics', name) for name in OWNED]
+
+    username = os.environ.get('ANALYTICS_LEGACY_OWNER')
+    if not username:
+        unowned = models[0].objects.filter(owner__isnull=True).count()
+        if unowned:
+            logger.warning(
+                "%d datasets have no owner; set ANALYTICS_LEGACY_OWNER or run "
+                "'manage.py analytics_assign_owner <username>' to assign them",
+                unowned,
+            )
+        return
+
+    # Historical models don't carry USERNAME_FIELD; the field name is the
+    # current model's
+    lookup = {get_user_model().USERNAME_FIELD: username}
+    owner = User.objects.filter(**lookup).first()
+    if owner is None:
+        raise LookupError(f"ANALYTICS_LEGACY_OWNER: no user named {username!r}")
+
+    for model in models:
+        model.objects.filter(owner__isnull=True).update(owner=owner)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0017_backfill_equipmenttypestats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(legacy_rows_to_owner, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,47 @@
+from django.conf import settings
 from django.db import models
 
 
+def ordered_distribution(distribution):
+    """
+    Type counts, most common first and ties by name. PostgreSQL stores
+    JSONField as jsonb, which does not keep key order, so the order is
+    fixed here rather than relied on from the database.
+    """
+    return dict(sorted(distribution.items(), key=lambda item: (-item[1], str(item[0]))))
+
+
+class EquipmentDatasetQuerySet(models.QuerySet):
+    SUMMARY_FIELDS = (
+        "id",
+        "original_filename",
+        "uploaded_at",
+        "total_equipment",
+        "avg_flowrate",
+        "avg_pressure",
+        "avg_temperature",
+        "type_distribution",
+    )
+
+    def summaries(self):
+        """Only the columns a summary payload needs, with type stats prefetched."""
+        return self.only(*self.SUMMARY_FIELDS).prefetch_related("type_stats")
+
+    def owned_by(self, user):
+        return self.filter(owner=user)
+
+
 class EquipmentDataset(models.Model):
+    # Null only for datasets uploaded before uploads had owners and not yet
+    # given to a user (migration 0018, `manage.py analytics_assign_owner`).
+    # Lookups by owner use the composite indexes in Meta.
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="datasets",
+        db_index=False,
+    )
     file = models.FileField(upload_to="uploads/")
     original_filename = models.CharField(
         max_length=255,
@@ -18,8 +58,317 @@ class EquipmentDataset(models.Model):
     # Stores count per equipment type
     type_distribution = models.JSONField()
 
-    # Stores full CSV rows
-    data = models.JSONField(default=list)
+    # SHA-256 of the uploaded bytes, for skipping repeat uploads
+    content_hash = models.CharField(max_length=64, blank=True)
+    # Bytes of the stored file, for the retention byte budget
+    file_size = models.BigIntegerField(default=0)
+
+    objects = EquipmentDatasetQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # A user's history, newest first, and retention's walk over it
+            models.Index(fields=["owner", "uploaded_at", "id"]),
+            # Duplicate check: equality on both, newest match first
+            models.Index(fields=["owner", "content_hash", "uploaded_at"]),
+        ]
+
+    def type_stats_payload(self):
+        """Per-type statistics keyed by type (uses prefetched stats if any)."""
+        return {stats.type: stats.as_api() for stats in self.type_stats.all()}
+
+    def as_api(self):
+        """Summary payload of the history/dataset endpoints (no rows)."""
+        return {
+            "id": self.id,
+            "fileName": self.original_filename,
+            "uploadDate": self.uploaded_at.isoformat(),
+            **self.summary(),
+            "type_stats": self.type_stats_payload(),
+        }
+
+    def summary(self):
+        return {
+            "total_equipment": self.total_equipment,
+            "avg_flowrate": self.avg_flowrate,
+            "avg_pressure": self.avg_pressure,
+            "avg_temperature": self.avg_temperature,
+            "type_distribution": ordered_distribution(self.type_distribution),
+        }
 
     def __str__(self):
         return f"{self.original_filename} ({self.id})"
+
+
+def row_payload(name, type_, flowrate, pressure, temperature):
+    return {
+        "equipmentName": name,
+        "type": type_,
+        "flowrate": flowrate,
+        "pressure": pressure,
+        "temperature": temperature,
+    }
+
+
+class EquipmentRowQuerySet(models.QuerySet):
+    API_FIELDS = ("equipment_name", "type", "flowrate", "pressure", "temperature")
+
+    def as_api_rows(self):
+        """Rows in the format the upload/rows endpoints return."""
+        return [
+            row_payload(*values)
+            for values in self.values_list(*self.API_FIELDS).order_by("id")
+        ]
+
+
+class EquipmentRow(models.Model):
+    """One CSV row of an uploaded dataset."""
+
+    dataset = models.ForeignKey(
+        EquipmentDataset,
+        on_delete=models.CASCADE,
+        related_name="rows",
+    )
+
+    equipment_name = models.CharField(max_length=255)
+    type = models.CharField(max_length=255)
+    flowrate = models.FloatField()
+    pressure = models.FloatField()
+    temperature = models.FloatField()
+
+    objects = EquipmentRowQuerySet.as_manager()
+
+    class Meta:
+        # Row queries are always scoped to one dataset. The trailing id
+        # keeps keyset pagination (sort value, id) a pure index seek.
+        indexes = [
+            models.Index(fields=["dataset", "equipment_name", "id"]),
+            models.Index(fields=["dataset", "type", "id"]),
+            models.Index(fields=["dataset", "flowrate", "id"]),
+            models.Index(fields=["dataset", "pressure", "id"]),
+            models.Index(fields=["dataset", "temperature", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_name} ({self.type})"
+
+
+class EquipmentTypeStats(models.Model):
+    """Per-type statistics of a dataset, computed once at ingest."""
+
+    METRICS = ("flowrate", "pressure", "temperature")
+    STATS = ("mean", "min", "max", "std", "p50", "p95")
+
+    dataset = models.ForeignKey(
+        EquipmentDataset,
+        on_delete=models.CASCADE,
+        related_name="type_stats",
+    )
+    type = models.CharField(max_length=255)
+    count = models.IntegerField()
+
+    flowrate_mean = models.FloatField()
+    flowrate_min = models.FloatField()
+    flowrate_max = models.FloatField()
+    # Sample std; null for a type with a single row
+    flowrate_std = models.FloatField(null=True)
+    flowrate_p50 = models.FloatField()
+    flowrate_p95 = models.FloatField()
+
+    pressure_mean = models.FloatField()
+    pressure_min = models.FloatField()
+    pressure_max = models.FloatField()
+    pressure_std = models.FloatField(null=True)
+    pressure_p50 = models.FloatField()
+    pressure_p95 = models.FloatField()
+
+    temperature_mean = models.FloatField()
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_std = models.FloatField(null=True)
+    temperature_p50 = models.FloatField()
+    temperature_p95 = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dataset", "type"],
+                name="unique_dataset_type_stats",
+            ),
+        ]
+
+    def as_api(self):
+        return {
+            "count": self.count,
+            **{
+                metric: {
+                    stat: getattr(self, f"{metric}_{stat}")
+                    for stat in self.STATS
+                }
+                for metric in self.METRICS
+            },
+        }
+
+    def __str__(self):
+        return f"{self.type} stats ({self.dataset_id})"
+
+
+class TrendPoint(models.Model):
+    """
+    Count and metric means of one upload, overall or for one type.
+
+    Written at ingest next to the dataset and kept when the dataset is
+    pruned, so trends cover every upload ever made without reading rows.
+    """
+
+    # ``type`` of the point covering every row of the upload
+    OVERALL = ""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+    )
+    dataset = models.ForeignKey(
+        EquipmentDataset,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="trend_points",
+    )
+    # Upload time of the dataset
+    recorded_at = models.DateTimeField()
+    file_name = models.CharField(max_length=255)
+    type = models.CharField(max_length=255, blank=True)
+    count = models.IntegerField()
+
+    flowrate_mean = models.FloatField()
+    pressure_mean = models.FloatField()
+    temperature_mean = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "type", "recorded_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type or 'overall'} @ {self.recorded_at:%Y-%m-%d %H:%M} ({self.dataset_id})"
+
+
+class IngestJob(models.Model):
+    """A CSV upload waiting for, or going through, background ingestion."""
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    file = models.FileField(upload_to="uploads/")
+    original_filename = models.CharField(max_length=255)
+
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED,
+    )
+    content_hash = models.CharField(max_length=64, blank=True)
+    progress = models.FloatField(default=0)
+    rows_processed = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    dataset = models.ForeignKey(
+        EquipmentDataset,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.original_filename} [{self.status}] ({self.id})"
+
+
+class ChunkedUpload(models.Model):
+    """A resumable upload assembled from chunks PUT one at a time."""
+
+    STATUS_OPEN = "open"
+    STATUS_COMPLETE = "complete"
+
+    STATUS_CHOICES = [
+        (STATUS_OPEN, "Open"),
+        (STATUS_COMPLETE, "Complete"),
+    ]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    original_filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=STATUS_OPEN,
+    )
+    job = models.ForeignKey(
+        IngestJob,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def total_chunks(self):
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index):
+        """Expected byte length of chunk ``index`` (the last may be short)."""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"{self.original_filename} [{self.status}] ({self.id})"
+
+
+class UploadChunk(models.Model):
+    """A chunk of a ``ChunkedUpload`` that arrived with a valid checksum."""
+
+    upload = models.ForeignKey(
+        ChunkedUpload,
+        on_delete=models.CASCADE,
+        related_name="chunks",
+    )
+    index = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["upload", "index"],
+                name="unique_upload_chunk",
+            ),
+        ]
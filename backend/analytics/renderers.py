@@ -0,0 +1,33 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Lets DRF's content negotiation (``Accept`` or ``?format=``) select a
+    streamed export format. The view builds the StreamingHttpResponse
+    itself; ``render`` is only used for error payloads.
+    """
+
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data).encode()
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class ArrowStreamRenderer(StreamingRenderer):
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+
+
+class ParquetRenderer(StreamingRenderer):
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
@@ -0,0 +1,311 @@
+"""
+Dataset retention.
+
+Which uploads to keep is a policy of up to three limits, any of which may
+be off: the newest ``count`` datasets, datasets younger than ``max_age``,
+and the newest datasets whose stored files fit in ``max_bytes``. Limits
+apply to each user's datasets separately. The newest dataset is never
+removed for size alone, so an upload larger than the byte budget is not
+deleted as soon as it lands.
+
+A sweep deletes every expired dataset with one bulk delete in a single
+transaction; rows and type stats cascade with it and trend points stay.
+Stored files are deleted once that transaction commits, unless another
+dataset still uses the same file. Uploads only schedule a sweep after
+they commit (see ``schedule_sweep``), so pruning is out of the request
+path; ``manage.py analytics_retention`` runs it from cron instead.
+
+The same command can also remove what failed requests leave behind:
+stored files no dataset or job refers to, and chunked uploads that were
+never completed. Only files and uploads untouched for
+ANALYTICS_RETENTION_ORPHAN_GRACE_HOURS count, so a request still between
+writing a file and recording it is not robbed of it.
+"""
+import datetime
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ChunkedUpload, EquipmentDataset, IngestJob
+from .uploads import discard, part_path, partial_dir
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads"
+
+_executor = None
+# Owners with a background sweep queued
+_pending = set()
+_state_lock = threading.Lock()
+# One sweep at a time in this process
+_sweep_lock = threading.Lock()
+
+
+class RetentionPolicy:
+    """Limits on the datasets kept; ``None`` turns a limit off."""
+
+    def __init__(self, count=None, max_age=None, max_bytes=None):
+        self.count = count
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_settings(cls):
+        days = settings.ANALYTICS_RETENTION_MAX_AGE_DAYS
+        return cls(
+            count=settings.ANALYTICS_RETENTION_COUNT or None,
+            max_age=datetime.timedelta(days=days) if days else None,
+            max_bytes=settings.ANALYTICS_RETENTION_MAX_BYTES or None,
+        )
+
+    def __repr__(self):
+        return f"RetentionPolicy(count={self.count}, max_age={self.max_age}, max_bytes={self.max_bytes})"
+
+
+def first_expired(datasets, policy, now=None):
+    """
+    ``(uploaded_at, id)`` of the newest dataset the policy drops, or
+    ``None``. Every limit keeps a run of the newest datasets, so that one
+    and everything older than it expire together.
+    """
+    now = now or timezone.now()
+    cutoff = now - policy.max_age if policy.max_age else None
+
+    kept_bytes = 0
+    listing = datasets.order_by("-uploaded_at", "-id").values_list("id", "uploaded_at", "file_size")
+    for position, (dataset_id, uploaded_at, file_size) in enumerate(listing.iterator()):
+        kept_bytes += file_size
+        if (
+            (policy.count is not None and position >= policy.count)
+            or (cutoff is not None and uploaded_at < cutoff)
+            or (policy.max_bytes is not None and position > 0 and kept_bytes > policy.max_bytes)
+        ):
+            return uploaded_at, dataset_id
+    return None
+
+
+def expired_datasets(owner_id, policy=None, now=None):
+    """The datasets of ``owner_id`` that ``policy`` (default: the settings) no longer keeps."""
+    policy = policy or RetentionPolicy.from_settings()
+    datasets = EquipmentDataset.objects.filter(owner_id=owner_id)
+
+    boundary = first_expired(datasets, policy, now)
+    if boundary is None:
+        return datasets.none()
+    uploaded_at, dataset_id = boundary
+    return datasets.filter(
+        Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lte=dataset_id)
+    )
+
+
+def delete_files(names):
+    """Remove stored files, skipping any a dataset or pending job still uses."""
+    names = set(names)
+    names -= set(EquipmentDataset.objects.filter(file__in=names).values_list("file", flat=True))
+    names -= set(
+        IngestJob.objects
+        .filter(file__in=names, status__in=[IngestJob.STATUS_QUEUED, IngestJob.STATUS_RUNNING])
+        .values_list("file", flat=True)
+    )
+
+    reclaimed = 0
+    for name in names:
+        try:
+            size = default_storage.size(name)
+            default_storage.delete(name)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            logger.exception("Could not delete %s", name)
+            continue
+        reclaimed += size
+    return reclaimed
+
+
+def sweep(policy=None, now=None, dry_run=False, owners=None):
+    """
+    Delete the expired datasets of ``owners`` (default: every owner) and,
+    after commit, their files. Returns ``{"datasets", "files", "bytes"}``;
+    with ``dry_run`` nothing is deleted and the counts are what a sweep
+    would remove.
+    """
+    result = {"datasets": 0, "files": 0, "bytes": 0}
+    if owners is None:
+        owners = EquipmentDataset.objects.order_by().values_list("owner_id", flat=True).distinct()
+
+    with _sweep_lock, transaction.atomic():
+        victims = []
+        for owner_id in list(owners):
+            expired = expired_datasets(owner_id, policy, now)
+            if connection.features.has_select_for_update_skip_locked:
+                # A concurrent sweeper takes the rows this one has locked off its list
+                expired = expired.select_for_update(skip_locked=True)
+            victims += expired.values_list("id", "file", "file_size")
+
+        if not victims:
+            return result
+
+        ids = [dataset_id for dataset_id, _, _ in victims]
+        names = [name for _, name, _ in victims if name]
+        result.update(
+            datasets=len(ids),
+            files=len(names),
+            bytes=sum(file_size for _, _, file_size in victims),
+        )
+        if dry_run:
+            return result
+
+        EquipmentDataset.objects.filter(id__in=ids).delete()
+        transaction.on_commit(lambda: delete_files(names))
+
+    logger.info("Retention sweep removed %(datasets)s datasets (%(bytes)s bytes)", result)
+    return result
+
+
+def orphan_cutoff(now=None):
+    """Anything last modified before this may be treated as an orphan."""
+    grace = datetime.timedelta(hours=settings.ANALYTICS_RETENTION_ORPHAN_GRACE_HOURS)
+    return (now or timezone.now()) - grace
+
+
+def _modified_before(path, cutoff):
+    try:
+        modified = os.path.getmtime(path)
+    except FileNotFoundError:
+        return True
+    return datetime.datetime.fromtimestamp(modified, tz=datetime.timezone.utc) < cutoff
+
+
+def _stored_before(name, cutoff):
+    try:
+        return default_storage.get_modified_time(name) < cutoff
+    except FileNotFoundError:
+        # Deleted since the listing
+        return False
+
+
+def orphan_files(cutoff=None):
+    """
+    Files in the upload directory no dataset or unfinished job refers to,
+    last modified before ``cutoff``.
+    """
+    cutoff = cutoff or orphan_cutoff()
+    try:
+        _, stored = default_storage.listdir(UPLOAD_DIR)
+    except FileNotFoundError:
+        return []
+
+    referenced = set(EquipmentDataset.objects.values_list("file", flat=True))
+    referenced |= set(
+        IngestJob.objects
+        .filter(status__in=[IngestJob.STATUS_QUEUED, IngestJob.STATUS_RUNNING])
+        .values_list("file", flat=True)
+    )
+    return sorted(
+        name for name in (f"{UPLOAD_DIR}/{filename}" for filename in stored)
+        if name not in referenced and _stored_before(name, cutoff)
+    )
+
+
+def stale_uploads(cutoff=None):
+    """
+    ``(uploads, part files)``: open chunked uploads with no chunk written
+    since ``cutoff``, and part files left without an open upload.
+    """
+    cutoff = cutoff or orphan_cutoff()
+    open_uploads = ChunkedUpload.objects.filter(status=ChunkedUpload.STATUS_OPEN)
+
+    # A chunk write touches the part file, so its mtime is the last activity
+    uploads = [
+        upload for upload in open_uploads.filter(created_at__lt=cutoff)
+        if _modified_before(part_path(upload), cutoff)
+    ]
+
+    try:
+        names = os.listdir(partial_dir())
+    except FileNotFoundError:
+        names = []
+    owned = {f"{upload_id}.part" for upload_id in open_uploads.values_list("id", flat=True)}
+    parts = sorted(
+        path for path in (os.path.join(partial_dir(), name) for name in names if name not in owned)
+        if _modified_before(path, cutoff)
+    )
+    return uploads, parts
+
+
+def delete_stale_uploads(uploads, parts, dry_run=False):
+    """Remove stale uploads with their part files; returns the bytes reclaimed."""
+    reclaimed = 0
+    for path in [part_path(upload) for upload in uploads] + list(parts):
+        try:
+            reclaimed += os.path.getsize(path)
+        except FileNotFoundError:
+            continue
+    if dry_run:
+        return reclaimed
+
+    for upload in uploads:
+        discard(upload)
+        upload.delete()
+    for path in parts:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            logger.exception("Could not delete %s", path)
+    return reclaimed
+
+
+# =====================
+# BACKGROUND SWEEPER
+# =====================
+def _get_executor():
+    global _executor
+    with _state_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retention")
+    return _executor
+
+
+def _run_in_worker():
+    with _state_lock:
+        owners = list(_pending)
+        _pending.clear()
+    try:
+        sweep(owners=owners)
+    except Exception:
+        logger.exception("Retention sweep failed")
+    finally:
+        connection.close()
+
+
+def schedule_sweep(owner_id):
+    """
+    Sweep ``owner_id``'s datasets once the current transaction commits,
+    per ANALYTICS_RETENTION_SWEEP: on a background thread, inline, or not
+    at all (``off``: the management command runs it). Uploads that land
+    while a background sweep is still queued share that sweep.
+    """
+    mode = settings.ANALYTICS_RETENTION_SWEEP
+    if mode == "off":
+        return
+    if mode == "inline":
+        transaction.on_commit(lambda: sweep(owners=[owner_id]))
+        return
+
+    def submit():
+        with _state_lock:
+            queued = bool(_pending)
+            _pending.add(owner_id)
+        if not queued:
+            _get_executor().submit(_run_in_worker)
+
+    transaction.on_commit(submit)
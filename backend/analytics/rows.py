@@ -0,0 +1,180 @@
+"""
+Filtered, sorted and keyset-paginated access to EquipmentRow.
+
+Every page is a seek on a ``(dataset, <sort column>, id)`` index: the
+cursor carries the sort value and id of the last row served, and the next
+page starts strictly after that pair. Unlike OFFSET paging, deep pages are
+as cheap as the first one, whatever the size of the dataset.
+"""
+import base64
+import binascii
+import json
+import math
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+
+from .exceptions import RowQueryError
+from .models import EquipmentRowQuerySet, row_payload
+
+# API name -> EquipmentRow column
+SORT_FIELDS = {
+    "id": "id",
+    "equipmentName": "equipment_name",
+    "type": "type",
+    "flowrate": "flowrate",
+    "pressure": "pressure",
+    "temperature": "temperature",
+}
+
+RANGE_FIELDS = ("flowrate", "pressure", "temperature")
+
+API_FIELDS = EquipmentRowQuerySet.API_FIELDS
+
+# Sorts after any character a prefix can be followed by
+MAX_CHAR = "\U0010ffff"
+
+
+def filter_rows(queryset, params):
+    """
+    Apply the supported filters from ``params`` (a QueryDict or dict):
+
+    - ``type``: one type, or several separated by commas
+    - ``name``: equipment name prefix (case-sensitive)
+    - ``<metric>_min`` / ``<metric>_max``: inclusive ranges on
+      flowrate, pressure and temperature
+    """
+    types = params.get("type")
+    if types:
+        queryset = queryset.filter(type__in=[t for t in types.split(",") if t])
+
+    prefix = params.get("name")
+    if prefix:
+        queryset = queryset.filter(equipment_name__startswith=prefix)
+        if connections[queryset.db].vendor == "sqlite":
+            # The range lets the (dataset, equipment_name) index do the
+            # work. It relies on SQLite comparing text code point by code
+            # point; under PostgreSQL's locale collations a name with the
+            # prefix can sort outside it.
+            queryset = queryset.filter(
+                equipment_name__gte=prefix,
+                equipment_name__lt=prefix + MAX_CHAR,
+            )
+
+    for field in RANGE_FIELDS:
+        for suffix, lookup in (("min", "gte"), ("max", "lte")):
+            raw = params.get(f"{field}_{suffix}")
+            if raw in (None, ""):
+                continue
+            try:
+                value = float(raw)
+            except ValueError:
+                raise RowQueryError(f"{field}_{suffix} must be a number")
+            queryset = queryset.filter(**{f"{field}__{lookup}": value})
+
+    return queryset
+
+
+def parse_sort(raw):
+    """``"flowrate"`` / ``"-flowrate"`` -> ``("flowrate", descending)``."""
+    raw = raw or "id"
+    descending = raw.startswith("-")
+    name = raw.removeprefix("-")
+    if name not in SORT_FIELDS:
+        raise RowQueryError(
+            f"Cannot sort by '{name}'. Use one of: {', '.join(SORT_FIELDS)}"
+        )
+    return name, descending
+
+
+def encode_cursor(sort, value, row_id):
+    raw = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise RowQueryError("Invalid cursor")
+    if cursor_sort != sort or not _is_int(row_id):
+        raise RowQueryError("Cursor does not match this sort order")
+
+    name, _ = parse_sort(sort)
+    if name == "id":
+        valid = _is_int(value)
+    elif name in RANGE_FIELDS:
+        valid = _is_int(value) or (isinstance(value, float) and math.isfinite(value))
+    else:
+        valid = isinstance(value, str)
+    if not valid:
+        raise RowQueryError("Invalid cursor")
+    return value, row_id
+
+
+def _is_int(value):
+    # bool is an int subclass, but never a value a cursor was made from
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def page_rows(queryset, sort="id", cursor=None, limit=1000):
+    """
+    One page of ``queryset`` in API format and the cursor of the next page
+    (``None`` on the last one). ``sort`` is an API field name, optionally
+    prefixed with ``-`` for descending order; ties are broken on id.
+    """
+    name, descending = parse_sort(sort)
+    column = SORT_FIELDS[name]
+    after = "lt" if descending else "gt"
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort)
+        if column == "id":
+            queryset = queryset.filter(**{f"id__{after}": row_id})
+        else:
+            # (column, id) > (value, row_id), written with a plain bound on
+            # the column first so the planner can seek instead of scanning
+            queryset = queryset.filter(
+                Q(**{f"{column}__{after}e": value}),
+                Q(**{f"{column}__{after}": value}) | Q(**{f"id__{after}": row_id}),
+            )
+
+    direction = "-" if descending else ""
+    ordering = [f"{direction}id"] if column == "id" else [f"{direction}{column}", f"{direction}id"]
+
+    values = list(
+        queryset.order_by(*ordering)
+        .values_list("id", *API_FIELDS)[: limit + 1]
+    )
+    page = values[:limit]
+
+    next_cursor = None
+    if len(values) > limit:
+        last = page[-1]
+        sort_value = last[0] if column == "id" else last[1 + API_FIELDS.index(column)]
+        next_cursor = encode_cursor(sort, sort_value, last[0])
+
+    return [row_payload(*row[1:]) for row in page], next_cursor
+
+
+def iter_value_batches(queryset, fields, batch_size=None):
+    """
+    Yield ``(id, *fields)`` tuples of ``queryset`` in id order, in lists of
+    up to ``batch_size`` (default ANALYTICS_EXPORT_BATCH_SIZE), for reading
+    a whole dataset without holding all of it at once.
+    """
+    batch_size = batch_size or settings.ANALYTICS_EXPORT_BATCH_SIZE
+    last_id = 0
+
+    while True:
+        batch = list(
+            queryset.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", *fields)[:batch_size]
+        )
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        yield batch
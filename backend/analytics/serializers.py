@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import EquipmentDataset
 
@@ -9,11 +10,36 @@ class CSVUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
 
 
+# ============================
+# Chunked upload initiate serializer
+# ============================
+class ChunkedUploadSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    chunk_size = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_size(self, value):
+        if value > settings.ANALYTICS_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {settings.ANALYTICS_UPLOAD_MAX_SIZE} bytes"
+            )
+        return value
+
+    def validate_chunk_size(self, value):
+        if value > settings.ANALYTICS_UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(
+                f"Chunk size cannot exceed {settings.ANALYTICS_UPLOAD_MAX_CHUNK_SIZE} bytes"
+            )
+        return value
+
+
 # ============================
 # Dataset serializer (FULL)
 # Used for history + API responses
 # ============================
 class EquipmentDatasetSerializer(serializers.ModelSerializer):
+    data = serializers.SerializerMethodField()
+
     class Meta:
         model = EquipmentDataset
         fields = [
@@ -29,3 +55,6 @@ class EquipmentDatasetSerializer(serializers.ModelSerializer):
             "type_distribution",
             "data",
         ]
+
+    def get_data(self, obj):
+        return obj.rows.as_api_rows()
@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_dataset
+from .models import EquipmentDataset
+
+
+@receiver(post_save, sender=EquipmentDataset)
+@receiver(post_delete, sender=EquipmentDataset)
+def drop_cached_dataset(sender, instance, **kwargs):
+    dataset_id, owner_id = instance.id, instance.owner_id
+    invalidate_dataset(dataset_id, owner_id)
+    # Again once the change is visible: a request racing the ingest
+    # transaction could otherwise re-cache the old state
+    transaction.on_commit(lambda: invalidate_dataset(dataset_id, owner_id))
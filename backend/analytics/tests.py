@@ -1,3 +1,1281 @@
-from django.test import TestCase
+"""
+Query budgets and query plans for the hot endpoints.
 
-# Create your tests here.
+Upload, history, PDF, register and login are run at several dataset sizes
+and held to an upper bound on the SQL queries they issue and on the bytes
+of result rows they fetch, so an N+1 query or a stray load of a whole
+dataset fails here instead of in production. The plans of the hot queries
+are read with EXPLAIN and must keep using their indexes.
+
+    python manage.py test analytics              # SQLite
+    python manage.py test analytics --postgres   # PostgreSQL
+"""
+import bz2
+import datetime
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from fractions import Fraction
+from unittest import mock, skipUnless
+
+import django
+import numpy as np
+import pandas as pd
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.utils import CursorWrapper
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import batch
+from .aggregate import aggregate_frame, load_columns, parse_metrics
+from .caching import HISTORY_SIZE, cached_history, history_key, history_listing
+from .downsample import lttb
+from .exceptions import CSVIngestError
+from .ingest import (
+    frame_summary,
+    iter_clean_chunks,
+    pyarrow,
+    read_frame,
+    save_dataset,
+    save_dataset_streaming,
+)
+from .jobs import claim_job, enqueue, run_job
+from .models import ChunkedUpload, EquipmentDataset, EquipmentRow, EquipmentTypeStats, IngestJob, TrendPoint
+from .retention import orphan_files
+from .rows import SORT_FIELDS, encode_cursor, filter_rows
+from .uploads import UploadClosed, create_part_file, locked_part, part_path, partial_dir, write_chunk
+
+SIZES = (10, 1_000, 10_000)
+
+TYPES = ("Pump", "Valve", "Compressor", "HeatExchanger", "Reactor")
+
+# Fetched size of one equipment row: name, type and three floats
+ROW_BYTES = 64
+
+
+def make_csv(rows, seed=0):
+    """A CSV of ``rows`` equipment rows; a different ``seed`` gives different bytes."""
+    lines = ["Equipment Name,Type,Flowrate,Pressure,Temperature"]
+    for i in range(rows):
+        lines.append(
+            f"Equipment-{seed}-{i},{TYPES[i % len(TYPES)]},"
+            f"{50 + (i * 7 + seed) % 250}.5,{1 + (i * 3 + seed) % 14}.25,{20 + (i * 11 + seed) % 230}.0"
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def row_inserts(rows):
+    """INSERT statements ``bulk_create`` needs for ``rows`` equipment rows."""
+    fields = [field for field in EquipmentRow._meta.concrete_fields if not field.primary_key]
+    batch_size = min(
+        settings.ANALYTICS_ROW_BATCH_SIZE,
+        connection.ops.bulk_batch_size(fields, [None] * settings.ANALYTICS_ROW_BATCH_SIZE),
+    )
+    return math.ceil(rows / batch_size)
+
+
+def value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return 8
+
+
+class QueryBudget(CaptureQueriesContext):
+    """
+    ``CaptureQueriesContext`` that also adds up the size of every value
+    fetched from a result set in ``fetched_bytes`` (numbers and dates
+    count 8 bytes, text its UTF-8 length).
+    """
+
+    def __init__(self, connection=connection):
+        super().__init__(connection)
+        self.fetched_bytes = 0
+        self._patches = ExitStack()
+
+    def _count(self, rows):
+        for row in rows:
+            self.fetched_bytes += sum(value_size(value) for value in row)
+        return rows
+
+    def __enter__(self):
+        budget = self
+
+        # CursorWrapper hands fetch*() to the driver cursor through
+        # __getattr__; defining them on the class puts the count in between
+        def fetchone(self):
+            row = self.cursor.fetchone()
+            if row is not None:
+                budget._count([row])
+            return row
+
+        def fetchmany(self, size=None):
+            rows = self.cursor.fetchmany() if size is None else self.cursor.fetchmany(size)
+            return budget._count(rows)
+
+        def fetchall(self):
+            return budget._count(self.cursor.fetchall())
+
+        for name, method in (("fetchone", fetchone), ("fetchmany", fetchmany), ("fetchall", fetchall)):
+            self._patches.enter_context(mock.patch.object(CursorWrapper, name, method, create=True))
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        self._patches.close()
+        super().__exit__(*exc_info)
+
+    @property
+    def queries(self):
+        return len(self)
+
+    def summary(self):
+        statements = "\n".join(
+            f"{i}. {query['sql'][:200]}" for i, query in enumerate(self.captured_queries, 1)
+        )
+        return f"{self.queries} queries, {self.fetched_bytes} bytes fetched:\n{statements}"
+
+
+def index_name(model, *fields):
+    """Name of the index or unique constraint of ``model`` on exactly ``fields``."""
+    for index in [*model._meta.indexes, *model._meta.constraints]:
+        if tuple(index.fields) == fields:
+            return index.name
+    raise LookupError(f"{model.__name__} has no index on {fields}")
+
+
+def explain(sql):
+    """The plan of one captured statement, one line per plan row."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # Test tables are tiny, where a sequential scan is always
+            # cheapest; this asks whether an index *can* serve the query
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def full_scan(plan, table):
+    """Whether ``plan`` reads all of ``table`` instead of searching an index."""
+    if connection.vendor == "postgresql":
+        return f"Seq Scan on {table}" in plan
+    return any(f"SCAN {table}" in line and "USING" not in line for line in plan.splitlines())
+
+
+# Plan text of a sort the index did not provide
+SORT_MARKERS = {"sqlite": "USE TEMP B-TREE FOR ORDER BY", "postgresql": "Sort"}
+
+
+@override_settings(
+    # Private to the test process: clearing it must not touch a live cache
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "analytics-tests"}},
+    ANALYTICS_INGEST_WORKERS=0,
+    ANALYTICS_RETENTION_SWEEP="off",
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class AnalyticsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(prefix="analytics-tests-")
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("owner@example.com", "owner@example.com", "secret")
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        return client
+
+    def upload(self, rows, seed=0, mode=None, client=None):
+        url = "/api/upload/" + (f"?mode={mode}" if mode else "")
+        file = SimpleUploadedFile(f"equipment-{seed}.csv", make_csv(rows, seed), content_type="text/csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = (client or self.client).post(url, {"file": file}, format="multipart")
+        self.assertIn(response.status_code, (200, 201), getattr(response, "data", None))
+        return response
+
+    def assertWithinBudget(self, budget, queries, fetched_bytes):
+        self.assertLessEqual(budget.queries, queries, budget.summary())
+        self.assertLessEqual(budget.fetched_bytes, fetched_bytes, budget.summary())
+
+
+# =====================
+# QUERY BUDGETS
+# =====================
+class UploadBudgetTests(AnalyticsTestCase):
+    # Auth, duplicate check, dataset, type stats and trend points inserts,
+    # savepoints; plus one INSERT per batch of rows
+    QUERIES = 12
+    # Uploads never read rows back; the allowance per row covers ids the
+    # driver returns from bulk INSERTs
+    FETCHED_BYTES = 4 * 1024
+    FETCHED_BYTES_PER_ROW = 8
+
+    def test_upload(self):
+        for rows in SIZES:
+            with self.subTest(rows=rows):
+                with QueryBudget() as budget:
+                    response = self.upload(rows, seed=rows)
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(len(response.data["data"]), rows)
+                self.assertWithinBudget(
+                    budget,
+                    self.QUERIES + row_inserts(rows),
+                    self.FETCHED_BYTES + rows * self.FETCHED_BYTES_PER_ROW,
+                )
+
+    def test_streaming_upload(self):
+        # Percentiles are computed in the database, a fixed number of
+        # queries per type and metric whatever the row count
+        quantile_queries = len(TYPES) * 3 * 2 + 3 * 2
+        for rows in SIZES:
+            with self.subTest(rows=rows):
+                with QueryBudget() as budget:
+                    response = self.upload(rows, seed=rows, mode="stream")
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.data["total_equipment"], rows)
+                self.assertWithinBudget(
+                    budget,
+                    self.QUERIES + quantile_queries + row_inserts(rows),
+                    self.FETCHED_BYTES + rows * self.FETCHED_BYTES_PER_ROW,
+                )
+
+    def test_duplicate_upload(self):
+        # A repeat upload echoes the stored rows: one query for all of them
+        for rows in SIZES:
+            self.upload(rows, seed=rows)
+            with self.subTest(rows=rows):
+                with QueryBudget() as budget:
+                    response = self.upload(rows, seed=rows)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["data"]), rows)
+                self.assertWithinBudget(budget, 4, self.FETCHED_BYTES + rows * ROW_BYTES)
+
+
+class HistoryBudgetTests(AnalyticsTestCase):
+    # Auth, ETag, datasets, prefetched type stats
+    QUERIES = 4
+    # Auth and ETag only
+    CACHED_QUERIES = 2
+    # Summaries of HISTORY_SIZE datasets, whatever their row counts
+    FETCHED_BYTES = 8 * 1024
+
+    def test_history(self):
+        for rows in SIZES:
+            owner = User.objects.create_user(f"history-{rows}@example.com")
+            client = self.client_for(owner)
+            for seed in range(HISTORY_SIZE + 1):
+                self.upload(rows, seed=seed, client=client)
+
+            with self.subTest(rows=rows, cache="miss"):
+                with QueryBudget() as budget:
+                    response = client.get("/api/history/")
+                self.assertEqual(response["X-Cache"], "MISS")
+                self.assertEqual(len(response.data), HISTORY_SIZE)
+                self.assertWithinBudget(budget, self.QUERIES, self.FETCHED_BYTES)
+                self.assertFalse(
+                    [query for query in budget.captured_queries if EquipmentRow._meta.db_table in query["sql"]],
+                    "history must not touch rows",
+                )
+
+            with self.subTest(rows=rows, cache="hit"):
+                with QueryBudget() as budget:
+                    response = client.get("/api/history/")
+                self.assertEqual(response["X-Cache"], "HIT")
+                self.assertWithinBudget(budget, self.CACHED_QUERIES, 1024)
+
+            with self.subTest(rows=rows, cache="revalidate"):
+                with QueryBudget() as budget:
+                    response = client.get("/api/history/", HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(response.status_code, 304)
+                self.assertWithinBudget(budget, self.CACHED_QUERIES, 1024)
+
+
+class PdfBudgetTests(AnalyticsTestCase):
+    # Auth, ETag, dataset, rows
+    QUERIES = 4
+    FETCHED_BYTES = 4 * 1024
+
+    def test_pdf(self):
+        for rows in SIZES:
+            dataset_id = self.upload(rows, seed=rows).data["id"]
+            with self.subTest(rows=rows):
+                with QueryBudget() as budget:
+                    response = self.client.get(f"/api/pdf/{dataset_id}/")
+                    b"".join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinBudget(
+                    budget, self.QUERIES, self.FETCHED_BYTES + rows * ROW_BYTES
+                )
+
+            with self.subTest(rows=rows, revalidate=True):
+                with QueryBudget() as budget:
+                    response = self.client.get(f"/api/pdf/{dataset_id}/", HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(response.status_code, 304)
+                self.assertWithinBudget(budget, 2, 1024)
+
+
+class AuthBudgetTests(AnalyticsTestCase):
+    # Existence check, user insert, token lookup and insert, savepoints
+    REGISTER_QUERIES = 6
+    # User lookup, token lookup
+    LOGIN_QUERIES = 2
+    FETCHED_BYTES = 1024
+
+    def test_register_and_login(self):
+        # Signing in must cost the same for a user with a lot of data
+        for rows in SIZES:
+            email = f"user-{rows}@example.com"
+            client = APIClient()
+
+            with self.subTest(rows=rows, view="register"):
+                with QueryBudget() as budget:
+                    response = client.post("/api/auth/register/", {"email": email, "password": "secret"})
+                self.assertEqual(response.status_code, 201)
+                self.assertWithinBudget(budget, self.REGISTER_QUERIES, self.FETCHED_BYTES)
+
+            user = User.objects.get(username=email)
+            client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+            self.upload(rows, seed=rows, client=client)
+
+            with self.subTest(rows=rows, view="login"):
+                with QueryBudget() as budget:
+                    response = APIClient().post("/api/auth/login/", {"email": email, "password": "secret"})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["token"], user.auth_token.key)
+                self.assertWithinBudget(budget, self.LOGIN_QUERIES, self.FETCHED_BYTES)
+
+
+# =====================
+# QUERY PLANS
+# =====================
+class QueryPlanTests(AnalyticsTestCase):
+    """
+    The statements the endpoints actually run are captured and EXPLAINed;
+    each hot one must be served by the index it was given.
+    """
+
+    ROWS = 500
+
+    def setUp(self):
+        super().setUp()
+        for seed in range(3):
+            self.dataset_id = self.upload(self.ROWS, seed=seed).data["id"]
+
+    def capture(self, path, **extra):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, **extra)
+        self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+        return queries
+
+    def assertUsesIndex(self, queries, model, index=None, contains="", sorted_by_index=False):
+        """
+        Every SELECT from ``model``'s table (containing ``contains``)
+        searches ``index``, or any index when ``index`` is ``None``.
+        """
+        table = model._meta.db_table
+        statements = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith("SELECT")
+            and f"FROM {connection.ops.quote_name(table)}" in query["sql"]
+            and contains in query["sql"]
+        ]
+        self.assertTrue(statements, f"no SELECT from {table} containing {contains!r}")
+        for sql in statements:
+            plan = explain(sql)
+            self.assertFalse(full_scan(plan, table), f"full scan of {table} in\n{sql}\n\nplan:\n{plan}")
+            if index:
+                self.assertIn(index, plan, f"index {index} not used by\n{sql}\n\nplan:\n{plan}")
+            if sorted_by_index:
+                self.assertNotIn(
+                    SORT_MARKERS[connection.vendor], plan,
+                    f"{sql} sorts instead of reading {index} in order\n\nplan:\n{plan}",
+                )
+
+    def test_history(self):
+        queries = self.capture("/api/history/")
+        self.assertUsesIndex(
+            queries, EquipmentDataset, index_name(EquipmentDataset, "owner", "uploaded_at", "id"),
+            sorted_by_index=True,
+        )
+        # The prefetch may use the foreign key's index or the unique one
+        self.assertUsesIndex(queries, EquipmentTypeStats)
+
+    def test_duplicate_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.upload(self.ROWS, seed=0)
+        self.assertUsesIndex(
+            queries, EquipmentDataset, index_name(EquipmentDataset, "owner", "content_hash", "uploaded_at"),
+            contains="content_hash",
+        )
+
+    def test_retention_walk(self):
+        with self.settings(ANALYTICS_RETENTION_SWEEP="inline"), CaptureQueriesContext(connection) as queries:
+            self.upload(self.ROWS, seed=99)
+        self.assertUsesIndex(
+            queries, EquipmentDataset, index_name(EquipmentDataset, "owner", "uploaded_at", "id"),
+            contains='"file_size" AS "file_size"', sorted_by_index=True,
+        )
+
+    def test_rows_page(self):
+        for sort, field in SORT_FIELDS.items():
+            if field == "id":
+                continue
+            index = index_name(EquipmentRow, "dataset", field, "id")
+            for direction in ("", "-"):
+                url = f"/api/datasets/{self.dataset_id}/rows/?sort={direction}{sort}&limit=50"
+                with self.subTest(sort=direction + sort):
+                    cursor = self.client.get(url).data["next"]
+                    queries = self.capture(f"{url}&cursor={cursor}")
+                    self.assertUsesIndex(queries, EquipmentRow, index, sorted_by_index=True)
+
+    def test_rows_name_prefix(self):
+        queries = self.capture(f"/api/datasets/{self.dataset_id}/rows/?sort=equipmentName&name=Equipment-1-1")
+        self.assertUsesIndex(
+            queries, EquipmentRow, index_name(EquipmentRow, "dataset", "equipment_name", "id"),
+            sorted_by_index=True,
+        )
+
+    def test_trends(self):
+        queries = self.capture("/api/trends/?type=Pump,Valve")
+        self.assertUsesIndex(queries, TrendPoint, index_name(TrendPoint, "owner", "type", "recorded_at"))
+
+
+# =====================
+# INGEST JOBS
+# =====================
+class IngestJobTests(AnalyticsTestCase):
+    def queue(self):
+        file = SimpleUploadedFile("queued.csv", make_csv(10), content_type="text/csv")
+        with mock.patch("analytics.jobs.transaction.on_commit"):
+            return enqueue(file, owner=self.user)
+
+    def test_job_runs_once(self):
+        job = self.queue()
+        self.assertEqual(run_job(job.id).status, IngestJob.STATUS_SUCCEEDED)
+        # The management command or another pool thread got there second
+        self.assertIsNone(run_job(job.id))
+        self.assertEqual(EquipmentDataset.objects.count(), 1)
+
+    def test_running_job_is_not_claimed(self):
+        job = self.queue()
+        self.assertTrue(claim_job(job.id))
+        self.assertFalse(claim_job(job.id))
+        self.assertTrue(claim_job(job.id, [IngestJob.STATUS_QUEUED, IngestJob.STATUS_RUNNING]))
+
+
+# =====================
+# CHUNKED UPLOADS
+# =====================
+class ChunkedUploadTests(AnalyticsTestCase):
+    CHUNK_SIZE = 1024
+
+    def setUp(self):
+        super().setUp()
+        self.data = make_csv(100)
+
+    def start(self, size=None):
+        response = self.client.post(
+            "/api/uploads/",
+            {"filename": "chunked.csv", "size": size or len(self.data), "chunk_size": self.CHUNK_SIZE},
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def put_chunk(self, upload_id, index, data=None):
+        if data is None:
+            data = self.data[index * self.CHUNK_SIZE:(index + 1) * self.CHUNK_SIZE]
+        return self.client.put(
+            f"/api/uploads/{upload_id}/chunks/{index}/",
+            data,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256=hashlib.sha256(data).hexdigest(),
+        )
+
+    def send_all(self):
+        upload = self.start()
+        for index in range(upload["totalChunks"]):
+            self.assertEqual(self.put_chunk(upload["id"], index).status_code, 200)
+        return upload
+
+    def complete(self, upload_id, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/api/uploads/{upload_id}/complete/", data)
+
+    def test_complete_hashes_file(self):
+        upload = self.send_all()
+        self.assertEqual(self.complete(upload["id"], sha256="0" * 64).status_code, 400)
+
+        response = self.complete(upload["id"], sha256=hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(response.status_code, 202, response.data)
+        job = IngestJob.objects.get(id=response.data["id"])
+        self.assertEqual(job.content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(job.status, IngestJob.STATUS_SUCCEEDED)
+
+    def test_duplicate_is_not_ingested_again(self):
+        self.complete(self.send_all()["id"])
+        response = self.complete(self.send_all()["id"])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(EquipmentDataset.objects.count(), 1)
+        self.assertEqual(response.data["id"], EquipmentDataset.objects.get().id)
+
+    def test_bad_resend_unmarks_chunk(self):
+        upload = self.send_all()
+        bad = b"x" * self.CHUNK_SIZE
+        response = self.client.put(
+            f"/api/uploads/{upload['id']}/chunks/0/",
+            bad,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256="0" * 64,
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.complete(upload["id"])
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(0, response.data["receivedChunks"])
+
+        self.put_chunk(upload["id"], 0)
+        self.assertEqual(self.complete(upload["id"]).status_code, 202)
+
+    def test_corrupt_part_file_is_caught(self):
+        upload = self.send_all()
+        with open(part_path(ChunkedUpload.objects.get(id=upload["id"])), "r+b") as f:
+            f.seek(self.CHUNK_SIZE + 10)
+            f.write(b"#")
+
+        response = self.complete(upload["id"])
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(1, response.data["receivedChunks"])
+
+    def test_chunk_waiting_on_complete_is_refused(self):
+        upload = ChunkedUpload.objects.get(id=self.start()["id"])
+        data = self.data[:self.CHUNK_SIZE]
+        outcome = []
+
+        def put():
+            try:
+                write_chunk(upload, 0, io.BytesIO(data), hashlib.sha256(data).hexdigest())
+            except UploadClosed:
+                outcome.append("closed")
+
+        # Hold the part file the way complete does, then move it into storage
+        with locked_part(upload, exclusive=True):
+            writer = threading.Thread(target=put)
+            writer.start()
+            writer.join(0.2)
+            self.assertTrue(writer.is_alive(), "the chunk write did not wait for the lock")
+            assembled = part_path(upload) + ".assembled"
+            os.replace(part_path(upload), assembled)
+        writer.join()
+
+        self.assertEqual(outcome, ["closed"])
+        with open(assembled, "rb") as f:
+            self.assertEqual(f.read(self.CHUNK_SIZE), b"\0" * self.CHUNK_SIZE)
+
+    def test_chunk_for_missing_part_file(self):
+        upload = self.start()
+        os.remove(part_path(ChunkedUpload.objects.get(id=upload["id"])))
+        self.assertEqual(self.put_chunk(upload["id"], 0).status_code, 409)
+        self.assertEqual(self.complete(upload["id"]).status_code, 409)
+
+    def test_size_is_capped(self):
+        with self.settings(ANALYTICS_UPLOAD_MAX_SIZE=len(self.data) - 1):
+            response = self.client.post("/api/uploads/", {"filename": "big.csv", "size": len(self.data)})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("size", response.data)
+
+
+# =====================
+# BATCH UPLOADS
+# =====================
+@override_settings(ANALYTICS_BATCH_WORKERS=1)
+class BatchUploadTests(AnalyticsTestCase):
+    def post(self, *files):
+        uploads = [SimpleUploadedFile(name, data, content_type="text/csv") for name, data in files]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/upload/batch/", {"files": uploads}, format="multipart")
+        self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+        return response.data
+
+    def test_identical_files_in_one_batch(self):
+        data = self.post(("a.csv", make_csv(10)), ("b.csv", make_csv(10)), ("c.csv", make_csv(10, seed=1)))
+        self.assertEqual([f["status"] for f in data["files"]], ["created", "duplicate", "created"])
+        self.assertEqual(data["files"][0]["id"], data["files"][1]["id"])
+        self.assertEqual(EquipmentDataset.objects.count(), 2)
+        self.assertEqual(data["summary"]["total_equipment"], 20)
+        self.assertEqual(data["summary"]["files"], 3)
+        self.assertEqual(data["summary"]["failed"], 0)
+
+    def test_earlier_upload_is_not_counted_again(self):
+        self.upload(10)
+        data = self.post(("a.csv", make_csv(10)), ("b.csv", make_csv(10, seed=1)))
+        self.assertEqual([f["status"] for f in data["files"]], ["duplicate", "created"])
+        self.assertEqual(data["summary"]["total_equipment"], 10)
+
+    def test_pool_is_shared_between_requests(self):
+        batch._pool = None
+        self.addCleanup(lambda: batch._pool and batch.discard_pool(batch._pool))
+        # Threads stand in for processes; the pool is what's under test
+        with self.settings(ANALYTICS_BATCH_WORKERS=2), \
+                mock.patch("analytics.batch.ProcessPoolExecutor", side_effect=ThreadPoolExecutor) as pool_class:
+            self.post(("a.csv", make_csv(10)), ("b.csv", make_csv(10, seed=1)))
+            data = self.post(("c.csv", make_csv(10, seed=2)), ("d.csv", make_csv(10, seed=3)))
+        self.assertEqual([f["status"] for f in data["files"]], ["created", "created"])
+        pool_class.assert_called_once_with(max_workers=2, initializer=django.setup)
+
+    def test_large_files_are_streamed(self):
+        with self.settings(ANALYTICS_STREAM_THRESHOLD=1024), \
+                mock.patch("analytics.batch.parse_source") as parse:
+            data = self.post(("big.csv", make_csv(100)))
+        parse.assert_not_called()
+        self.assertEqual(data["files"][0]["status"], "created")
+        self.assertEqual(data["files"][0]["total_equipment"], 100)
+
+    def test_unexpected_error_fails_one_file(self):
+        real = batch.parse_source
+
+        def parse(source):
+            if b"seed-crash" in source:
+                raise RuntimeError("worker died")
+            return real(source)
+
+        with mock.patch("analytics.batch.parse_source", parse), self.assertLogs("analytics.batch", "ERROR"):
+            data = self.post(("ok.csv", make_csv(10)), ("crash.csv", make_csv(10) + b"seed-crash,Pump,1,1,1\n"))
+        self.assertEqual([f["status"] for f in data["files"]], ["created", "error"])
+
+
+# =====================
+# COMPRESSED UPLOADS
+# =====================
+class CompressedUploadTests(AnalyticsTestCase):
+    def test_compressed_upload_is_streamed(self):
+        # Small on the wire, so only the compression says it may be huge
+        file = SimpleUploadedFile("equipment.csv.gz", gzip.compress(make_csv(1000)))
+        with mock.patch("analytics.views.read_frame") as read_frame, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/upload/", {"file": file}, format="multipart")
+        read_frame.assert_not_called()
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["total_equipment"], 1000)
+        self.assertEqual(response.data["data"], [])
+
+    def stored_files(self):
+        return set(default_storage.listdir("uploads")[1]) if default_storage.exists("uploads") else set()
+
+    def test_decompression_bomb_is_refused(self):
+        data = make_csv(10_000)
+        stored = self.stored_files()
+        for name, payload in (("equipment.csv.gz", gzip.compress(data)), ("equipment.csv.bz2", bz2.compress(data))):
+            with self.subTest(name=name):
+                # Well under the limit on the wire, well over it once expanded
+                self.assertLess(len(payload), 64 * 1024)
+                file = SimpleUploadedFile(name, payload)
+                with self.settings(ANALYTICS_MAX_DECOMPRESSED_SIZE=256 * 1024), \
+                        self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post("/api/upload/", {"file": file}, format="multipart")
+                self.assertEqual(response.status_code, 400, response.data)
+                self.assertIn("once decompressed", response.data["error"])
+                self.assertFalse(EquipmentDataset.objects.exists())
+                self.assertFalse(EquipmentRow.objects.exists())
+                self.assertFalse(TrendPoint.objects.exists())
+                self.assertFalse(IngestJob.objects.exists())
+                self.assertEqual(self.stored_files(), stored)
+
+
+class HistoryCacheTests(AnalyticsTestCase):
+    def test_entry_follows_the_listing(self):
+        self.upload(10, seed=0)
+        etag = self.client.get("/api/history/")["ETag"]
+        self.assertEqual(self.client.get("/api/history/")["X-Cache"], "HIT")
+
+        # Another worker's upload whose invalidation never reaches this cache
+        file = SimpleUploadedFile("equipment-1.csv", make_csv(10, seed=1), content_type="text/csv")
+        self.client.post("/api/upload/", {"file": file}, format="multipart")
+
+        response = self.client.get("/api/history/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.data), 2)
+
+    def test_build_racing_an_upload_is_not_stored(self):
+        self.upload(10, seed=0)
+        listing = history_listing(self.user.id)
+        self.upload(10, seed=1)
+
+        payload, hit = cached_history(self.user.id, listing)
+        self.assertFalse(hit)
+        self.assertEqual(len(payload), 2)
+        self.assertIsNone(cache.get(history_key(self.user.id, listing)))
+
+
+class OrphanCleanupTests(AnalyticsTestCase):
+    def age(self, path, hours=48):
+        old = time.time() - hours * 3600
+        os.utime(path, (old, old))
+
+    def test_orphan_files_wait_out_the_grace_period(self):
+        self.upload(10)
+        stray = default_storage.save("uploads/stray.csv", ContentFile(b"x"))
+        self.assertEqual(orphan_files(), [])
+
+        self.age(default_storage.path(stray))
+        self.assertEqual(orphan_files(), [stray])
+
+    def test_stale_chunked_uploads(self):
+        uploads = [
+            ChunkedUpload.objects.create(owner=self.user, original_filename="a.csv", size=10, chunk_size=10)
+            for _ in range(3)
+        ]
+        for upload in uploads:
+            create_part_file(upload)
+        stale, active, fresh = uploads
+        ChunkedUpload.objects.filter(id__in=[stale.id, active.id]).update(
+            created_at=timezone.now() - datetime.timedelta(hours=48),
+        )
+        self.age(part_path(stale))
+        # A chunk written just now keeps an old upload alive
+        stray = os.path.join(partial_dir(), "999999.part")
+        open(stray, "wb").close()
+        self.age(stray)
+
+        call_command("analytics_retention", "--orphans", stdout=io.StringIO())
+
+        self.assertEqual(set(ChunkedUpload.objects.values_list("id", flat=True)), {active.id, fresh.id})
+        self.assertFalse(os.path.exists(part_path(stale)))
+        self.assertFalse(os.path.exists(stray))
+        self.assertTrue(os.path.exists(part_path(active)))
+        self.assertTrue(os.path.exists(part_path(fresh)))
+
+
+class LegacyOwnerTests(AnalyticsTestCase):
+    def test_assign_owner(self):
+        dataset_id = self.upload(10).data["id"]
+        EquipmentDataset.objects.update(owner=None)
+        TrendPoint.objects.update(owner=None)
+        self.assertEqual(self.client.get("/api/history/").data, [])
+
+        call_command("analytics_assign_owner", self.user.username, stdout=io.StringIO())
+
+        self.assertEqual([entry["id"] for entry in self.client.get("/api/history/").data], [dataset_id])
+        self.assertFalse(TrendPoint.objects.filter(owner=None).exists())
+
+    def migrate_legacy_rows(self, **environ):
+        migration = importlib.import_module("analytics.migrations.0018_assign_legacy_owner")
+        environ = {**{k: v for k, v in os.environ.items() if k != "ANALYTICS_LEGACY_OWNER"}, **environ}
+        with mock.patch.dict(os.environ, environ, clear=True):
+            migration.legacy_rows_to_owner(django_apps, None)
+
+    def test_migration_leaves_rows_unowned_without_setting(self):
+        User.objects.create_superuser("admin", "admin@example.com", "secret")
+        self.upload(10)
+        EquipmentDataset.objects.update(owner=None)
+
+        with self.assertLogs("analytics.migrations.0018_assign_legacy_owner", "WARNING") as logs:
+            self.migrate_legacy_rows()
+
+        self.assertIn("1 datasets have no owner", logs.output[0])
+        self.assertFalse(EquipmentDataset.objects.exclude(owner=None).exists())
+
+    def test_migration_assigns_named_owner(self):
+        self.upload(10)
+        EquipmentDataset.objects.update(owner=None)
+        TrendPoint.objects.update(owner=None)
+
+        self.migrate_legacy_rows(ANALYTICS_LEGACY_OWNER=self.user.get_username())
+
+        self.assertEqual(EquipmentDataset.objects.get().owner, self.user)
+        self.assertFalse(TrendPoint.objects.filter(owner=None).exists())
+
+
+class ReadFrameTests(AnalyticsTestCase):
+    ENGINES = ("c", "pyarrow") if pyarrow is not None else ("c",)
+
+    def test_one_pass_with_bad_metrics(self):
+        data = make_csv(10).replace(b",50.5,", b",n/a,", 1)
+        for engine in self.ENGINES:
+            with self.subTest(engine=engine), mock.patch("analytics.ingest.pd.read_csv", wraps=pd.read_csv) as read_csv:
+                df = read_frame(io.BytesIO(data), engine=engine)
+                self.assertEqual(read_csv.call_count, 1)
+                self.assertEqual(len(df), 9)
+                self.assertEqual(df["Flowrate"].dtype, "float64")
+
+    def test_missing_column(self):
+        data = b"Equipment Name,Type,Flowrate,Pressure\nPump-1,Pump,1,2\n"
+        for engine in self.ENGINES:
+            with self.subTest(engine=engine), self.assertRaisesMessage(CSVIngestError, "Missing column: Temperature"):
+                read_frame(io.BytesIO(data), engine=engine)
+        with self.assertRaisesMessage(CSVIngestError, "Missing column: Temperature"):
+            list(iter_clean_chunks(io.BytesIO(data.split(b"\n")[0] + b"\n")))
+
+
+class TrendTests(AnalyticsTestCase):
+    def test_type_named_overall(self):
+        csv = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nA,overall,10,1,20\nB,Pump,30,3,40\nC,Pump,50,5,60\n"
+        file = SimpleUploadedFile("equipment.csv", csv, content_type="text/csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/upload/", {"file": file}, format="multipart")
+
+        data = self.client.get("/api/trends/", {"type": "*"}).data
+        self.assertEqual([point["count"] for point in data["overall"]], [3])
+        self.assertEqual(data["overall"][0]["flowrate"], 30)
+        self.assertEqual(set(data["types"]), {"overall", "Pump"})
+        self.assertEqual(data["types"]["overall"][0]["count"], 1)
+        self.assertAlmostEqual(data["types"]["overall"][0]["share"], 1 / 3)
+        self.assertAlmostEqual(data["types"]["Pump"][0]["share"], 2 / 3)
+
+
+class RowCursorTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f"/api/datasets/{self.upload(10).data['id']}/rows/"
+
+    def test_forged_cursor_values(self):
+        cases = {
+            "flowrate": [[1], {"a": 1}, "50.5", True, float("nan")],
+            "equipmentName": [1, ["x"], None],
+            "id": [1.5, "3", None],
+        }
+        for sort, values in cases.items():
+            for value in values:
+                with self.subTest(sort=sort, value=value):
+                    cursor = encode_cursor(sort, value, 3)
+                    response = self.client.get(self.url, {"sort": sort, "cursor": cursor})
+                    self.assertEqual(response.status_code, 400)
+
+    def test_cursor_round_trip(self):
+        first = self.client.get(self.url, {"sort": "-flowrate", "limit": 4}).data
+        second = self.client.get(self.url, {"sort": "-flowrate", "limit": 4, "cursor": first["next"]}).data
+        flowrates = [row["flowrate"] for row in first["results"] + second["results"]]
+        self.assertEqual(flowrates, sorted(flowrates, reverse=True))
+
+    def test_sort_prefix(self):
+        self.assertEqual(self.client.get(self.url, {"sort": "--flowrate"}).status_code, 400)
+
+
+class SummaryEqualityTests(AnalyticsTestCase):
+    ROWS = 1003
+
+    def make_csv(self):
+        """Full-precision metrics, with blanks and non-numbers that drop their rows."""
+        rng = random.Random(7)
+        lines = ["Equipment Name,Type,Flowrate,Pressure,Temperature"]
+        for i in range(self.ROWS):
+            metrics = [repr(rng.uniform(-1e6, 1e6) * 10 ** rng.randint(-8, 8)) for _ in range(3)]
+            if i % 17 == 0:
+                metrics[i % 3] = ""
+            elif i % 29 == 0:
+                metrics[i % 3] = "n/a"
+            lines.append(f"Equipment-{i},{TYPES[i % len(TYPES)]},{','.join(metrics)}")
+        return ("\n".join(lines) + "\n").encode()
+
+    def test_streamed_matches_in_memory(self):
+        data = self.make_csv()
+        df = read_frame(io.BytesIO(data))
+        expected = frame_summary(df)
+        self.assertLess(expected["total_equipment"], self.ROWS)
+        for engine in ("c", "python"):
+            self.assertEqual(frame_summary(read_frame(io.BytesIO(data), engine=engine)), expected, engine)
+
+        # The correctly rounded mean of the values as written in the file
+        flowrates = []
+        for line in data.decode().splitlines()[1:]:
+            metrics = line.split(",")[2:]
+            try:
+                numbers = [float(value) for value in metrics]
+            except ValueError:
+                continue
+            flowrates.append(Fraction(numbers[0]))
+        self.assertEqual(expected["avg_flowrate"], float(sum(flowrates) / len(flowrates)))
+
+        # Ragged last chunks, one-row chunks and a single chunk
+        for chunksize in (1, 7, 64, 1000, self.ROWS * 2):
+            with self.subTest(chunksize=chunksize):
+                file = SimpleUploadedFile("equipment.csv", data, content_type="text/csv")
+                dataset, summary = save_dataset_streaming(file, chunksize=chunksize, owner=self.user)
+                self.assertEqual(summary, expected)
+                dataset.refresh_from_db()
+                for field in ("total_equipment", "avg_flowrate", "avg_pressure", "avg_temperature"):
+                    self.assertEqual(getattr(dataset, field), expected[field], field)
+
+        file = SimpleUploadedFile("equipment.csv", data, content_type="text/csv")
+        dataset = save_dataset(file, expected, df, owner=self.user)
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.avg_flowrate, expected["avg_flowrate"])
+
+    def test_mean_is_correctly_rounded(self):
+        values = [1e16, 1.0, -1e16, 3.0, 0.1]
+        df = pd.DataFrame({
+            "Type": ["Pump"] * len(values),
+            **{col: values for col in ("Flowrate", "Pressure", "Temperature")},
+        })
+        exact = sum(Fraction(value) for value in values) / len(values)
+        self.assertEqual(frame_summary(df)["avg_flowrate"], float(exact))
+
+
+class AggregateTests(AnalyticsTestCase):
+    ROWS = 1_000
+
+    def setUp(self):
+        super().setUp()
+        self.upload(self.ROWS)
+        self.dataset = EquipmentDataset.objects.get()
+        self.url = f"/api/datasets/{self.dataset.id}/aggregate/"
+
+    def expected(self, params, group_by, metrics, bin_spec=None):
+        queryset = filter_rows(self.dataset.rows.all(), params)
+        columns = list(dict.fromkeys(
+            group_by + [metric for metric, _ in metrics if metric] + ([bin_spec[0]] if bin_spec else [])
+        ))
+        groups, bins = aggregate_frame(load_columns(queryset, columns), group_by, metrics, bin_spec)
+        return groups, bins
+
+    def assertGroupsEqual(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for got, want in zip(actual, expected):
+            self.assertEqual(got.keys(), want.keys())
+            for key, value in want.items():
+                if isinstance(value, dict):
+                    for stat, number in value.items():
+                        self.assertAlmostEqual(got[key][stat], number, places=6, msg=f"{key}:{stat}")
+                else:
+                    self.assertEqual(got[key], value, key)
+
+    def test_grouped_stats_match_pandas(self):
+        params = {
+            "group_by": "type",
+            "metrics": "count,flowrate:mean,flowrate:std,pressure:min,pressure:max,temperature:sum",
+            "flowrate_min": "100",
+        }
+        with QueryBudget() as budget:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        # Auth, dataset and the GROUP BY; one small row per type comes back
+        self.assertWithinBudget(budget, 4, 4 * 1024)
+
+        groups, _ = self.expected(
+            params, ["type"], parse_metrics(params["metrics"]),
+        )
+        self.assertEqual([group["type"] for group in response.data["groups"]], sorted(TYPES))
+        self.assertGroupsEqual(response.data["groups"], groups)
+
+    def test_histogram_matches_pandas(self):
+        params = {"metrics": "count,pressure:mean", "bin": "flowrate:20"}
+        with QueryBudget() as budget:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        # Plus the range of the binned column
+        self.assertWithinBudget(budget, 5, 4 * 1024)
+
+        groups, bins = self.expected(params, [], parse_metrics(params["metrics"]), ("flowrate", 20))
+        self.assertEqual(response.data["group_by"], ["flowrate_bin"])
+        self.assertEqual(response.data["bins"]["flowrate"]["count"], 20)
+        for got, want in zip(response.data["bins"]["flowrate"]["edges"], bins["flowrate"]["edges"]):
+            self.assertAlmostEqual(got, want)
+        self.assertGroupsEqual(response.data["groups"], groups)
+        self.assertEqual(sum(group["count"] for group in response.data["groups"]), self.ROWS)
+
+    def test_no_matching_rows(self):
+        response = self.client.get(self.url, {"metrics": "count,flowrate:std,pressure:mean", "flowrate_min": "1e9"})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["groups"], [{"count": 0, "flowrate": {"std": None}, "pressure": {"mean": None}}])
+
+    def test_quantiles(self):
+        params = {"group_by": "type", "metrics": "flowrate:p95,flowrate:mean", "type": "Pump"}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        groups, _ = self.expected(params, ["type"], parse_metrics(params["metrics"]))
+        self.assertGroupsEqual(response.data["groups"], groups)
+
+
+@override_settings(ANALYTICS_EXPORT_BATCH_SIZE=64)
+class ExportTests(AnalyticsTestCase):
+    ROWS = 300
+
+    def setUp(self):
+        super().setUp()
+        self.dataset = EquipmentDataset.objects.get(id=self.upload(self.ROWS).data["id"])
+        self.url = f"/api/datasets/{self.dataset.id}/export/"
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_json_rows(self):
+        response, body = self.export()
+        self.assertEqual(response["Content-Type"], "application/json")
+        # Several batches, joined into one array
+        self.assertEqual(json.loads(body), self.dataset.rows.as_api_rows())
+
+    def test_ndjson_rows_with_filter(self):
+        response, body = self.export(format="ndjson", type="Pump")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(rows, self.dataset.rows.filter(type="Pump").as_api_rows())
+
+    def test_ndjson_from_accept_header(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), self.ROWS)
+
+    def test_json_type_stats(self):
+        _, body = self.export(table="type_stats")
+        stats = json.loads(body)
+        self.assertEqual([entry["type"] for entry in stats], sorted(TYPES))
+        self.assertEqual(sum(entry["count"] for entry in stats), self.ROWS)
+
+    def test_empty_export(self):
+        _, body = self.export(type="NoSuchType")
+        self.assertEqual(json.loads(body), [])
+
+    def test_unknown_table(self):
+        response = self.client.get(self.url, {"table": "users"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_users_dataset(self):
+        other = User.objects.create_user("other@example.com", "other@example.com", "secret")
+        response = self.client_for(other).get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+@skipUnless(pyarrow is not None, "pyarrow is not installed")
+@override_settings(ANALYTICS_EXPORT_BATCH_SIZE=64)
+class ColumnarExportTests(AnalyticsTestCase):
+    ROWS = 300
+
+    def setUp(self):
+        super().setUp()
+        self.dataset = EquipmentDataset.objects.get(id=self.upload(self.ROWS).data["id"])
+        self.url = f"/api/datasets/{self.dataset.id}/export/"
+
+    def export(self, fmt, **params):
+        response = self.client.get(self.url, {"format": fmt, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'-{params.get("table", "rows")}.{fmt}"', response["Content-Disposition"])
+        return response, b"".join(response.streaming_content)
+
+    def test_arrow_rows(self):
+        response, body = self.export("arrow")
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.arrow.stream")
+        reader = pyarrow.ipc.open_stream(body)
+        # One record batch per export batch, all sharing the type dictionary
+        batches = list(reader)
+        self.assertEqual(len(batches), math.ceil(self.ROWS / 64))
+        table = pyarrow.Table.from_batches(batches)
+        self.assertEqual(table.schema.field("type").type, pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+        self.assertEqual(table.column("flowrate").null_count, 0)
+        self.assertEqual(table.to_pylist(), self.dataset.rows.as_api_rows())
+
+    def test_parquet_rows_with_filter(self):
+        response, body = self.export("parquet", type="Valve")
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.parquet")
+        table = pyarrow.parquet.read_table(pyarrow.BufferReader(body))
+        self.assertEqual(table.to_pylist(), self.dataset.rows.filter(type="Valve").as_api_rows())
+
+    def test_parquet_type_stats(self):
+        _, body = self.export("parquet", table="type_stats")
+        table = pyarrow.parquet.read_table(pyarrow.BufferReader(body))
+        self.assertEqual(table.column("type").to_pylist(), sorted(TYPES))
+        self.assertEqual(sum(table.column("count").to_pylist()), self.ROWS)
+
+    def test_empty_arrow_export(self):
+        _, body = self.export("arrow", type="NoSuchType")
+        self.assertEqual(pyarrow.ipc.open_stream(body).read_all().num_rows, 0)
+
+
+class SeriesTests(AnalyticsTestCase):
+    ROWS = 1_000
+
+    def setUp(self):
+        super().setUp()
+        self.dataset = EquipmentDataset.objects.get(id=self.upload(self.ROWS).data["id"])
+        self.url = f"/api/datasets/{self.dataset.id}/series/"
+
+    def test_downsampled_to_point_count(self):
+        response = self.client.get(self.url, {"points": 100, "sort_by": "flowrate", "series": "flowrate,pressure"})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["total"], self.ROWS)
+
+        flowrates = sorted(self.dataset.rows.values_list("flowrate", flat=True))
+        for name in ("flowrate", "pressure"):
+            x = response.data["series"][name]["x"]
+            self.assertEqual(len(x), 100)
+            self.assertEqual(len(response.data["series"][name]["y"]), 100)
+            # Ranks, increasing, with both ends kept
+            self.assertEqual(x, sorted(set(x)))
+            self.assertEqual((x[0], x[-1]), (0, self.ROWS - 1))
+        flow = response.data["series"]["flowrate"]
+        self.assertEqual(flow["y"], [flowrates[i] for i in flow["x"]])
+
+        self.assertEqual(self.client.get(self.url, {"points": 100})["X-Cache"], "HIT")
+
+    def test_fewer_rows_than_points(self):
+        response = self.client.get(self.url, {"points": self.ROWS * 2, "series": "temperature"})
+        self.assertEqual(response.data["series"]["temperature"]["x"], list(range(self.ROWS)))
+
+    def test_lttb_keeps_a_spike(self):
+        y = np.zeros(1000)
+        y[537] = 100.0
+        keep = lttb(np.arange(1000, dtype="float64"), y, 20)
+        self.assertEqual(len(keep), 20)
+        self.assertIn(537, keep)
+
+    def test_invalid_query(self):
+        for params in ({"points": 2}, {"points": "many"}, {"sort_by": "name"}, {"series": "flowrate,weight"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class CompareTests(AnalyticsTestCase):
+    HEADER = "Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+
+    def upload_rows(self, name, *rows):
+        file = SimpleUploadedFile(name, (self.HEADER + "".join(f"{row}\n" for row in rows)).encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/upload/", {"file": file}, format="multipart")
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data["id"]
+
+    def setUp(self):
+        super().setUp()
+        self.a = self.upload_rows(
+            "a.csv", "P1,Pump,10,1,20", "P2,Valve,20,2,30", "P3,Pump,30,3,40", "Dup,Pump,1,1,1", "Dup,Pump,2,2,2",
+        )
+        self.b = self.upload_rows(
+            "b.csv", "P1,Pump,10,1,20", "P2,Pump,25,2,30", "P4,Valve,5,5,5", "Dup,Pump,1,1,1", "Dup,Pump,52,2,2",
+        )
+        self.url = f"/api/datasets/{self.a}/compare/{self.b}/"
+
+    def test_compare(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.data
+
+        self.assertEqual((data["a"]["total"], data["b"]["total"]), (5, 5))
+        self.assertEqual(data["added"], {"count": 1, "equipment": [{"equipmentName": "P4", "type": "Valve"}]})
+        self.assertEqual(data["removed"], {"count": 1, "equipment": [{"equipmentName": "P3", "type": "Pump"}]})
+
+        changed = data["changed"]
+        self.assertEqual((changed["count"], changed["unchanged"]), (2, 2))
+        # Repeated names pair up by occurrence; largest flowrate change first
+        self.assertEqual([entry["equipmentName"] for entry in changed["equipment"]], ["Dup", "P2"])
+        self.assertEqual(changed["equipment"][0]["flowrate"], {"a": 2.0, "b": 52.0, "delta": 50.0})
+        self.assertEqual(changed["equipment"][1]["type"], {"a": "Valve", "b": "Pump"})
+        self.assertEqual(changed["equipment"][1]["flowrate"]["delta"], 5.0)
+
+        pump = data["type_averages"]["Pump"]
+        self.assertEqual(pump["count"], {"a": 4, "b": 4, "delta": 0})
+        self.assertAlmostEqual(pump["flowrate"]["delta"], (10 + 25 + 1 + 52) / 4 - (10 + 30 + 1 + 2) / 4)
+
+    def test_top_and_ranking(self):
+        data = self.client.get(self.url, {"top": 1, "by": "pressure"}).data
+        self.assertEqual(data["rankedBy"], "pressure")
+        self.assertEqual(len(data["changed"]["equipment"]), 1)
+        self.assertEqual(data["changed"]["count"], 2)
+
+    def test_invalid_query(self):
+        for params in ({"top": 0}, {"top": "all"}, {"by": "type"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_other_users_dataset(self):
+        other = User.objects.create_user("other@example.com", "other@example.com", "secret")
+        self.assertEqual(self.client_for(other).get(self.url).status_code, 404)
+
+
+class TypeStatsTests(AnalyticsTestCase):
+    ROWS = 1_000
+
+    def expected_stats(self, seed):
+        df = pd.read_csv(io.BytesIO(make_csv(self.ROWS, seed)))
+        grouped = df.groupby("Type")
+        expected = {}
+        for type_, group in grouped:
+            expected[type_] = {"count": len(group)}
+            for metric in EquipmentTypeStats.METRICS:
+                values = group[metric.capitalize()]
+                expected[type_][metric] = {
+                    "mean": values.mean(), "min": values.min(), "max": values.max(), "std": values.std(),
+                    "p50": values.quantile(0.5), "p95": values.quantile(0.95),
+                }
+        return expected
+
+    def assertStatsEqual(self, actual, expected):
+        self.assertEqual(actual.keys(), expected.keys())
+        for type_, stats in expected.items():
+            self.assertEqual(actual[type_]["count"], stats["count"], type_)
+            for metric in EquipmentTypeStats.METRICS:
+                for stat, value in stats[metric].items():
+                    self.assertAlmostEqual(actual[type_][metric][stat], value, places=6, msg=f"{type_} {metric}:{stat}")
+
+    def test_computed_at_upload(self):
+        for seed, mode in enumerate((None, "stream")):
+            with self.subTest(mode=mode or "memory"):
+                response = self.upload(self.ROWS, seed=seed, mode=mode)
+                self.assertStatsEqual(response.data["type_stats"], self.expected_stats(seed))
+                detail = self.client.get(f"/api/datasets/{response.data['id']}/").data
+                self.assertEqual(detail["type_stats"], response.data["type_stats"])
+
+    def test_aggregate_reads_no_rows(self):
+        dataset_id = self.upload(self.ROWS).data["id"]
+        with QueryBudget() as budget:
+            response = self.client.get(
+                f"/api/datasets/{dataset_id}/aggregate/",
+                {"group_by": "type", "metrics": "count,flowrate:p95,pressure:std"},
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(
+            any(EquipmentRow._meta.db_table in query["sql"] for query in budget.captured_queries),
+            budget.summary(),
+        )
+        expected = self.expected_stats(0)
+        self.assertEqual([group["type"] for group in response.data["groups"]], sorted(TYPES))
+        for group in response.data["groups"]:
+            self.assertEqual(group["count"], expected[group["type"]]["count"])
+            self.assertAlmostEqual(group["flowrate"]["p95"], expected[group["type"]]["flowrate"]["p95"])
+
+    def test_backfill_matches_ingest(self):
+        dataset = EquipmentDataset.objects.get(id=self.upload(self.ROWS).data["id"])
+        ingested = dataset.type_stats_payload()
+        EquipmentTypeStats.objects.all().delete()
+
+        migration = importlib.import_module("analytics.migrations.0017_backfill_equipmenttypestats")
+        migration.rows_to_type_stats(django_apps, None)
+
+        self.assertStatsEqual(dataset.type_stats_payload(), ingested)
@@ -0,0 +1,177 @@
+"""
+Trends across one user's uploads, read from the TrendPoint rollups only.
+
+Every upload leaves one overall point and one point per type (see
+ingest.save_trend_points), so a trend over any date range costs one
+indexed scan of a small table, however many rows the uploads had and
+whether or not they have been pruned since.
+
+Query syntax (all optional):
+
+- ``start`` / ``end``: ISO dates or datetimes. ``start`` is inclusive;
+  a date-only ``end`` includes that whole day.
+- ``type=Pump,Valve`` adds a series per type under ``types``, next to
+  the ``overall`` series; ``type=*`` adds every type.
+- ``bucket=upload|day|week|month``. ``upload`` (the default) gives one
+  point per upload. The others combine the uploads of each period,
+  weighting means by row count.
+"""
+import datetime
+
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .exceptions import RowQueryError
+from .models import TrendPoint
+
+METRICS = ("flowrate", "pressure", "temperature")
+
+ALL_TYPES = "*"
+
+BUCKETS = {
+    "upload": None,
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+
+def parse_moment(raw, name, end=False):
+    """An aware datetime from an ISO date or datetime; ``None`` when absent."""
+    if raw in (None, ""):
+        return None
+    try:
+        moment = parse_datetime(raw)
+        if moment is None:
+            day = parse_date(raw)
+            if day is None:
+                raise ValueError
+            moment = datetime.datetime.combine(day, datetime.time.min)
+            if end:
+                # A date-only end covers that whole day
+                moment += datetime.timedelta(days=1)
+    except ValueError:
+        raise RowQueryError(f"{name} must be an ISO date or datetime")
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_trend(params):
+    """``(start, end, types, bucket)``; ``types`` is ``None`` for every type."""
+    start = parse_moment(params.get("start"), "start")
+    end = parse_moment(params.get("end"), "end", end=True)
+    if start and end and start >= end:
+        raise RowQueryError("start must be before end")
+
+    raw = params.get("type", "")
+    types = None if raw == ALL_TYPES else [type_ for type_ in raw.split(",") if type_]
+
+    bucket = params.get("bucket", "upload")
+    if bucket not in BUCKETS:
+        raise RowQueryError(f"Unknown bucket '{bucket}'. Use one of: {', '.join(BUCKETS)}")
+
+    return start, end, types, bucket
+
+
+def _points(owner, start, end, types):
+    points = TrendPoint.objects.filter(owner=owner)
+    if start:
+        points = points.filter(recorded_at__gte=start)
+    if end:
+        points = points.filter(recorded_at__lt=end)
+    if types is not None:
+        points = points.filter(type__in=[TrendPoint.OVERALL, *types])
+    return points
+
+
+def _per_upload(points):
+    return [
+        {
+            "type": type_,
+            "t": recorded_at,
+            "datasetId": dataset_id,
+            "fileName": file_name,
+            "count": count,
+            **dict(zip(METRICS, means)),
+        }
+        for type_, recorded_at, dataset_id, file_name, count, *means in points
+        .order_by("recorded_at", "id")
+        .values_list(
+            "type", "recorded_at", "dataset_id", "file_name", "count",
+            *(f"{metric}_mean" for metric in METRICS),
+        )
+    ]
+
+
+def _per_bucket(points, trunc):
+    buckets = (
+        points
+        .annotate(t=trunc("recorded_at"))
+        .values("type", "t")
+        .annotate(
+            uploads=Count("id"),
+            rows=Sum("count"),
+            **{
+                f"{metric}_sum": Sum(F("count") * F(f"{metric}_mean"), output_field=FloatField())
+                for metric in METRICS
+            },
+        )
+        .order_by("t", "type")
+    )
+    return [
+        {
+            "type": bucket["type"],
+            "t": bucket["t"],
+            "uploads": bucket["uploads"],
+            "count": bucket["rows"],
+            **{
+                metric: bucket[f"{metric}_sum"] / bucket["rows"] if bucket["rows"] else None
+                for metric in METRICS
+            },
+        }
+        for bucket in buckets
+    ]
+
+
+def trend(owner, params):
+    """Answer a trend query over ``owner``'s uploads from the rollups."""
+    start, end, types, bucket = parse_trend(params)
+    points = _points(owner, start, end, types)
+
+    trunc = BUCKETS[bucket]
+    entries = _per_upload(points) if trunc is None else _per_bucket(points, trunc)
+
+    # Share of the rows of each upload / period that a type accounts for
+    totals = {
+        (entry["t"], entry.get("datasetId")): entry["count"]
+        for entry in entries if entry["type"] == TrendPoint.OVERALL
+    }
+
+    # Types are user data, so they get their own namespace: a type named
+    # "overall" must not land in the overall series
+    overall = []
+    series = {type_: [] for type_ in types or []}
+    for entry in entries:
+        type_ = entry.pop("type")
+        if type_ == TrendPoint.OVERALL:
+            overall.append(entry)
+            continue
+        total = totals.get((entry["t"], entry.get("datasetId")))
+        entry["share"] = entry["count"] / total if total else None
+        series.setdefault(type_, []).append(entry)
+
+    for entries in (overall, *series.values()):
+        for entry in entries:
+            entry["t"] = entry["t"].isoformat()
+
+    return {
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "bucket": bucket,
+        "overall": overall,
+        "types": series,
+    }
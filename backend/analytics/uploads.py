@@ -0,0 +1,172 @@
+"""
+Resumable chunked uploads.
+
+Chunks are written straight into a preallocated ``.part`` file under
+MEDIA_ROOT at their final offset, so completing an upload is a rename
+rather than a copy, and memory use is one read buffer per request.
+Completing re-reads the part file once to check every chunk against the
+digest it was accepted with and to hash the whole file.
+
+Chunk writes hold a shared lock on the part file and completing holds an
+exclusive one from verifying to the rename, so no chunk can land in a
+file that has already been hashed. A write that was waiting on the lock
+finds the file moved and is refused.
+"""
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+from .models import UploadChunk
+
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """A chunk was rejected. The message is safe to show to clients."""
+
+
+class UploadClosed(Exception):
+    """The part file is gone: the upload was completed or cleaned up."""
+
+
+def partial_dir():
+    return os.path.join(settings.MEDIA_ROOT, "uploads", "partial")
+
+
+def part_path(upload):
+    return os.path.join(partial_dir(), f"{upload.id}.part")
+
+
+def create_part_file(upload):
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Sparse on most filesystems; reserves the final size up front
+    with open(path, "wb") as f:
+        f.truncate(upload.size)
+
+
+@contextmanager
+def locked_part(upload, exclusive=False):
+    """
+    The open part file, locked shared for writing chunks or exclusive for
+    completing. Raises ``UploadClosed`` if the file is, or by the time the
+    lock is granted has been, moved away.
+    """
+    path = part_path(upload)
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        raise UploadClosed("Upload is no longer open")
+
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            still_there = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            still_there = False
+        if not still_there:
+            raise UploadClosed("Upload is no longer open")
+        yield f
+
+
+def write_chunk(upload, index, stream, checksum):
+    """
+    Copy chunk ``index`` from ``stream`` into the part file, checking its
+    length and SHA-256 on the way. Re-sending a chunk overwrites it.
+    """
+    if not 0 <= index < upload.total_chunks:
+        raise ChunkError(f"Chunk index out of range (0-{upload.total_chunks - 1})")
+
+    expected = upload.chunk_length(index)
+    digest = hashlib.sha256()
+    written = 0
+
+    with locked_part(upload) as f:
+        # The bytes go in before they can be checked, so the chunk counts as
+        # missing until this copy passes; a bad re-send can't leave an
+        # accepted chunk over corrupt data
+        UploadChunk.objects.filter(upload=upload, index=index).delete()
+
+        f.seek(index * upload.chunk_size)
+        while written <= expected:
+            block = stream.read(min(READ_SIZE, expected + 1 - written))
+            if not block:
+                break
+            written += len(block)
+            if written > expected:
+                break
+            digest.update(block)
+            f.write(block)
+
+        if written != expected:
+            raise ChunkError(f"Chunk {index} must be {expected} bytes")
+
+        if digest.hexdigest() != checksum.lower():
+            raise ChunkError(f"Checksum mismatch for chunk {index}")
+
+        # Recorded under the lock, so completing sees every chunk in the file
+        UploadChunk.objects.update_or_create(
+            upload=upload,
+            index=index,
+            defaults={"sha256": digest.hexdigest()},
+        )
+
+
+def received_chunks(upload):
+    return list(upload.chunks.order_by("index").values_list("index", flat=True))
+
+
+def verify(upload, f):
+    """
+    Check every chunk in the open part file ``f`` against the digest it was
+    accepted with and return the SHA-256 of the whole file. A chunk that no
+    longer matches is marked missing so the client sends it again.
+    """
+    accepted = dict(upload.chunks.values_list("index", "sha256"))
+    whole = hashlib.sha256()
+
+    f.seek(0)
+    for index in range(upload.total_chunks):
+        digest = hashlib.sha256()
+        remaining = upload.chunk_length(index)
+        while remaining:
+            block = f.read(min(READ_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            digest.update(block)
+            whole.update(block)
+
+        if digest.hexdigest() != accepted.get(index):
+            upload.chunks.filter(index=index).delete()
+            raise ChunkError(f"Chunk {index} is corrupt, send it again")
+
+    return whole.hexdigest()
+
+
+def discard(upload):
+    """Drop the part file and chunk records of an upload that won't be ingested."""
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.chunks.all().delete()
+
+
+def assemble(upload):
+    """
+    Move the finished part file into storage and return its storage name.
+    """
+    name = default_storage.get_available_name(
+        os.path.join("uploads", get_valid_filename(upload.original_filename))
+    )
+    os.replace(part_path(upload), default_storage.path(name))
+    upload.chunks.all().delete()
+
+    return name
@@ -1,12 +1,41 @@
 from django.urls import path
-from .views import CSVUploadAPIView, DatasetHistoryAPIView, health_check
+from .views import CSVUploadAPIView, DatasetHistoryAPIView, TrendAPIView, health_check
 from .views_pdf import generate_pdf
 from .views_auth import RegisterAPIView, LoginAPIView
+from .views_batch import BatchUploadAPIView
+from .views_datasets import (
+    DatasetAggregateAPIView,
+    DatasetCompareAPIView,
+    DatasetDetailAPIView,
+    DatasetExportAPIView,
+    DatasetRowsAPIView,
+    DatasetSeriesAPIView,
+)
+from .views_jobs import IngestJobStatusAPIView
+from .views_uploads import (
+    ChunkedUploadChunkAPIView,
+    ChunkedUploadCompleteAPIView,
+    ChunkedUploadCreateAPIView,
+    ChunkedUploadDetailAPIView,
+)
 
 urlpatterns = [
     path("", health_check),  # Add this line
     path("upload/", CSVUploadAPIView.as_view()),
+    path("upload/batch/", BatchUploadAPIView.as_view()),
     path("history/", DatasetHistoryAPIView.as_view()),
+    path("trends/", TrendAPIView.as_view()),
+    path("datasets/<int:dataset_id>/", DatasetDetailAPIView.as_view()),
+    path("datasets/<int:dataset_id>/rows/", DatasetRowsAPIView.as_view()),
+    path("datasets/<int:dataset_id>/export/", DatasetExportAPIView.as_view()),
+    path("datasets/<int:dataset_id>/aggregate/", DatasetAggregateAPIView.as_view()),
+    path("datasets/<int:dataset_id>/series/", DatasetSeriesAPIView.as_view()),
+    path("datasets/<int:dataset_id>/compare/<int:other_id>/", DatasetCompareAPIView.as_view()),
+    path("jobs/<int:job_id>/", IngestJobStatusAPIView.as_view()),
+    path("uploads/", ChunkedUploadCreateAPIView.as_view()),
+    path("uploads/<int:upload_id>/", ChunkedUploadDetailAPIView.as_view()),
+    path("uploads/<int:upload_id>/chunks/<int:index>/", ChunkedUploadChunkAPIView.as_view()),
+    path("uploads/<int:upload_id>/complete/", ChunkedUploadCompleteAPIView.as_view()),
     path("pdf/<int:dataset_id>/", generate_pdf),
     path("auth/register/", RegisterAPIView.as_view()),
     path("auth/login/", LoginAPIView.as_view()),
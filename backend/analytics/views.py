@@ -1,12 +1,29 @@
-import pandas as pd
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
 
-from .models import EquipmentDataset
+from .caching import cached_history
+from .compression import detect_compression
+from .conditional import history_etag, request_history_listing, revalidate_get
+from .exceptions import RowQueryError
+from .ingest import (
+    CSVIngestError,
+    find_duplicate,
+    frame_summary,
+    frame_to_rows,
+    read_frame,
+    save_dataset,
+    save_dataset_streaming,
+)
+from .jobs import enqueue
+from .retention import schedule_sweep
 from .serializers import CSVUploadSerializer
+from .trends import trend
+from .upload_handlers import upload_sha256
+from .views_jobs import job_payload
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -28,88 +45,100 @@ class CSVUploadAPIView(APIView):
             return Response(serializer.errors, status=400)
 
         file = serializer.validated_data["file"]
+        mode = self.ingest_mode(request, file)
 
         # =====================
-        # READ CSV
+        # DUPLICATE UPLOAD
         # =====================
-        try:
-            df = pd.read_csv(file)
-        except Exception:
-            return Response(
-                {"error": "Invalid CSV file"},
-                status=status.HTTP_400_BAD_REQUEST,
+        content_hash = upload_sha256(file)
+        duplicate = find_duplicate(content_hash, request.user)
+        if duplicate:
+            rows = duplicate.rows.as_api_rows() if mode == "memory" else []
+            return self.respond(
+                duplicate, duplicate.summary(), rows, status.HTTP_200_OK
             )
 
-        required_columns = [
-            "Equipment Name",
-            "Type",
-            "Flowrate",
-            "Pressure",
-            "Temperature",
-        ]
-
-        for col in required_columns:
-            if col not in df.columns:
-                return Response(
-                    {"error": f"Missing column: {col}"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        if mode == "async":
+            return self.post_async(file, content_hash, request.user)
+        if mode == "stream":
+            return self.post_streaming(file, content_hash, request.user)
 
         # =====================
-        # Convert numeric
+        # READ CSV
         # =====================
-        df["Flowrate"] = pd.to_numeric(df["Flowrate"], errors="coerce")
-        df["Pressure"] = pd.to_numeric(df["Pressure"], errors="coerce")
-        df["Temperature"] = pd.to_numeric(df["Temperature"], errors="coerce")
-
-        df = df.dropna(
-            subset=["Flowrate", "Pressure", "Temperature"]
-        )
+        try:
+            df = read_frame(file)
+        except CSVIngestError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         # =====================
         # CSV ROWS
         # =====================
-        rows = []
-        for _, row in df.iterrows():
-            rows.append({
-                "equipmentName": str(row["Equipment Name"]),
-                "type": str(row["Type"]),
-                "flowrate": float(row["Flowrate"]),
-                "pressure": float(row["Pressure"]),
-                "temperature": float(row["Temperature"]),
-            })
+        rows = frame_to_rows(df)
 
         # =====================
         # CALCULATIONS
         # =====================
-        total_equipment = len(rows)
-
-        avg_flowrate = float(df["Flowrate"].mean())
-        avg_pressure = float(df["Pressure"].mean())
-        avg_temperature = float(df["Temperature"].mean())
-
-        type_distribution = df["Type"].value_counts().to_dict()
+        summary = frame_summary(df)
 
         # =====================
         # SAVE DATASET
         # =====================
-        dataset = EquipmentDataset.objects.create(
-            file=file,
-            original_filename=file.name,   # ✅ CLEAN NAME
-            total_equipment=total_equipment,
-            avg_flowrate=avg_flowrate,
-            avg_pressure=avg_pressure,
-            avg_temperature=avg_temperature,
-            type_distribution=type_distribution,
-            data=rows,
+        dataset = save_dataset(file, summary, df, content_hash, owner=request.user)
+
+        # Drop uploads the retention policy no longer keeps
+        schedule_sweep(request.user.id)
+
+        return self.respond(dataset, summary, rows)
+
+    def ingest_mode(self, request, file):
+        """
+        ``?mode=stream`` or ``?mode=async`` pick a mode explicitly; otherwise
+        uploads past ANALYTICS_STREAM_THRESHOLD go to the background queue.
+        Compressed uploads are always streamed: ``file.size`` is the
+        compressed size, and the CSV inside may be up to
+        ANALYTICS_MAX_DECOMPRESSED_SIZE.
+        """
+        mode = request.query_params.get("mode")
+        if mode in ("stream", "async"):
+            return mode
+        if file.size >= settings.ANALYTICS_STREAM_THRESHOLD:
+            return "async"
+        if detect_compression(file):
+            return "stream"
+        return "memory"
+
+    def post_async(self, file, content_hash, owner):
+        job = enqueue(file, content_hash=content_hash, owner=owner)
+
+        return Response(
+            job_payload(job),
+            status=status.HTTP_202_ACCEPTED,
         )
 
-        # Keep only last 5 uploads
-        datasets = EquipmentDataset.objects.order_by("-uploaded_at")
-        if datasets.count() > 5:
-            for d in datasets[5:]:
-                d.delete()
+    def post_streaming(self, file, content_hash, owner):
+        """
+        Bounded-memory ingest. Rows go straight to the database chunk by
+        chunk, so they are not echoed back in the response.
+        """
+        try:
+            dataset, summary = save_dataset_streaming(
+                file, content_hash=content_hash, owner=owner
+            )
+        except CSVIngestError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        schedule_sweep(owner.id)
 
+        return self.respond(dataset, summary, [])
+
+    def respond(self, dataset, summary, rows, status_code=status.HTTP_201_CREATED):
         # =====================
         # FRONTEND RESPONSE
         # =====================
@@ -119,42 +148,40 @@ class CSVUploadAPIView(APIView):
                 "fileName": dataset.original_filename,  # ✅ FIX
                 "uploadDate": dataset.uploaded_at.isoformat(),
 
-                "total_equipment": total_equipment,
-                "avg_flowrate": avg_flowrate,
-                "avg_pressure": avg_pressure,
-                "avg_temperature": avg_temperature,
-
-                "type_distribution": type_distribution,
+                **summary,
+                "type_stats": dataset.type_stats_payload(),
                 "data": rows,
             },
-            status=status.HTTP_201_CREATED,
+            status=status_code,
         )
 
 
+@revalidate_get(etag_func=history_etag)
 class DatasetHistoryAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        datasets = EquipmentDataset.objects.order_by("-uploaded_at")[:5]
 
-        history = []
+    def get(self, request):
+        # Summaries only; rows are served by /api/datasets/<id>/rows/
+        history, hit = cached_history(request.user.id, request_history_listing(request))
 
-        for dataset in datasets:
-            history.append({
-                "id": dataset.id,
+        return Response(history, headers={"X-Cache": "HIT" if hit else "MISS"})
 
-                # ✅ THIS IS THE KEY FIX
-                "fileName": dataset.original_filename,
 
-                "uploadDate": dataset.uploaded_at.isoformat(),
+class TrendAPIView(APIView):
+    """
+    Summary metrics across uploads over a date range, from the trend
+    rollups; see ``analytics.trends`` for the query syntax.
+    """
 
-                "total_equipment": dataset.total_equipment,
-                "avg_flowrate": dataset.avg_flowrate,
-                "avg_pressure": dataset.avg_pressure,
-                "avg_temperature": dataset.avg_temperature,
+    permission_classes = [IsAuthenticated]
 
-                "type_distribution": dataset.type_distribution,
-                "data": dataset.data or [],
-            })
+    def get(self, request):
+        try:
+            result = trend(request.user, request.query_params)
+        except RowQueryError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        return Response(history)
+        return Response(result)
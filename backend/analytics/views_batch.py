@@ -0,0 +1,159 @@
+import tempfile
+
+from django.conf import settings
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+
+from .batch import close_sources, collect_sources, parse_all
+from .ingest import (
+    CSVIngestError,
+    combine_summaries,
+    find_duplicate,
+    save_dataset,
+    save_dataset_streaming,
+)
+from .retention import schedule_sweep
+
+
+class BatchUploadAPIView(APIView):
+    """
+    Several CSVs (repeated ``files`` field) or a single ZIP of CSVs.
+    Returns one result per file plus a combined summary.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        files = request.FILES.getlist("files")
+
+        if not files:
+            return Response(
+                {"error": "No files uploaded"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with tempfile.TemporaryDirectory(dir=settings.FILE_UPLOAD_TEMP_DIR) as workdir:
+            try:
+                sources = collect_sources(files, workdir)
+            except CSVIngestError as e:
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            try:
+                results = self.ingest(sources, request.user)
+            finally:
+                close_sources(sources)
+
+        # Drop uploads the retention policy no longer keeps
+        schedule_sweep(request.user.id)
+
+        # Duplicates store no new rows, so they stay out of the totals
+        summaries = [r["summary"] for r in results if r["status"] == "created"]
+        failed = sum(r["status"] == "error" for r in results)
+
+        return Response(
+            {
+                "files": [
+                    {"fileName": r["fileName"], "status": r["status"], **r["payload"]}
+                    for r in results
+                ],
+                "summary": {
+                    **combine_summaries(summaries),
+                    "files": len(results),
+                    "failed": failed,
+                },
+            }
+        )
+
+    def ingest(self, sources, owner):
+        results = [None] * len(sources)
+        pending = []
+        large = []
+        # Later files of the batch with the same bytes as an earlier one
+        repeats = []
+        first_by_hash = {}
+
+        # =====================
+        # DUPLICATES
+        # =====================
+        for index, source in enumerate(sources):
+            if source.content_hash in first_by_hash:
+                repeats.append((index, first_by_hash[source.content_hash]))
+                continue
+            first_by_hash[source.content_hash] = index
+
+            duplicate = find_duplicate(source.content_hash, owner)
+            if duplicate:
+                results[index] = self.result(source, "duplicate", duplicate, duplicate.summary())
+            elif source.size >= settings.ANALYTICS_STREAM_THRESHOLD:
+                large.append((index, source))
+            else:
+                pending.append((index, source))
+
+        # =====================
+        # PARSE (process pool) + SAVE
+        # =====================
+        parsed = parse_all([source.parse_input() for _, source in pending])
+
+        for (index, source), outcome in zip(pending, parsed):
+            if isinstance(outcome, CSVIngestError):
+                results[index] = self.error(source, outcome)
+                continue
+
+            df, summary = outcome
+            dataset = save_dataset(source.file, summary, df, source.content_hash, owner=owner)
+            results[index] = self.result(source, "created", dataset, summary)
+            # Free this frame before waiting on the next one
+            del df, outcome
+
+        # =====================
+        # LARGE FILES (streamed)
+        # =====================
+        for index, source in large:
+            source.file.seek(0)
+            try:
+                dataset, summary = save_dataset_streaming(
+                    source.file,
+                    original_filename=source.name,
+                    content_hash=source.content_hash,
+                    owner=owner,
+                )
+            except CSVIngestError as e:
+                results[index] = self.error(source, e)
+            else:
+                results[index] = self.result(source, "created", dataset, summary)
+
+        for index, first in repeats:
+            earlier = results[first]
+            if earlier["status"] == "error":
+                results[index] = {**earlier, "fileName": sources[index].name}
+            else:
+                results[index] = {
+                    **earlier,
+                    "fileName": sources[index].name,
+                    "status": "duplicate",
+                }
+
+        return results
+
+    def error(self, source, error):
+        return {
+            "fileName": source.name,
+            "status": "error",
+            "payload": {"error": str(error)},
+        }
+
+    def result(self, source, status_name, dataset, summary):
+        return {
+            "fileName": source.name,
+            "status": status_name,
+            "summary": summary,
+            "payload": {
+                "id": dataset.id,
+                "uploadDate": dataset.uploaded_at.isoformat(),
+                **summary,
+            },
+        }
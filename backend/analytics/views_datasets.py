@@ -0,0 +1,222 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+
+from .aggregate import aggregate
+from .caching import cached_summary
+from .compare import compare_datasets, parse_compare
+from .conditional import (
+    dataset_etag,
+    dataset_last_modified,
+    pair_etag,
+    pair_last_modified,
+    revalidate_get,
+)
+from .downsample import cached_sorted_series, parse_series
+from .exceptions import RowQueryError
+from .export import TABLES, export_stream, pyarrow
+from .models import EquipmentDataset, EquipmentRow
+from .renderers import ArrowStreamRenderer, NDJSONRenderer, ParquetRenderer
+from .rows import filter_rows, page_rows
+
+
+@revalidate_get(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
+class DatasetDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset_id):
+        payload, hit = cached_summary(dataset_id, request.user.id)
+        if payload is None:
+            raise Http404("Dataset not found")
+        return Response(payload, headers={"X-Cache": "HIT" if hit else "MISS"})
+
+
+@revalidate_get(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
+class DatasetRowsAPIView(APIView):
+    """
+    Rows of one dataset, one page at a time.
+
+    Filters: ``?type=Pump,Valve``, ``?name=<prefix>`` and
+    ``?flowrate_min=`` / ``?flowrate_max=`` (likewise for pressure and
+    temperature). ``?sort=`` takes a column name, ``-`` prefixed for
+    descending order. ``?limit=`` sets the page size; pass the returned
+    ``next`` value back as ``?cursor=`` with the same filters and sort for
+    the following page (``null`` on the last one).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset_id):
+        if not EquipmentDataset.objects.owned_by(request.user).filter(id=dataset_id).exists():
+            raise Http404("Dataset not found")
+
+        params = request.query_params
+
+        try:
+            limit = int(params.get("limit", settings.ANALYTICS_ROWS_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {"error": "limit must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.ANALYTICS_ROWS_MAX_PAGE_SIZE))
+
+        try:
+            queryset = filter_rows(EquipmentRow.objects.filter(dataset_id=dataset_id), params)
+            rows, next_cursor = page_rows(
+                queryset,
+                sort=params.get("sort", "id"),
+                cursor=params.get("cursor"),
+                limit=limit,
+            )
+        except RowQueryError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({
+            "results": rows,
+            "next": next_cursor,
+        })
+
+
+@revalidate_get(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
+class DatasetAggregateAPIView(APIView):
+    """
+    Grouped statistics of one dataset, computed on the server; see
+    ``analytics.aggregate`` for the query syntax. Takes the rows endpoint's
+    filters too.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset_id):
+        dataset = EquipmentDataset.objects.owned_by(request.user).filter(id=dataset_id).only("id").first()
+        if dataset is None:
+            raise Http404("Dataset not found")
+
+        try:
+            queryset = filter_rows(dataset.rows.all(), request.query_params)
+            result = aggregate(dataset, queryset, request.query_params)
+        except RowQueryError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(result)
+
+
+@revalidate_get(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
+class DatasetSeriesAPIView(APIView):
+    """
+    Metrics plotted against their rank when sorted by one metric,
+    downsampled with LTTB: ``?points=1500&sort_by=flowrate&series=flowrate,pressure``.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset_id):
+        dataset = EquipmentDataset.objects.owned_by(request.user).filter(id=dataset_id).only("id", "uploaded_at").first()
+        if dataset is None:
+            raise Http404("Dataset not found")
+
+        try:
+            sort_by, series, points = parse_series(request.query_params)
+        except RowQueryError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        payload, hit = cached_sorted_series(dataset, sort_by, series, points)
+        return Response(payload, headers={"X-Cache": "HIT" if hit else "MISS"})
+
+
+@revalidate_get(etag_func=pair_etag, last_modified_func=pair_last_modified)
+class DatasetCompareAPIView(APIView):
+    """
+    Differences from dataset ``a`` to dataset ``b``: added and removed
+    equipment, per-equipment metric deltas and per-type average changes.
+    ``?top=N`` keeps only the N largest changes by ``?by=`` (a metric,
+    flowrate by default) and the first N added/removed names.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset_id, other_id):
+        datasets = (
+            EquipmentDataset.objects
+            .owned_by(request.user)
+            .only("id", "original_filename")
+            .in_bulk([dataset_id, other_id])
+        )
+        if dataset_id not in datasets or other_id not in datasets:
+            raise Http404("Dataset not found")
+
+        try:
+            top, by = parse_compare(request.query_params)
+        except RowQueryError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            compare_datasets(datasets[dataset_id], datasets[other_id], top=top, by=by)
+        )
+
+
+@revalidate_get(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
+class DatasetExportAPIView(APIView):
+    """
+    One table of a dataset in a single streamed response. ``?table=`` is
+    ``rows`` (default, takes the rows endpoint's filters) or ``type_stats``.
+
+    The format is negotiated from ``Accept`` or ``?format=``: a JSON array
+    (default), NDJSON, and with pyarrow installed Arrow IPC stream
+    (``application/vnd.apache.arrow.stream``) or Parquet.
+    """
+
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+    if pyarrow is not None:
+        renderer_classes += [ArrowStreamRenderer, ParquetRenderer]
+
+    def get(self, request, dataset_id):
+        dataset = EquipmentDataset.objects.owned_by(request.user).filter(id=dataset_id).only("id", "original_filename").first()
+        if dataset is None:
+            raise Http404("Dataset not found")
+
+        table = request.query_params.get("table", "rows")
+        if table not in TABLES:
+            return Response(
+                {"error": f"Unknown table '{table}'. Use one of: {', '.join(TABLES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            queryset = filter_rows(dataset.rows.all(), request.query_params)
+        except RowQueryError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fmt = request.accepted_renderer.format
+        chunks, content_type = export_stream(dataset, table, fmt, queryset)
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        patch_vary_headers(response, ["Accept"])
+        if fmt in ("arrow", "parquet"):
+            stem = Path(dataset.original_filename).stem
+            response["Content-Disposition"] = f'attachment; filename="{stem}-{table}.{fmt}"'
+        return response
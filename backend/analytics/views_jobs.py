@@ -0,0 +1,35 @@
+from django.http import Http404
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from .jobs import job_progress
+from .models import IngestJob
+
+
+def job_payload(job):
+    rows, progress = job_progress(job)
+
+    return {
+        "id": job.id,
+        "fileName": job.original_filename,
+        "status": job.status,
+        "progress": progress,
+        "rowsProcessed": rows,
+        "datasetId": job.dataset_id,
+        "error": job.error or None,
+        "createdAt": job.created_at.isoformat(),
+        "finishedAt": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class IngestJobStatusAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            job = IngestJob.objects.get(id=job_id, owner=request.user)
+        except IngestJob.DoesNotExist:
+            raise Http404("Job not found")
+
+        return Response(job_payload(job))
@@ -15,16 +15,18 @@ from reportlab.platypus import (
 from reportlab.lib import colors
 from datetime import datetime
 
-from .models import EquipmentDataset
+from .conditional import dataset_etag, dataset_last_modified, revalidate
+from .models import EquipmentDataset, ordered_distribution
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@revalidate(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
 def generate_pdf(request, dataset_id):
     try:
-        dataset = EquipmentDataset.objects.get(id=dataset_id)
+        dataset = EquipmentDataset.objects.owned_by(request.user).get(id=dataset_id)
     except EquipmentDataset.DoesNotExist:
         raise Http404("Dataset not found")
 
@@ -145,7 +147,7 @@ def generate_pdf(request, dataset_id):
 
     total = dataset.total_equipment or 1
 
-    for k, v in dataset.type_distribution.items():
+    for k, v in ordered_distribution(dataset.type_distribution).items():
         percent = (v / total) * 100
         type_rows.append([k, v, f"{percent:.1f}%"])
 
@@ -181,7 +183,7 @@ def generate_pdf(request, dataset_id):
         ["Name", "Type", "Flowrate", "Pressure", "Temperature"]
     ]
 
-    for row in dataset.data:
+    for row in dataset.rows.as_api_rows():
         equipment_rows.append(
             [
                 row["equipmentName"],
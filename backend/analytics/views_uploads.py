@@ -0,0 +1,209 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+
+from .ingest import find_duplicate
+from .jobs import enqueue
+from .models import ChunkedUpload
+from .serializers import ChunkedUploadSerializer
+from .uploads import (
+    ChunkError,
+    UploadClosed,
+    assemble,
+    create_part_file,
+    discard,
+    locked_part,
+    received_chunks,
+    verify,
+    write_chunk,
+)
+from .views_jobs import job_payload
+
+
+def get_upload(upload_id, owner):
+    try:
+        return ChunkedUpload.objects.get(id=upload_id, owner=owner)
+    except ChunkedUpload.DoesNotExist:
+        raise Http404("Upload not found")
+
+
+def upload_payload(upload):
+    return {
+        "id": upload.id,
+        "fileName": upload.original_filename,
+        "size": upload.size,
+        "chunkSize": upload.chunk_size,
+        "totalChunks": upload.total_chunks,
+        "receivedChunks": received_chunks(upload),
+        "status": upload.status,
+        "jobId": upload.job_id,
+    }
+
+
+# =========================
+# INITIATE
+# =========================
+class ChunkedUploadCreateAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = ChunkedUploadSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        upload = ChunkedUpload.objects.create(
+            owner=request.user,
+            original_filename=serializer.validated_data["filename"],
+            size=serializer.validated_data["size"],
+            chunk_size=serializer.validated_data.get(
+                "chunk_size", settings.ANALYTICS_UPLOAD_CHUNK_SIZE
+            ),
+        )
+        create_part_file(upload)
+
+        return Response(upload_payload(upload), status=status.HTTP_201_CREATED)
+
+
+# =========================
+# STATUS (for resuming)
+# =========================
+class ChunkedUploadDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        return Response(upload_payload(get_upload(upload_id, request.user)))
+
+
+# =========================
+# PUT CHUNK N
+# =========================
+class ChunkedUploadChunkAPIView(APIView):
+    """
+    Raw chunk bytes in the body, hex SHA-256 of the chunk in the
+    ``X-Chunk-SHA256`` header.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, upload_id, index):
+        upload = get_upload(upload_id, request.user)
+
+        if upload.status != ChunkedUpload.STATUS_OPEN:
+            return Response(
+                {"error": "Upload already completed"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        checksum = request.headers.get("X-Chunk-SHA256")
+        if not checksum:
+            return Response(
+                {"error": "X-Chunk-SHA256 header required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            write_chunk(upload, index, request, checksum)
+        except ChunkError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except UploadClosed as e:
+            # Completed (or cleaned up) while this chunk was on its way
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(upload_payload(upload))
+
+
+# =========================
+# COMPLETE
+# =========================
+class ChunkedUploadCompleteAPIView(APIView):
+    """
+    Optional ``sha256`` in the body: hex SHA-256 of the whole file, checked
+    against the assembled bytes. A file the user already uploaded is not
+    ingested again; the existing dataset's summary comes back with 200.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        with transaction.atomic():
+            try:
+                upload = ChunkedUpload.objects.select_for_update().get(id=upload_id, owner=request.user)
+            except ChunkedUpload.DoesNotExist:
+                raise Http404("Upload not found")
+
+            if upload.status != ChunkedUpload.STATUS_OPEN:
+                return Response(
+                    {"error": "Upload already completed"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            try:
+                with locked_part(upload, exclusive=True) as part:
+                    response = self.finish(request, upload, part)
+            except UploadClosed as e:
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if response is not None:
+                return response
+
+        upload.job.refresh_from_db()
+        return Response(job_payload(upload.job), status=status.HTTP_202_ACCEPTED)
+
+    def finish(self, request, upload, part):
+        """
+        Verify and hand over the part file while holding it exclusively, so
+        no chunk write can change it in between. Returns an error or
+        duplicate response, or ``None`` once a job has been queued.
+        """
+        missing = upload.total_chunks - upload.chunks.count()
+        if missing:
+            return Response(
+                {"error": f"{missing} chunk(s) still missing", **upload_payload(upload)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            content_hash = verify(upload, part)
+        except ChunkError as e:
+            return Response(
+                {"error": str(e), **upload_payload(upload)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        expected = request.data.get("sha256")
+        if expected and str(expected).lower() != content_hash:
+            return Response(
+                {"error": "Checksum mismatch for the assembled file"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        duplicate = find_duplicate(content_hash, request.user)
+        if duplicate:
+            discard(upload)
+            upload.status = ChunkedUpload.STATUS_COMPLETE
+            upload.save(update_fields=["status"])
+            return Response(duplicate.as_api(), status=status.HTTP_200_OK)
+
+        # Same ingestion path as a large single-request upload
+        job = enqueue(
+            assemble(upload),
+            upload.original_filename,
+            content_hash=content_hash,
+            owner=request.user,
+        )
+
+        upload.status = ChunkedUpload.STATUS_COMPLETE
+        upload.job = job
+        upload.save(update_fields=["status", "job"])
+        return None
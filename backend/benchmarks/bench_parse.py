@@ -0,0 +1,134 @@
+"""
+Parse time and peak RSS of the upload read path, per CSV engine.
+
+Compares the old ``pd.read_csv(file)`` + ``pd.to_numeric`` path with
+``read_frame`` on each available engine. Every measurement runs in a fresh
+subprocess so peak RSS isn't polluted by earlier runs.
+
+Run from the backend directory:
+
+    python benchmarks/bench_parse.py
+    python benchmarks/bench_parse.py --rows 100000 1000000 --extra-columns 10
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_csv(path, n, extra_columns, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Equipment Name": [f"Equipment-{i}" for i in range(n)],
+        "Type": rng.choice(["Pump", "Valve", "Compressor", "HeatExchanger", "Reactor"], n),
+        "Flowrate": rng.uniform(50, 300, n).round(2),
+        "Pressure": rng.uniform(1, 15, n).round(2),
+        "Temperature": rng.uniform(20, 250, n).round(1),
+    })
+    # Columns real plant exports carry that the upload path never uses
+    for i in range(extra_columns):
+        df[f"Unused {i}"] = rng.uniform(0, 1000, n).round(3)
+    df.to_csv(path, index=False)
+
+
+def peak_rss_mb():
+    """
+    Peak RSS of this process. VmHWM is reset by exec, unlike ru_maxrss,
+    which would include the parent's memory at fork time.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(config, path):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+    import django
+    django.setup()
+
+    from analytics.ingest import METRIC_COLUMNS, read_frame
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    if config == "baseline":
+        # What CSVUploadAPIView did before read_frame()
+        df = pd.read_csv(path)
+        for col in METRIC_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        df = df.dropna(subset=METRIC_COLUMNS)
+    else:
+        with open(path, "rb") as f:
+            df = read_frame(f, engine=config)
+    secs = time.perf_counter() - start
+
+    rss_after = peak_rss_mb()
+    print(json.dumps({
+        "secs": secs,
+        "rss_mb": rss_after,
+        "parse_rss_mb": rss_after - rss_before,
+        "rows": len(df),
+    }))
+
+
+def measure(config, path):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", config, path],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--extra-columns", type=int, default=5)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    configs = ["baseline", "c"]
+    try:
+        import pyarrow  # noqa: F401
+        configs.append("pyarrow")
+    except ImportError:
+        print("pyarrow not installed; skipping the pyarrow engine")
+
+    print(f"{'rows':>10} {'config':>10} {'parse s':>9} {'peak RSS MB':>12} {'parse RSS MB':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.rows:
+            path = os.path.join(tmp, f"bench_{n}.csv")
+            write_csv(path, n, args.extra_columns)
+
+            for config in configs:
+                result = measure(config, path)
+                assert result["rows"] == n
+                print(
+                    f"{n:>10} {config:>10} {result['secs']:>9.3f}"
+                    f" {result['rss_mb']:>12.1f} {result['parse_rss_mb']:>13.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
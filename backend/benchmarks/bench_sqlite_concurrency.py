@@ -0,0 +1,171 @@
+"""
+Throughput of concurrent uploads and history reads on SQLite, with the
+default settings vs DATABASE_SQLITE_PROFILE=performance.
+
+Each worker is a separate process with its own connection, like a
+gunicorn worker. It loops for a fixed time: one CSV upload through
+/api/upload/, then ``--reads`` requests to /api/history/. Every profile
+gets a fresh database file and media directory.
+
+Run from the backend directory:
+
+    python benchmarks/bench_sqlite_concurrency.py
+    python benchmarks/bench_sqlite_concurrency.py --workers 2 4 8 --seconds 20
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = ("default", "performance")
+
+
+def setup_django(workdir, profile):
+    """Point this process at the benchmark database and start Django."""
+    os.environ["DJANGO_SETTINGS_MODULE"] = "config.settings"
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'db.sqlite3')}"
+    os.environ["DATABASE_SQLITE_PROFILE"] = profile
+    os.environ["ANALYTICS_INGEST_WORKERS"] = "0"
+    # Prune in the request, so retention deletes compete for the lock too
+    os.environ["ANALYTICS_RETENTION_SWEEP"] = "inline"
+    os.environ["CACHE_BACKEND"] = "django.core.cache.backends.dummy.DummyCache"
+    sys.path.insert(0, BACKEND_DIR)
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.MEDIA_ROOT = os.path.join(workdir, "media")
+
+
+def make_csv(rows, seed):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Equipment Name": [f"Equipment-{seed}-{i}" for i in range(rows)],
+        "Type": rng.choice(["Pump", "Valve", "Compressor", "HeatExchanger", "Reactor"], rows),
+        "Flowrate": rng.uniform(50, 300, rows).round(2),
+        "Pressure": rng.uniform(1, 15, rows).round(2),
+        "Temperature": rng.uniform(20, 250, rows).round(1),
+    }).to_csv(index=False).encode()
+
+
+def prepare(workdir, profile, workers):
+    setup_django(workdir, profile)
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    for index in range(workers):
+        User.objects.create_user(f"bench{index}")
+
+
+def worker(workdir, profile, index, rows, reads, seconds, start, results):
+    setup_django(workdir, profile)
+    from django.contrib.auth.models import User
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(User.objects.get(username=f"bench{index}"))
+
+    counts = {"uploads": 0, "reads": 0, "errors": 0, "locked": 0}
+
+    def record(kind, call):
+        try:
+            response = call()
+        except Exception as e:
+            counts["errors"] += 1
+            counts["locked"] += "database is locked" in str(e)
+            return
+        if response.status_code >= 400:
+            counts["errors"] += 1
+        else:
+            counts[kind] += 1
+
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    seed = index * 1_000_000
+    while time.perf_counter() < deadline:
+        seed += 1
+        # A different file every time, so no upload is skipped as a duplicate
+        upload = SimpleUploadedFile(f"bench-{seed}.csv", make_csv(rows, seed))
+        record("uploads", lambda: client.post("/api/upload/", {"file": upload}, format="multipart"))
+        for _ in range(reads):
+            record("reads", lambda: client.get("/api/history/"))
+
+    results.put(counts)
+
+
+def run(profile, workers, rows, reads, seconds):
+    workdir = tempfile.mkdtemp(prefix=f"bench-sqlite-{profile}-")
+    context = multiprocessing.get_context("spawn")
+    try:
+        setup = context.Process(target=prepare, args=(workdir, profile, workers))
+        setup.start()
+        setup.join()
+
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=worker,
+                args=(workdir, profile, index, rows, reads, seconds, start, results),
+            )
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        # Give every worker time to import Django before the clock starts
+        time.sleep(3)
+        start.set()
+
+        totals = {"uploads": 0, "reads": 0, "errors": 0, "locked": 0}
+        for _ in processes:
+            for key, value in results.get().items():
+                totals[key] += value
+        for process in processes:
+            process.join()
+        return totals
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rows", type=int, default=1000, help="rows per uploaded CSV")
+    parser.add_argument("--reads", type=int, default=4, help="history reads per upload")
+    args = parser.parse_args()
+
+    print(
+        f"{'workers':>7} {'profile':>12} {'uploads/s':>10} {'reads/s':>10}"
+        f" {'errors':>7} {'locked':>7}"
+    )
+    for workers in args.workers:
+        baseline = None
+        for profile in PROFILES:
+            totals = run(profile, workers, args.rows, args.reads, args.seconds)
+            uploads = totals["uploads"] / args.seconds
+            reads = totals["reads"] / args.seconds
+            line = (
+                f"{workers:>7} {profile:>12} {uploads:>10,.1f} {reads:>10,.1f}"
+                f" {totals['errors']:>7} {totals['locked']:>7}"
+            )
+            if baseline is None:
+                baseline = uploads + reads
+            elif baseline:
+                line += f"  {(uploads + reads) / baseline:.1f}x requests/s"
+            print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
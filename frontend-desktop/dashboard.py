@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton,
     QVBoxLayout, QHBoxLayout, QGridLayout,
@@ -17,6 +19,12 @@ import matplotlib.pyplot as plt
 
 from styles import *
 
+# Rows fetched per request for the table
+ROWS_PAGE_SIZE = 100
+
+# GET responses kept for ETag revalidation, least recently used dropped first
+RESPONSE_CACHE_SIZE = 64
+
 
 # ==========================
 # MATPLOTLIB CANVAS (MUCH LARGER & MORE VISIBLE)
@@ -46,6 +54,9 @@ class DashboardWindow(QWidget):
         self.token = token
         self.email = email
 
+        # (url, params) -> (ETag, decoded body) of the last 200 response
+        self.response_cache = OrderedDict()
+
         self.setWindowTitle("Chemical Equipment Visualizer - Dashboard")
         self.setMinimumSize(1920, 1080)
         self.showMaximized()
@@ -54,11 +65,12 @@ class DashboardWindow(QWidget):
         self.init_ui()
         self.load_history()
     
-    def update_table(self, rows):
+    def update_table(self, rows, append=False):
         """Update table with enhanced formatting"""
-        self.table.setRowCount(len(rows))
+        start = self.table.rowCount() if append else 0
+        self.table.setRowCount(start + len(rows))
 
-        for row_index, row in enumerate(rows):
+        for row_index, row in enumerate(rows, start):
             # Create items with centered alignment
             name_item = QTableWidgetItem(str(row["equipmentName"]))
             type_item = QTableWidgetItem(str(row["type"]))
@@ -534,6 +546,11 @@ class DashboardWindow(QWidget):
         table_shadow.setOffset(0, 5)
         self.table.setGraphicsEffect(table_shadow)
 
+        # Further pages of rows load when the table is scrolled to the bottom
+        self.rows_dataset_id = None
+        self.rows_cursor = None
+        self.table.verticalScrollBar().valueChanged.connect(self.load_more_rows)
+
         # Add all components to content layout
         content_layout.addWidget(top_bar)
         content_layout.addWidget(viz_header)
@@ -576,6 +593,7 @@ class DashboardWindow(QWidget):
 
             data = response.json()
             self.current_dataset_id = data["id"]
+            data["data"] = self.first_rows(data["id"])
 
             self.stats_label.setText(
                 f"""
@@ -644,20 +662,12 @@ class DashboardWindow(QWidget):
         self.chart_type.draw()
 
         # Chart 2: Bar Chart (MUCH LARGER TEXT)
-        from collections import defaultdict
-        type_groups = defaultdict(list)
-        for e in equipment:
-            type_groups[e["type"]].append(e)
-
-        types = []
-        avg_flow = []
-        avg_pressure = []
-        avg_temp = []
-        for t, items in type_groups.items():
-            types.append(t)
-            avg_flow.append(sum(i["flowrate"] for i in items) / len(items))
-            avg_pressure.append(sum(i["pressure"] for i in items) / len(items))
-            avg_temp.append(sum(i["temperature"] for i in items) / len(items))
+        # Per-type averages are precomputed by the backend at upload
+        type_stats = data["type_stats"]
+        types = list(type_stats.keys())
+        avg_flow = [type_stats[t]["flowrate"]["mean"] for t in types]
+        avg_pressure = [type_stats[t]["pressure"]["mean"] for t in types]
+        avg_temp = [type_stats[t]["temperature"]["mean"] for t in types]
 
         x = range(len(types))
         bar_width = 0.25
@@ -738,12 +748,17 @@ class DashboardWindow(QWidget):
         self.chart_top10.draw()
 
         # Chart 4: Parameter Distribution (MUCH LARGER TEXT)
-        sorted_eq = sorted(equipment, key=lambda x: x["flowrate"])
-        flow_sorted = [e["flowrate"] for e in sorted_eq]
-        pressure_sorted = [e["pressure"] for e in sorted_eq]
+        # Sorted and downsampled (LTTB) on the server to what the chart can show
+        series = self.cached_get(
+            f"https://chemical-equipment-visualizer-xtbs.onrender.com/api/datasets/{data['id']}/series/",
+            params={"points": 1500, "sort_by": "flowrate", "series": "flowrate,pressure"},
+        )["series"]
+        flow_x, flow_sorted = series["flowrate"]["x"], series["flowrate"]["y"]
+        pressure_x, pressure_sorted = series["pressure"]["x"], series["pressure"]["y"]
 
         self.chart_sorted.ax.clear()
         self.chart_sorted.ax.plot(
+            flow_x,
             flow_sorted, 
             label="Flowrate", 
             marker="o", 
@@ -753,6 +768,7 @@ class DashboardWindow(QWidget):
             alpha=0.9
         )
         self.chart_sorted.ax.plot(
+            pressure_x,
             pressure_sorted, 
             label="Pressure", 
             marker="s", 
@@ -774,7 +790,7 @@ class DashboardWindow(QWidget):
         self.chart_sorted.ax.set_ylabel("Value", fontsize=15, weight='bold')
         self.chart_sorted.ax.tick_params(axis='both', labelsize=13)
         self.chart_sorted.ax.fill_between(
-            range(len(flow_sorted)), 
+            flow_x,
             flow_sorted, 
             alpha=0.1, 
             color=SECONDARY_MAIN
@@ -794,30 +810,29 @@ class DashboardWindow(QWidget):
             return
 
         try:
-            response = requests.get(
-                f"https://chemical-equipment-visualizer-xtbs.onrender.com/api/pdf/{self.current_dataset_id}/", 
-                headers={"Authorization": f"Token {self.token}"}
-            )
-            if response.status_code != 200:
+            try:
+                pdf = self.cached_get(
+                    f"https://chemical-equipment-visualizer-xtbs.onrender.com/api/pdf/{self.current_dataset_id}/"
+                )
+            except requests.HTTPError:
                 self.show_message("Error", "Failed to generate PDF", QMessageBox.Warning)
                 return
 
             with open(save_path, "wb") as f:
-                f.write(response.content)
+                f.write(pdf)
             self.show_message("Success", "PDF downloaded successfully! ✅", QMessageBox.Information)
         except Exception as e:
             self.show_message("Error", str(e), QMessageBox.Critical)
 
     def load_history(self):
         try:
-            response = requests.get(
-                "https://chemical-equipment-visualizer-xtbs.onrender.com/api/history/", 
-                headers={"Authorization": f"Token {self.token}"}
+            history = self.cached_get(
+                "https://chemical-equipment-visualizer-xtbs.onrender.com/api/history/"
             )
-            if response.status_code != 200:
-                return
             self.history_list.clear()
-            for d in response.json():
+            self.history_ids = []
+            for d in history:
+                self.history_ids.append(d["id"])
                 self.history_list.addItem(f"📄 {d['fileName']}\n📊 {d['total_equipment']} items")
         except:
             pass
@@ -825,12 +840,12 @@ class DashboardWindow(QWidget):
     def load_selected_dataset(self, item):
         index = self.history_list.row(item)
         try:
-            response = requests.get(
-                "https://chemical-equipment-visualizer-xtbs.onrender.com/api/history/", 
-                headers={"Authorization": f"Token {self.token}"}
-            )
-            datasets = response.json()
-            dataset = datasets[index]
+            dataset_id = self.history_ids[index]
+            # A copy, so the rows added below stay out of the cache
+            dataset = dict(self.cached_get(
+                f"https://chemical-equipment-visualizer-xtbs.onrender.com/api/datasets/{dataset_id}/"
+            ))
+            dataset["data"] = self.first_rows(dataset_id)
             self.current_dataset_id = dataset["id"]
 
             self.stats_label.setText(
@@ -851,6 +866,62 @@ class DashboardWindow(QWidget):
         except Exception as e:
             self.show_message("Error", str(e), QMessageBox.Warning)
 
+    def cached_get(self, url, params=None):
+        """
+        GET with conditional revalidation: resend the stored ETag and reuse
+        the stored body when the server answers 304 Not Modified. Returns
+        the parsed JSON, or the raw bytes of anything else (the PDF);
+        raises ``requests.HTTPError`` for an error status.
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        headers = {"Authorization": f"Token {self.token}"}
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        response = requests.get(url, headers=headers, params=params)
+        if response.status_code == 304 and cached is not None:
+            self.response_cache.move_to_end(key)
+            return cached[1]
+        response.raise_for_status()
+
+        if response.headers.get("Content-Type", "").startswith("application/json"):
+            body = response.json()
+        else:
+            body = response.content
+        if "ETag" in response.headers:
+            self.response_cache[key] = (response.headers["ETag"], body)
+            self.response_cache.move_to_end(key)
+            if len(self.response_cache) > RESPONSE_CACHE_SIZE:
+                self.response_cache.popitem(last=False)
+        return body
+
+    def fetch_rows(self, dataset_id, cursor=None):
+        """One page of a dataset's rows in upload order: ``(rows, next_cursor)``."""
+        params = {"limit": ROWS_PAGE_SIZE}
+        if cursor:
+            params["cursor"] = cursor
+        page = self.cached_get(
+            f"https://chemical-equipment-visualizer-xtbs.onrender.com/api/datasets/{dataset_id}/rows/",
+            params=params,
+        )
+        return page["results"], page["next"]
+
+    def first_rows(self, dataset_id):
+        """The first page of rows; the rest are fetched as the table scrolls."""
+        rows, self.rows_cursor = self.fetch_rows(dataset_id)
+        self.rows_dataset_id = dataset_id
+        return rows
+
+    def load_more_rows(self, value):
+        if not self.rows_cursor or value < self.table.verticalScrollBar().maximum():
+            return
+        try:
+            rows, self.rows_cursor = self.fetch_rows(self.rows_dataset_id, self.rows_cursor)
+            self.update_table(rows, append=True)
+        except Exception as e:
+            self.show_message("Error", str(e), QMessageBox.Warning)
+
     def logout(self):
         try:
             import os
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Chart as ChartJS,
   CategoryScale,
@@ -15,6 +15,7 @@ import {
 import { Bar, Pie, Line } from 'react-chartjs-2';
 import { motion } from 'framer-motion';
 import { DatasetSummary } from '@/types/equipment';
+import { fetchDatasetSeries } from '@/lib/api';
 import { PieChart, BarChart3, TrendingUp, Layers } from 'lucide-react';
 
 ChartJS.register(
@@ -51,6 +52,9 @@ interface ChartsPanelProps {
   summary: DatasetSummary;
 }
 
+// Points in the parameter distribution chart
+const SERIES_POINTS = 200;
+
 export const ChartsPanel: React.FC<ChartsPanelProps> = ({ summary }) => {
   const safeTypeDistribution =
     summary?.typeDistribution && typeof summary.typeDistribution === 'object'
@@ -58,6 +62,18 @@ export const ChartsPanel: React.FC<ChartsPanelProps> = ({ summary }) => {
 
   const safeData = Array.isArray(summary?.data) ? summary.data : [];
 
+  // Sorted by flowrate and downsampled on the server
+  const [series, setSeries] = useState<Record<string, { x: number[]; y: number[] }>>({});
+
+  useEffect(() => {
+    if (!summary?.id) return;
+    let cancelled = false;
+    fetchDatasetSeries(Number(summary.id), 'flowrate', ['flowrate', 'pressure'], SERIES_POINTS)
+      .then((data) => { if (!cancelled) setSeries(data); })
+      .catch(() => console.error('Failed to load parameter series'));
+    return () => { cancelled = true; };
+  }, [summary?.id]);
+
   const typeDistributionData = {
     labels: Object.keys(safeTypeDistribution),
     datasets: [{
@@ -79,13 +95,16 @@ export const ChartsPanel: React.FC<ChartsPanelProps> = ({ summary }) => {
     ],
   };
 
-  const sortedByFlowrate = [...safeData].sort((a, b) => a.flowrate - b.flowrate);
+  // Each series keeps its own ranks, so plot (rank, value) points
+  const toPoints = (name: string) => {
+    const { x = [], y = [] } = series[name] ?? {};
+    return x.map((rank, i) => ({ x: rank + 1, y: y[i] }));
+  };
   const lineChartData = {
-    labels: sortedByFlowrate.slice(0, 20).map((_, i) => `${i + 1}`),
     datasets: [
       {
         label: 'Flowrate',
-        data: sortedByFlowrate.slice(0, 20).map((e) => e.flowrate),
+        data: toPoints('flowrate'),
         borderColor: chartColors.teal,
         backgroundColor: 'rgba(0, 168, 150, 0.1)',
         fill: true,
@@ -98,7 +117,7 @@ export const ChartsPanel: React.FC<ChartsPanelProps> = ({ summary }) => {
       },
       {
         label: 'Pressure',
-        data: sortedByFlowrate.slice(0, 20).map((e) => e.pressure),
+        data: toPoints('pressure'),
         borderColor: chartColors.blue,
         backgroundColor: 'rgba(10, 77, 140, 0.1)',
         fill: true,
@@ -134,7 +153,7 @@ export const ChartsPanel: React.FC<ChartsPanelProps> = ({ summary }) => {
     { icon: <PieChart className="w-6 h-6 text-primary" />, title: "Equipment Types", component: <Pie data={typeDistributionData} options={{...commonOptions, plugins: {...commonOptions.plugins, legend: {...commonOptions.plugins.legend, position: 'right' as const}}}} />, delay: 0 },
     { icon: <BarChart3 className="w-6 h-6 text-secondary" />, title: "Avg Parameters", component: <Bar data={parametersBarData} options={{...commonOptions, scales: { x: { grid: { display: false }}, y: { grid: { color: 'rgba(0,0,0,0.06)'}}}}} />, delay: 0.1 },
     { icon: <Layers className="w-6 h-6 text-accent" />, title: "Top 10 Equipment", component: <Bar data={parametersBarData} options={{...commonOptions, scales: { x: { grid: { display: false }}, y: { grid: { color: 'rgba(0,0,0,0.06)'}}}}} />, delay: 0.2 },
-    { icon: <TrendingUp className="w-6 h-6 text-info" />, title: "Parameter Distribution", component: <Line data={lineChartData} options={{...commonOptions, scales: { x: { grid: { display: false }}, y: { grid: { color: 'rgba(0,0,0,0.06)'}}}}} />, delay: 0.3 },
+    { icon: <TrendingUp className="w-6 h-6 text-info" />, title: "Parameter Distribution", component: <Line data={lineChartData} options={{...commonOptions, scales: { x: { type: 'linear' as const, grid: { display: false }}, y: { grid: { color: 'rgba(0,0,0,0.06)'}}}}} />, delay: 0.3 },
   ];
 
   return (
@@ -1,22 +1,32 @@
-import React, { useState, useMemo } from "react";
+import React, { useState, useEffect } from "react";
 import { motion } from "framer-motion";
 import { ArrowUpDown, ArrowUp, ArrowDown, Search, Table2 } from "lucide-react";
 import { EquipmentData } from "@/types/equipment";
 import { Input } from "@/components/ui/input";
+import { Button } from "@/components/ui/button";
+import { api } from "@/lib/api";
 import { formatValue } from "@/lib/dataUtils";
 
 interface DataTableProps {
-  data: EquipmentData[];
+  datasetId: number;
+  total: number;
 }
 
 type SortField = keyof EquipmentData;
 type SortDirection = "asc" | "desc";
 
-export const DataTable: React.FC<DataTableProps> = ({ data }) => {
+const PAGE_SIZE = 100;
+
+export const DataTable: React.FC<DataTableProps> = ({ datasetId, total }) => {
   const [sortField, setSortField] = useState<SortField>("equipmentName");
   const [sortDirection, setSortDirection] = useState<SortDirection>("asc");
   const [searchQuery, setSearchQuery] = useState("");
 
+  // Filtering, sorting and paging happen on the server
+  const [rows, setRows] = useState<EquipmentData[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loading, setLoading] = useState(false);
+
   const handleSort = (field: SortField) => {
     if (sortField === field) {
       setSortDirection(sortDirection === "asc" ? "desc" : "asc");
@@ -26,37 +36,30 @@ export const DataTable: React.FC<DataTableProps> = ({ data }) => {
     }
   };
 
-  const filteredAndSortedData = useMemo(() => {
-    let result = [...data];
-
-    if (searchQuery) {
-      const query = searchQuery.toLowerCase();
-      result = result.filter(
-        (item) =>
-          item.equipmentName.toLowerCase().includes(query) ||
-          item.type.toLowerCase().includes(query)
-      );
-    }
-
-    result.sort((a, b) => {
-      const aVal = a[sortField];
-      const bVal = b[sortField];
-
-      if (typeof aVal === "string" && typeof bVal === "string") {
-        return sortDirection === "asc"
-          ? aVal.localeCompare(bVal)
-          : bVal.localeCompare(aVal);
-      }
-
-      if (typeof aVal === "number" && typeof bVal === "number") {
-        return sortDirection === "asc" ? aVal - bVal : bVal - aVal;
-      }
-
-      return 0;
-    });
+  const fetchPage = (cursor: string | null) => {
+    setLoading(true);
+    return api
+      .get(`datasets/${datasetId}/rows/`, {
+        params: {
+          sort: `${sortDirection === "desc" ? "-" : ""}${sortField}`,
+          name: searchQuery || undefined,
+          limit: PAGE_SIZE,
+          cursor: cursor || undefined,
+        },
+      })
+      .then((res) => {
+        setRows((prev) => (cursor ? [...prev, ...res.data.results] : res.data.results));
+        setNextCursor(res.data.next);
+      })
+      .catch(() => console.error("Failed to load rows"))
+      .finally(() => setLoading(false));
+  };
 
-    return result;
-  }, [data, sortField, sortDirection, searchQuery]);
+  useEffect(() => {
+    const timer = setTimeout(() => fetchPage(null), searchQuery ? 250 : 0);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [datasetId, sortField, sortDirection, searchQuery]);
 
   const SortIcon = ({ field }: { field: SortField }) => {
     if (sortField !== field) {
@@ -106,7 +109,7 @@ export const DataTable: React.FC<DataTableProps> = ({ data }) => {
           <div className="mb-6 relative">
             <Search className="absolute left-4 top-1/2 -translate-y-1/2 w-5 h-5 text-neutral-medium" />
             <Input
-              placeholder=" Search equipment or type..."
+              placeholder=" Search by equipment name prefix..."
               value={searchQuery}
               onChange={(e) => setSearchQuery(e.target.value)}
               className="pl-12 h-14 text-base border-3 border-neutral-light rounded-xl focus:border-primary"
@@ -139,12 +142,12 @@ export const DataTable: React.FC<DataTableProps> = ({ data }) => {
               </thead>
 
               <tbody>
-                {filteredAndSortedData.map((row, index) => (
+                {rows.map((row, index) => (
                   <motion.tr
                     key={`${row.equipmentName}-${index}`}
                     initial={{ opacity: 0, x: -20 }}
                     animate={{ opacity: 1, x: 0 }}
-                    transition={{ duration: 0.3, delay: index * 0.03 }}
+                    transition={{ duration: 0.3, delay: (index % PAGE_SIZE) * 0.03 }}
                     className="hover:bg-primary/5 transition-colors"
                   >
                     <td className="font-semibold text-base">{row.equipmentName}</td>
@@ -168,11 +171,24 @@ export const DataTable: React.FC<DataTableProps> = ({ data }) => {
             </table>
           </div>
 
+          {/* Load more */}
+          {nextCursor && (
+            <div className="mt-5 flex justify-center">
+              <Button
+                variant="outline"
+                disabled={loading}
+                onClick={() => fetchPage(nextCursor)}
+              >
+                {loading ? "Loading..." : "Load more"}
+              </Button>
+            </div>
+          )}
+
           {/* Count */}
           <div className="mt-5 flex items-center justify-between text-sm">
             <span className="text-muted-foreground font-medium">
-              Showing <span className="font-bold text-foreground">{filteredAndSortedData.length}</span> of{" "}
-              <span className="font-bold text-foreground">{data.length}</span> entries
+              Showing <span className="font-bold text-foreground">{rows.length}</span> of{" "}
+              <span className="font-bold text-foreground">{total}</span> entries
             </span>
             {searchQuery && (
               <span className="text-secondary font-semibold">
@@ -16,3 +16,27 @@ api.interceptors.request.use(
   },
   (error) => Promise.reject(error)
 );
+
+// Rows are paged separately from the dataset summary; one page per call
+export const fetchDatasetRows = async (
+  datasetId: number,
+  params: { cursor?: string | null; limit?: number; sort?: string } = {}
+) => {
+  const res = await api.get(`datasets/${datasetId}/rows/`, {
+    params: { ...params, cursor: params.cursor || undefined },
+  });
+  return res.data as { results: any[]; next: string | null };
+};
+
+// Metrics against their rank when sorted by one metric, downsampled on the server
+export const fetchDatasetSeries = async (
+  datasetId: number,
+  sortBy: string,
+  series: string[],
+  points: number
+) => {
+  const res = await api.get(`datasets/${datasetId}/series/`, {
+    params: { sort_by: sortBy, series: series.join(","), points },
+  });
+  return res.data.series as Record<string, { x: number[]; y: number[] }>;
+};
@@ -9,7 +9,7 @@ import { StatsPanel } from "@/components/StatsPanel";
 import { ChartsPanel } from "@/components/ChartsPanel";
 import { UploadHistory } from "@/components/UploadHistory";
 
-import { api } from "@/lib/api";
+import { api, fetchDatasetRows } from "@/lib/api";
 import { Button } from "@/components/ui/button";
 import {
   Tabs,
@@ -18,6 +18,9 @@ import {
   TabsTrigger,
 } from "@/components/ui/tabs";
 
+// Rows loaded with a dataset, enough for the top equipment chart
+const PREVIEW_ROWS = 10;
+
 /* ================= BACKEND NORMALIZER ================= */
 
 const normalizeDataset = (apiData: any) => {
@@ -83,20 +86,34 @@ const Index = () => {
 
   /* ================= AFTER UPLOAD ================= */
 
+  // Charts only need the first rows; the table pages through the rest
+  const showDataset = useCallback((dataset: any) => {
+    fetchDatasetRows(dataset.id, { limit: PREVIEW_ROWS })
+      .then((page) => setCurrentDataset({ ...dataset, data: page.results }))
+      .catch(() => console.error("Failed to load dataset rows"));
+  }, []);
+
   const handleUploadComplete = useCallback(
     (apiResponse: any) => {
       const normalized = normalizeDataset(apiResponse);
-      setCurrentDataset(normalized);
+      if (normalized.data.length) {
+        setCurrentDataset({
+          ...normalized,
+          data: normalized.data.slice(0, PREVIEW_ROWS),
+        });
+      } else {
+        // Streamed uploads do not echo their rows back
+        showDataset(normalized);
+      }
       loadHistory();
     },
-    [loadHistory]
+    [loadHistory, showDataset]
   );
 
   /* ================= SELECT HISTORY ================= */
 
-  const handleSelectDataset = useCallback((dataset: any) => {
-    setCurrentDataset(dataset);
-  }, []);
+  // History only carries summaries; load the first rows on demand
+  const handleSelectDataset = showDataset;
 
   /* ================= CLEAR ================= */
 
@@ -271,7 +288,10 @@ const Index = () => {
                   </TabsContent>
 
                   <TabsContent value="table" className="mt-6">
-                    <DataTable data={currentDataset.data} />
+                    <DataTable
+                      datasetId={currentDataset.id}
+                      total={currentDataset.total_equipment}
+                    />
                   </TabsContent>
                 </Tabs>
               </motion.div>